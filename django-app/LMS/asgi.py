@@ -12,5 +12,7 @@ import os
 from django.core.asgi import get_asgi_application
 
 os.environ.setdefault("DJANGO_SETTINGS_MODULE", "LMS.settings")
+# Served through ASGI: settings default to no persistent connections
+os.environ.setdefault("LIBRARY_ASGI", "1")
 
 application = get_asgi_application()
@@ -12,6 +12,8 @@ https://docs.djangoproject.com/en/5.2/ref/settings/
 
 from pathlib import Path
 
+from django.core.exceptions import ImproperlyConfigured
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -37,24 +39,34 @@ INSTALLED_APPS = [
     "django.contrib.sessions",
     "django.contrib.messages",
     "django.contrib.staticfiles",
+    "django.contrib.postgres",
     "library",
 ]
 
 MIDDLEWARE = [
+    # Outermost, so it sees every query of the request
+    "library.middleware.ConnectionSetupTimingMiddleware",
+    # Only loaded when LIBRARY_SQL_INSTRUMENTATION is on
+    "library.middleware.SQLInstrumentationMiddleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
     "django.middleware.csrf.CsrfViewMiddleware",
     "django.contrib.auth.middleware.AuthenticationMiddleware",
     "django.contrib.messages.middleware.MessageMiddleware",
+    # Inside the session middleware, so saving a session does not pin a client to the primary
+    "library.middleware.ReplicaPinningMiddleware",
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
+    # Last, so it only wraps the view itself
+    "library.middleware.ProfilingMiddleware",
 ]
 
 ROOT_URLCONF = "LMS.urls"
 
 TEMPLATES = [
     {
-        "BACKEND": "django.template.backends.django.DjangoTemplates",
+        # Times renders for SQLInstrumentationMiddleware
+        "BACKEND": "library.backends.templates.DjangoTemplates",
         "DIRS": [],
         "APP_DIRS": True,
         "OPTIONS": {
@@ -76,7 +88,8 @@ import os
 
 DATABASES = {
     "default": {
-        "ENGINE": "django.db.backends.postgresql",
+        # django.db.backends.postgresql, timing connection setup for request metrics
+        "ENGINE": "library.backends.postgresql",
         "NAME": os.getenv("POSTGRES_DB"),
         "USER": os.getenv("POSTGRES_USER"),
         "PASSWORD": os.getenv("POSTGRES_PASSWORD"),
@@ -85,6 +98,141 @@ DATABASES = {
     }
 }
 
+# Database connections
+# https://docs.djangoproject.com/en/5.2/ref/databases/#persistent-connections
+# Under WSGI each worker thread keeps its connection open for
+# LIBRARY_DB_CONN_MAX_AGE seconds (default 60; 0 closes it after every
+# request), and a kept connection is health-checked before a request
+# reuses it. Under ASGI (LMS.asgi sets LIBRARY_ASGI) the default is 0, as
+# Django advises: each request runs its queries on a new thread, so a kept
+# connection would never be reused, only left open.
+# LIBRARY_DB_POOL=1 switches to a psycopg 3 connection pool per process
+# instead, which suits ASGI workers. It needs the psycopg[pool] package
+# (psycopg 3 replaces psycopg2 as the driver then).
+
+LIBRARY_ASGI = os.getenv("LIBRARY_ASGI", "").lower() in ("1", "true", "yes")
+LIBRARY_DB_CONN_MAX_AGE = int(os.getenv("LIBRARY_DB_CONN_MAX_AGE", "0" if LIBRARY_ASGI else "60"))
+LIBRARY_DB_POOL = os.getenv("LIBRARY_DB_POOL", "").lower() in ("1", "true", "yes")
+
+if LIBRARY_DB_POOL:
+    try:
+        from psycopg_pool import ConnectionPool
+    except ImportError:
+        raise ImproperlyConfigured(
+            "LIBRARY_DB_POOL needs psycopg 3 with its connection pool: pip install 'psycopg[pool]'"
+        )
+
+DATABASES["default"]["CONN_HEALTH_CHECKS"] = True
+
+if LIBRARY_DB_POOL:
+    # Pooled connections go back to the pool after every request
+    DATABASES["default"]["CONN_MAX_AGE"] = 0
+    DATABASES["default"]["OPTIONS"] = {
+        "pool": {
+            "min_size": int(os.getenv("LIBRARY_DB_POOL_MIN_SIZE", "2")),
+            "max_size": int(os.getenv("LIBRARY_DB_POOL_MAX_SIZE", "10")),
+            # Seconds a request waits for a free connection before failing
+            "timeout": float(os.getenv("LIBRARY_DB_POOL_TIMEOUT", "10")),
+            # Seconds an idle connection above min_size is kept
+            "max_idle": float(os.getenv("LIBRARY_DB_POOL_MAX_IDLE", "300")),
+            # Seconds after which a connection is replaced, whatever its use
+            "max_lifetime": float(os.getenv("LIBRARY_DB_POOL_MAX_LIFETIME", "3600")),
+            # Health check when a connection is taken from the pool
+            "check": ConnectionPool.check_connection,
+        },
+    }
+else:
+    DATABASES["default"]["CONN_MAX_AGE"] = LIBRARY_DB_CONN_MAX_AGE
+
+# Read replicas
+# LIBRARY_DB_REPLICAS lists read replicas of the default database as
+# comma-separated "[name@]host[:port]" entries (same credentials, and the
+# default's name and port unless given). library.routers sends catalog
+# reads (books, categories and their links) to them; writes, and reads by
+# a client that has just written, stay on the primary. Locally, a second
+# database on the same server (e.g. "library_replica@localhost") can play
+# the replica.
+
+LIBRARY_DB_REPLICA_ALIASES = []
+for number, replica in enumerate(filter(None, os.getenv("LIBRARY_DB_REPLICAS", "").split(",")), start=1):
+    replica_name, _, replica_address = replica.strip().rpartition("@")
+    replica_host, _, replica_port = replica_address.partition(":")
+    DATABASES[f"replica{number}"] = {
+        **DATABASES["default"],
+        "NAME": replica_name or DATABASES["default"]["NAME"],
+        "HOST": replica_host,
+        "PORT": replica_port or DATABASES["default"]["PORT"],
+        # Tests run against the primary's test database only
+        "TEST": {"MIRROR": "default"},
+    }
+    LIBRARY_DB_REPLICA_ALIASES.append(f"replica{number}")
+
+DATABASE_ROUTERS = ["library.routers.CatalogReplicaRouter"]
+
+# Seconds a client keeps reading from the primary after a write, to cover replica lag
+LIBRARY_DB_REPLICA_PIN_SECONDS = int(os.getenv("LIBRARY_DB_REPLICA_PIN_SECONDS", "5"))
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.2/topics/cache/
+# LIBRARY_CACHE_BACKEND is "locmem" (per process, the default) or "file"
+# (shared by every worker on the host, so a page rendered by one worker is
+# reused by all). Either way, catalog entries are invalidated in every
+# worker at once through the catalog version kept in the database.
+
+LIBRARY_CACHE_BACKEND = os.getenv("LIBRARY_CACHE_BACKEND", "locmem")
+
+if LIBRARY_CACHE_BACKEND == "file":
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.filebased.FileBasedCache",
+            "LOCATION": os.getenv("LIBRARY_CACHE_LOCATION", str(BASE_DIR / ".cache")),
+        }
+    }
+else:
+    CACHES = {
+        "default": {
+            "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+            "LOCATION": "library",
+        }
+    }
+
+
+# Sessions
+# https://docs.djangoproject.com/en/5.2/topics/http/sessions/#configuring-the-session-engine
+# The views only keep user_id, user_name and user_role in the session.
+# LIBRARY_SESSION_BACKEND is "cached_db" (reads from the cache, writes
+# through to the database), "cache", "signed_cookies" or "db". Cache-backed
+# sessions need a cache shared by every worker, so the default is
+# "cached_db" with the file cache and "db" with the per-process locmem
+# cache, and asking for a cache-backed engine with locmem is an error.
+
+SESSION_ENGINES = {
+    "db": "django.contrib.sessions.backends.db",
+    "cached_db": "django.contrib.sessions.backends.cached_db",
+    "cache": "django.contrib.sessions.backends.cache",
+    "signed_cookies": "django.contrib.sessions.backends.signed_cookies",
+}
+
+LIBRARY_SESSION_BACKEND = os.getenv(
+    "LIBRARY_SESSION_BACKEND", "db" if LIBRARY_CACHE_BACKEND == "locmem" else "cached_db"
+)
+
+if LIBRARY_SESSION_BACKEND not in SESSION_ENGINES:
+    raise ImproperlyConfigured(
+        f"LIBRARY_SESSION_BACKEND must be one of {', '.join(SESSION_ENGINES)}, not {LIBRARY_SESSION_BACKEND!r}"
+    )
+if LIBRARY_SESSION_BACKEND in ("cache", "cached_db") and LIBRARY_CACHE_BACKEND == "locmem":
+    raise ImproperlyConfigured(
+        f"LIBRARY_SESSION_BACKEND={LIBRARY_SESSION_BACKEND} needs a cache shared by every worker: "
+        "set LIBRARY_CACHE_BACKEND=file"
+    )
+
+SESSION_ENGINE = SESSION_ENGINES[LIBRARY_SESSION_BACKEND]
+
+# Expired sessions deleted per statement by the clear_expired_sessions command
+LIBRARY_SESSION_CLEANUP_BATCH_SIZE = int(os.getenv("LIBRARY_SESSION_CLEANUP_BATCH_SIZE", "5000"))
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.2/ref/settings/#auth-password-validators
@@ -126,3 +274,93 @@ STATIC_URL = "static/"
 # https://docs.djangoproject.com/en/5.2/ref/settings/#default-auto-field
 
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
+
+
+# Library loans
+# Maximum number of books a user can borrow at the same time, per role.
+# Copied to Users.loan_limit when a user is created; changing it later does
+# not affect existing users (update their loan_limit to apply it).
+
+LIBRARY_LOAN_LIMITS = {
+    "user": int(os.getenv("LIBRARY_USER_LOAN_LIMIT", "3")),
+    "admin": int(os.getenv("LIBRARY_ADMIN_LOAN_LIMIT", "0")),
+}
+
+
+# Library search
+# Minimum pg_trgm word similarity (0-1) for the typo-tolerant fallback search.
+
+LIBRARY_FUZZY_SEARCH_THRESHOLD = float(os.getenv("LIBRARY_FUZZY_SEARCH_THRESHOLD", "0.4"))
+
+
+# Library catalog cache
+# Seconds a rendered book grid page stays cached; writes invalidate it sooner.
+
+LIBRARY_CATALOG_CACHE_TIMEOUT = int(os.getenv("LIBRARY_CATALOG_CACHE_TIMEOUT", "300"))
+# Seconds a worker reuses the catalog version it last read from the
+# database; catalog writes in other workers reach its caches this late.
+LIBRARY_CATALOG_VERSION_TTL = float(os.getenv("LIBRARY_CATALOG_VERSION_TTL", "2"))
+
+
+# Library search result cache
+# Searches (book ids only) kept per process, least recently used evicted first.
+
+LIBRARY_SEARCH_CACHE_SIZE = int(os.getenv("LIBRARY_SEARCH_CACHE_SIZE", "1024"))
+
+
+# Library thumbnails
+# Covers are fetched once by ingest_thumbnails (--watch keeps it running
+# as a worker), resized to these widths as WebP and JPEG, and served from
+# LIBRARY_THUMBNAIL_ROOT under content-hashed, immutable URLs. Saving a book
+# only marks its cover pending; LIBRARY_THUMBNAIL_INGEST_ON_SAVE=1 also
+# ingests it on a background thread of the process that saved it.
+
+LIBRARY_THUMBNAIL_ROOT = os.getenv("LIBRARY_THUMBNAIL_ROOT", str(BASE_DIR / "thumbnails"))
+LIBRARY_THUMBNAIL_WIDTHS = [
+    int(width) for width in os.getenv("LIBRARY_THUMBNAIL_WIDTHS", "200,400").split(",")
+]
+LIBRARY_THUMBNAIL_FETCH_TIMEOUT = float(os.getenv("LIBRARY_THUMBNAIL_FETCH_TIMEOUT", "5"))
+LIBRARY_THUMBNAIL_MAX_BYTES = int(os.getenv("LIBRARY_THUMBNAIL_MAX_BYTES", str(5 * 1024 * 1024)))
+LIBRARY_THUMBNAIL_INGEST_ON_SAVE = os.getenv("LIBRARY_THUMBNAIL_INGEST_ON_SAVE", "").lower() in ("1", "true", "yes")
+
+
+# Library request instrumentation
+# LIBRARY_SQL_INSTRUMENTATION=1 reports each request's query count, SQL,
+# template and view time as Server-Timing metrics and "library.requests"
+# log lines, and warns about queries of one shape repeated at least
+# LIBRARY_SQL_REPEAT_THRESHOLD times in a request (likely N+1 lookups).
+
+LIBRARY_SQL_INSTRUMENTATION = os.getenv("LIBRARY_SQL_INSTRUMENTATION", "").lower() in ("1", "true", "yes")
+LIBRARY_SQL_REPEAT_THRESHOLD = int(os.getenv("LIBRARY_SQL_REPEAT_THRESHOLD", "5"))
+
+
+# Library profiling
+# An admin can profile one request by sending it with an X-Library-Profile
+# header or a ?profile query parameter; LIBRARY_PROFILE_SAMPLE_RATE=N also
+# profiles one request in N at random (0 turns sampling off). Profiles are
+# cProfile .prof files in LIBRARY_PROFILE_ROOT, newest LIBRARY_PROFILE_KEEP
+# kept, listed at /dashboard/admin/profiles.
+
+LIBRARY_PROFILING = os.getenv("LIBRARY_PROFILING", "1").lower() in ("1", "true", "yes")
+LIBRARY_PROFILE_SAMPLE_RATE = int(os.getenv("LIBRARY_PROFILE_SAMPLE_RATE", "0"))
+LIBRARY_PROFILE_ROOT = os.getenv("LIBRARY_PROFILE_ROOT", str(BASE_DIR / "profiles"))
+LIBRARY_PROFILE_KEEP = int(os.getenv("LIBRARY_PROFILE_KEEP", "100"))
+
+
+# Logging
+# https://docs.djangoproject.com/en/5.2/topics/logging/
+
+LOGGING = {
+    "version": 1,
+    "disable_existing_loggers": False,
+    "formatters": {
+        "plain": {"format": "%(asctime)s %(levelname)s %(name)s %(message)s"},
+    },
+    "handlers": {
+        "console": {"class": "logging.StreamHandler", "formatter": "plain"},
+    },
+    "loggers": {
+        "library.requests": {"handlers": ["console"], "level": "INFO"},
+        "library.profiling": {"handlers": ["console"], "level": "INFO"},
+    },
+}
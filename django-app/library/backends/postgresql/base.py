@@ -0,0 +1,29 @@
+import logging
+import time
+
+from django.db.backends.postgresql import base
+
+logger = logging.getLogger("library.db")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """
+    The stock PostgreSQL backend, keeping count of how many connections it
+    set up and how long that took (a TCP and auth handshake, or a pool
+    checkout when pooling is on). ConnectionSetupTimingMiddleware reports
+    the per-request share of it.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.connection_setups = 0
+        self.connection_setup_time = 0.0
+
+    def get_new_connection(self, conn_params):
+        started = time.perf_counter()
+        connection = super().get_new_connection(conn_params)
+        elapsed = time.perf_counter() - started
+        self.connection_setups += 1
+        self.connection_setup_time += elapsed
+        logger.debug("Database connection set up in %.1f ms (%s)", elapsed * 1000, "pool" if self.pool else "new")
+        return connection
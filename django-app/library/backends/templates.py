@@ -0,0 +1,25 @@
+from django.template.backends import django
+
+from library.instrumentation import current_profile
+
+
+class Template(django.Template):
+    def render(self, context=None, request=None):
+        profile = current_profile.get()
+        if profile is None:
+            return super().render(context, request)
+        with profile.rendering_template():
+            return super().render(context, request)
+
+
+class DjangoTemplates(django.DjangoTemplates):
+    """
+    The stock Django template engine, timing renders for
+    SQLInstrumentationMiddleware while a request is being instrumented.
+    """
+
+    def get_template(self, template_name):
+        return Template(super().get_template(template_name).template, self)
+
+    def from_string(self, template_code):
+        return Template(super().from_string(template_code).template, self)
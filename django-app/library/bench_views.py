@@ -0,0 +1,175 @@
+"""
+Latency and query-count benchmarks of the main views, on synthetic
+catalogs of several sizes. Not part of the default test run:
+
+    pytest library/bench_views.py                        # compare with the baseline
+    LIBRARY_BENCHMARK_SAVE=1 pytest library/bench_views.py   # record a new baseline
+
+A benchmark fails when a request runs more queries than its budget, or
+when its fastest run regresses past LIBRARY_BENCHMARK_THRESHOLD (default
+1.0, i.e. twice as slow) of the stored baseline. Medians and tails are
+reported but not gated on: they swing too much on shared machines.
+"""
+import pytest
+from django.core.cache import cache
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from library.benchmark import (
+    WARMUP_ITERATIONS, benchmark_iterations, check_result, format_results, load_baseline, measure, save_baseline,
+    saving_baseline, warn_if_other_python,
+)
+from library.cache import search_results
+from library.models import Books, BooksBorrowed, Users
+from library.services import checkout_book, return_loan
+from library.synthetic import NOUNS, PLACES, generate_library
+
+CATALOG_SIZES = {
+    "small": {"books": 500, "categories": 20, "users": 200, "loans": 300},
+    "large": {"books": 20_000, "categories": 60, "users": 5_000, "loans": 10_000},
+}
+
+# Most queries a single request may run, whatever the catalog size. Raise
+# one only together with the change that needs it. A catalog request reads
+# the shared catalog version at most once (not at all while this process's
+# last read is fresh); deleting a loan loads it first for the post_delete
+# receiver that releases the slot.
+QUERY_BUDGETS = {
+    "index": 0,
+    "index_cold": 5,
+    "index_signed_in": 3,
+    "search_api_cold": 4,
+    "borrow_book": 8,
+    "return_book": 10,
+    "user_dashboard": 4,
+    "admin_dashboard": 4,
+}
+
+SEARCH_TERMS = NOUNS + PLACES[:10]
+
+
+@pytest.fixture(scope="module")
+def benchmark_results(request):
+    if not saving_baseline():
+        warn_if_other_python()
+    results = {}
+    yield results
+    reporter = request.config.pluginmanager.get_plugin("terminalreporter")
+    reporter.write_line("")
+    for line in format_results(results):
+        reporter.write_line(line)
+    if saving_baseline() and results:
+        save_baseline(results)
+
+
+@pytest.fixture(scope="module", params=list(CATALOG_SIZES))
+def catalog(request, django_db_setup, django_db_blocker):
+    """A committed synthetic catalog shared by the module's benchmarks."""
+    with django_db_blocker.unblock():
+        generate_library(**CATALOG_SIZES[request.param], seed=0)
+        with connection.cursor() as cursor:
+            # Fresh statistics, and no autovacuum competing with the measurements
+            cursor.execute("VACUUM ANALYZE")
+        yield request.param
+        with connection.cursor() as cursor:
+            cursor.execute("TRUNCATE library_books, library_users, library_categories CASCADE")
+
+
+def sign_in(client, user):
+    session = client.session
+    session["user_id"] = user.id
+    session["user_name"] = user.name
+    session["user_role"] = user.role
+    session.save()
+
+
+def clear_caches(i):
+    cache.clear()
+    search_results.clear()
+
+
+@pytest.mark.django_db
+class TestViewBenchmarks:
+    @pytest.fixture(autouse=True)
+    def setup(self, catalog, benchmark_results):
+        self.size = catalog
+        self.results = benchmark_results
+        self.client = Client()
+
+    def benchmark(self, name, call, setup=None):
+        key = f"{name}[{self.size}]"
+        result = measure(call, setup=setup)
+        self.results[key] = result
+        problems = check_result(key, result, QUERY_BUDGETS[name], {} if saving_baseline() else load_baseline())
+        assert not problems, "; ".join(problems)
+
+    def get(self, url, status=200):
+        response = self.client.get(url)
+        assert response.status_code == status
+        return response
+
+    def patron(self):
+        """A fresh patron with no loans, signed in on the benchmark client."""
+        user = Users.objects.create(name="Benchmark Patron", email="patron@benchmark.example", password="x")
+        sign_in(self.client, user)
+        return user
+
+    def available_books(self):
+        """One book in stock per benchmark iteration."""
+        count = WARMUP_ITERATIONS + benchmark_iterations()
+        return list(Books.objects.filter(quantity__gt=0).order_by("id").values_list("id", flat=True)[:count])
+
+    def test_index(self):
+        self.benchmark("index", lambda i: self.get(reverse("index")))
+
+    def test_index_cold(self):
+        self.benchmark("index_cold", lambda i: self.get(reverse("index")), setup=clear_caches)
+
+    def test_index_signed_in(self):
+        sign_in(self.client, Users.objects.filter(active_loans__gt=0).order_by("id").first())
+        self.benchmark("index_signed_in", lambda i: self.get(reverse("index")))
+
+    def test_search_api_cold(self):
+        url = reverse("search_books_api")
+        self.benchmark(
+            "search_api_cold",
+            lambda i: self.get(f"{url}?q={SEARCH_TERMS[i % len(SEARCH_TERMS)]}"),
+            setup=clear_caches,
+        )
+
+    def test_borrow_book(self):
+        user = self.patron()
+        books = self.available_books()
+
+        def return_previous(i):
+            # Stay under the loan limit by returning the previous checkout
+            if i:
+                return_loan(user.id, BooksBorrowed.objects.get(user_id=user, book_id=books[i - 1]).id)
+
+        def borrow(i):
+            response = self.get(reverse("borrow_book", args=[books[i]]), status=302)
+            assert response.url == reverse("user_dashboard")
+
+        self.benchmark("borrow_book", borrow, setup=return_previous)
+
+    def test_return_book(self):
+        user = self.patron()
+        books = self.available_books()
+        loans = {}
+
+        def borrow(i):
+            loans[i] = checkout_book(user.id, books[i]).id
+
+        self.benchmark(
+            "return_book", lambda i: self.get(reverse("return_book", args=[loans[i]]), status=302), setup=borrow
+        )
+        assert not BooksBorrowed.objects.filter(user_id=user).exists()
+
+    def test_user_dashboard(self):
+        sign_in(self.client, Users.objects.filter(active_loans__gt=1).order_by("id").first())
+        self.benchmark("user_dashboard", lambda i: self.get(reverse("user_dashboard")))
+
+    def test_admin_dashboard(self):
+        sign_in(self.client, Users.objects.create(name="Benchmark Admin", email="admin@benchmark.example",
+                                                  password="x", role="admin"))
+        self.benchmark("admin_dashboard", lambda i: self.get(reverse("admin_dashboard")))
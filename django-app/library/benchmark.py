@@ -0,0 +1,152 @@
+import json
+import math
+import os
+import platform
+import time
+import warnings
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Stored results of bench_views.py, compared against on every run
+BASELINE_PATH = Path(__file__).with_name("benchmark_baseline.json")
+
+DEFAULT_ITERATIONS = 30
+WARMUP_ITERATIONS = 3
+# A view has regressed when its fastest run is this fraction slower than
+# the baseline's fastest run (the minimum is far less sensitive to a busy
+# machine than the median)...
+DEFAULT_THRESHOLD = 1.0
+# ...and at least this many milliseconds slower, so that noise on
+# few-millisecond views never fails a run
+MIN_REGRESSION_MS = 5.0
+
+
+def benchmark_iterations():
+    return int(os.getenv("LIBRARY_BENCHMARK_ITERATIONS", DEFAULT_ITERATIONS))
+
+
+def regression_threshold():
+    return float(os.getenv("LIBRARY_BENCHMARK_THRESHOLD", DEFAULT_THRESHOLD))
+
+
+def saving_baseline():
+    """LIBRARY_BENCHMARK_SAVE=1 records this run as the new baseline instead of comparing."""
+    return os.getenv("LIBRARY_BENCHMARK_SAVE", "").lower() in ("1", "true", "yes")
+
+
+def percentile(samples, pct):
+    """Nearest-rank percentile of a list of numbers."""
+    ordered = sorted(samples)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+
+# ------------------------------
+# MEASURING
+# ------------------------------
+def measure(call, iterations=None, setup=None):
+    """
+    Time ``call(i)`` over warm-up plus measured iterations, counting the
+    queries of each call. ``setup(i)`` runs before each call, untimed. Each
+    iteration gets its own index, so calls that consume data (a checkout)
+    can pick a different row every time. Returns latency percentiles in
+    milliseconds and the largest query count of a single call.
+    """
+    iterations = iterations or benchmark_iterations()
+    timings, queries = [], []
+    for i in range(WARMUP_ITERATIONS + iterations):
+        if setup:
+            setup(i)
+        with CaptureQueriesContext(connection) as captured:
+            started = time.perf_counter()
+            call(i)
+            elapsed = time.perf_counter() - started
+        if i >= WARMUP_ITERATIONS:
+            timings.append(elapsed * 1000)
+            queries.append(len(captured))
+
+    return {
+        "iterations": iterations,
+        "min_ms": round(min(timings), 3),
+        "p50_ms": round(percentile(timings, 50), 3),
+        "p95_ms": round(percentile(timings, 95), 3),
+        "p99_ms": round(percentile(timings, 99), 3),
+        "max_ms": round(max(timings), 3),
+        "queries": max(queries),
+    }
+
+
+# ------------------------------
+# BASELINES
+# ------------------------------
+def read_baseline(path):
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return {}
+
+
+def load_baseline(path=BASELINE_PATH):
+    return read_baseline(path).get("results", {})
+
+
+def warn_if_other_python(path=BASELINE_PATH):
+    """
+    Warn when the baseline was recorded on another Python release than the
+    running one: interpreter changes alone move latencies, so a comparison
+    across them says little about the code.
+    """
+    recorded = read_baseline(path).get("machine", {}).get("python")
+    if recorded and recorded.split(".")[:2] != list(platform.python_version_tuple()[:2]):
+        warnings.warn(
+            f"The benchmark baseline was recorded on Python {recorded}, this is Python "
+            f"{platform.python_version()}; re-record it with LIBRARY_BENCHMARK_SAVE=1 on the Python in use.",
+            stacklevel=2,
+        )
+        return True
+    return False
+
+
+def save_baseline(results, path=BASELINE_PATH):
+    """Merge results into the baseline file, noting the machine they were measured on."""
+    baseline = load_baseline(path)
+    baseline.update(results)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "machine": {
+                "python": platform.python_version(),
+                "platform": platform.platform(terse=True),
+                "cpus": os.cpu_count(),
+            },
+            "results": dict(sorted(baseline.items())),
+        }, f, indent=2)
+        f.write("\n")
+
+
+def check_result(name, result, query_budget, baseline):
+    """Problems with a result: an exceeded query budget or a latency regression."""
+    problems = []
+    if result["queries"] > query_budget:
+        problems.append(f"{name}: {result['queries']} queries, budget is {query_budget}")
+
+    previous = baseline.get(name)
+    if previous:
+        allowed = max(previous["min_ms"] * (1 + regression_threshold()), previous["min_ms"] + MIN_REGRESSION_MS)
+        if result["min_ms"] > allowed:
+            problems.append(
+                f"{name}: fastest run {result['min_ms']:.2f} ms, baseline {previous['min_ms']:.2f} ms "
+                f"(allowed up to {allowed:.2f} ms)"
+            )
+    return problems
+
+
+def format_results(results):
+    lines = [f"{'benchmark':<32} {'min ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'queries':>8}"]
+    for name, result in sorted(results.items()):
+        lines.append(
+            f"{name:<32} {result['min_ms']:>9.2f} {result['p50_ms']:>9.2f} {result['p95_ms']:>9.2f} "
+            f"{result['p99_ms']:>9.2f} {result['queries']:>8}"
+        )
+    return lines
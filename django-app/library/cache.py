@@ -0,0 +1,203 @@
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+
+from .routers import use_primary
+
+CATALOG_VERSION_SEQUENCE = "library_catalog_version"
+
+# The catalog version the current request works with, read at most once
+# per request (signals.py forgets it when a request starts)
+request_catalog_version = ContextVar("library_request_catalog_version", default=None)
+
+# False from a bump until the version is next read: nothing can have been
+# cached under the bumped version in between
+catalog_version_read = ContextVar("library_catalog_version_read", default=True)
+
+# (version, monotonic time it was read) for the whole process, so requests
+# within LIBRARY_CATALOG_VERSION_TTL seconds of each other share one read
+process_catalog_version = (None, 0.0)
+
+
+# ------------------------------
+# CATALOG VERSION
+# ------------------------------
+# Every cached catalog artefact embeds the current catalog version in its
+# key. Writes to books, categories or their links bump the version, which
+# makes all older entries unreachable at once (they then age out). The
+# version is a sequence in the primary database rather than a value in the
+# (per-process, by default) cache, so a write in one worker invalidates
+# what every other worker has cached, and their ETags, too: at once in the
+# worker that wrote, within LIBRARY_CATALOG_VERSION_TTL in the others.
+
+def remember_catalog_version(version):
+    global process_catalog_version
+    process_catalog_version = (version, time.monotonic())
+    request_catalog_version.set(version)
+
+
+def recent_catalog_version():
+    """The process's last read of the version, if it is recent enough to reuse."""
+    version, read_at = process_catalog_version
+    if version is not None and time.monotonic() - read_at < settings.LIBRARY_CATALOG_VERSION_TTL:
+        return version
+    return None
+
+
+def catalog_version():
+    version = request_catalog_version.get() or recent_catalog_version()
+    if version is None:
+        with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+            cursor.execute(f"SELECT last_value FROM {CATALOG_VERSION_SEQUENCE}")
+            version = cursor.fetchone()[0]
+        remember_catalog_version(version)
+    request_catalog_version.set(version)
+    catalog_version_read.set(True)
+    return version
+
+
+async def acatalog_version():
+    version = request_catalog_version.get() or recent_catalog_version()
+    if version is None:
+        version = await sync_to_async(catalog_version)()
+    request_catalog_version.set(version)
+    catalog_version_read.set(True)
+    return version
+
+
+def bump_catalog_version():
+    with connections[DEFAULT_DB_ALIAS].cursor() as cursor:
+        cursor.execute(f"SELECT nextval('{CATALOG_VERSION_SEQUENCE}')")
+        remember_catalog_version(cursor.fetchone()[0])
+    catalog_version_read.set(False)
+
+
+def reset_catalog_version():
+    """Forget the versions read so far (tests)."""
+    global process_catalog_version
+    process_catalog_version = (None, 0.0)
+    request_catalog_version.set(None)
+    catalog_version_read.set(True)
+
+
+def invalidate_catalog():
+    """
+    Bump the version now, and again once the surrounding transaction commits,
+    so a page cached from pre-commit data in between is not served either.
+    A transaction writing many catalog rows bumps it twice in all: the commit
+    bump is registered once, and a write right after a bump skips its own
+    unless the version has been read (and maybe cached under) since.
+    """
+    connection = connections[DEFAULT_DB_ALIAS]
+    if not connection.in_atomic_block:
+        # Already committed (autocommit)
+        bump_catalog_version()
+        return
+    commit_bump_pending = any(func is bump_catalog_version for _, func, _ in connection.run_on_commit)
+    if commit_bump_pending and not catalog_version_read.get():
+        return
+    bump_catalog_version()
+    if not commit_bump_pending:
+        transaction.on_commit(bump_catalog_version)
+
+
+# ------------------------------
+# FRAGMENT CACHE
+# ------------------------------
+def catalog_cache_key(version, kind, *parts):
+    digest = hashlib.md5("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f"library:{kind}:{version}:{digest}"
+
+
+async def acached_catalog(kind, parts, compute):
+    """
+    Return the cached value for (kind, parts) at the current catalog version,
+    or compute it with the ``compute`` coroutine function and store it. It
+    is computed from the primary: a replica lagging behind the write that
+    bumped the version would get stale data cached under the new version
+    for LIBRARY_CATALOG_CACHE_TIMEOUT.
+    """
+    key = catalog_cache_key(await acatalog_version(), kind, *parts)
+    value = await cache.aget(key)
+    if value is None:
+        with use_primary():
+            value = await compute()
+        await cache.aset(key, value, settings.LIBRARY_CATALOG_CACHE_TIMEOUT)
+    return value
+
+
+# ------------------------------
+# SEARCH RESULT CACHE
+# ------------------------------
+def normalize_query(query):
+    """
+    Canonical form of a search: lower-cased, de-duplicated terms in sorted
+    order ("Potter  harry" and "harry potter" share one entry). Term order
+    and case do not change the result of the AND-ed prefix tsquery.
+    """
+    return " ".join(sorted(set(re.findall(r"\w+", query.lower()))))
+
+
+class SearchResultCache:
+    """
+    Per-process LRU cache of search results that stores only the matching
+    book ids (and the next page cursor), never the books themselves, so a
+    hit costs a dict lookup plus a primary-key fetch. Keys embed the shared
+    catalog version: a catalog write in any worker makes every older entry
+    unreachable, and those entries are evicted first as new searches come
+    in. Callers in async code load the version first (acatalog_version).
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self.entries = OrderedDict()
+        self.lock = threading.Lock()
+        self.hits = self.misses = 0
+
+    def get(self, key):
+        key = (catalog_version(), *key)
+        with self.lock:
+            value = self.entries.get(key)
+            if value is None:
+                self.misses += 1
+                return None
+            self.entries.move_to_end(key)
+            self.hits += 1
+            return value
+
+    def set(self, key, value):
+        if self.maxsize <= 0:
+            return
+        key = (catalog_version(), *key)
+        with self.lock:
+            self.entries[key] = value
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.maxsize:
+                self.entries.popitem(last=False)
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            self.hits = self.misses = 0
+
+    def stats(self):
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "size": len(self.entries),
+                "maxsize": self.maxsize,
+                "hit_rate": self.hits / lookups if lookups else 0.0,
+            }
+
+
+search_results = SearchResultCache(getattr(settings, "LIBRARY_SEARCH_CACHE_SIZE", 1024))
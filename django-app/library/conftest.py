@@ -0,0 +1,43 @@
+import os
+import subprocess
+import sys
+
+import pytest
+from django.core.cache import cache
+
+from .cache import reset_catalog_version, search_results
+
+
+@pytest.fixture(autouse=True)
+def clear_cache():
+    """The catalog caches outlive the per-test database rollback."""
+    cache.clear()
+    search_results.clear()
+    reset_catalog_version()
+    yield
+    cache.clear()
+    search_results.clear()
+    reset_catalog_version()
+
+
+@pytest.fixture(autouse=True)
+def thumbnail_root(settings, tmp_path):
+    """Keep resized covers written by tests out of the project tree."""
+    settings.LIBRARY_THUMBNAIL_ROOT = str(tmp_path / "thumbnails")
+    return tmp_path / "thumbnails"
+
+
+@pytest.fixture
+def settings_value():
+    """Evaluate an expression on freshly loaded settings in a new interpreter."""
+    def evaluate(expression, **env):
+        env = {
+            **{key: value for key, value in os.environ.items() if not key.startswith("LIBRARY_")},
+            "DJANGO_SETTINGS_MODULE": "LMS.settings",
+            **env,
+        }
+        return subprocess.run(
+            [sys.executable, "-c", f"from django.conf import settings; print({expression})"],
+            capture_output=True, text=True, env=env,
+        )
+    return evaluate
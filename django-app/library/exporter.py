@@ -0,0 +1,141 @@
+import csv
+import json
+from itertools import islice
+
+from asgiref.sync import sync_to_async
+
+from django.contrib.postgres.aggregates import ArrayAgg
+from django.db.models import Q
+
+from .importer import CSV_CATEGORY_SEPARATOR
+from .models import Books, BooksBorrowed, Categories
+
+# Rows fetched per round trip from the server-side cursor
+EXPORT_CHUNK_SIZE = 2000
+# Text chunks joined per thread hop when streaming to an async server
+EXPORT_ASYNC_BATCH = 500
+
+CATALOG_FIELDS = ["id", "book_name", "author", "quantity", "thumbnail", "categories"]
+LOAN_FIELDS = ["id", "user_id", "user_name", "user_email", "book_id", "book_name", "borrowed_date", "due_date"]
+
+
+class Echo:
+    """File-like object whose write() hands the line back, for csv.writer."""
+
+    def write(self, value):
+        return value
+
+
+# ------------------------------
+# ROW SOURCES
+# ------------------------------
+# Each source is one query streamed with iterator(), which uses a
+# PostgreSQL server-side cursor, so memory stays flat whatever the size.
+
+def catalog_rows(category_ids=False):
+    """Books with their category names (or Categories ids for the JSON layout)."""
+    category_field = "categoriesperbook__category_id" + ("" if category_ids else "__category_name")
+    return (
+        Books.objects
+        .order_by("id")
+        .annotate(categories=ArrayAgg(
+            category_field,
+            filter=Q(categoriesperbook__isnull=False),
+            order_by=category_field,
+            default=[],
+        ))
+        .values(*CATALOG_FIELDS)
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+
+
+def loan_rows():
+    loans = (
+        BooksBorrowed.objects
+        .order_by("id")
+        .values("id", "user_id", "user_id__name", "user_id__email", "book_id", "book_id__book_name",
+                "borrowed_date", "due_date")
+        .iterator(chunk_size=EXPORT_CHUNK_SIZE)
+    )
+    for loan in loans:
+        yield {
+            "id": loan["id"],
+            "user_id": loan["user_id"],
+            "user_name": loan["user_id__name"],
+            "user_email": loan["user_id__email"],
+            "book_id": loan["book_id"],
+            "book_name": loan["book_id__book_name"],
+            "borrowed_date": loan["borrowed_date"].isoformat(),
+            "due_date": loan["due_date"].isoformat(),
+        }
+
+
+# ------------------------------
+# FORMATS
+# ------------------------------
+# Every exporter is a generator of text chunks, usable both for
+# StreamingHttpResponse and for writing to a file.
+
+def export_csv(rows, fields):
+    writer = csv.writer(Echo())
+    yield writer.writerow(fields)
+    for row in rows:
+        if isinstance(row.get("categories"), list):
+            row = {**row, "categories": CSV_CATEGORY_SEPARATOR.join(row["categories"])}
+        yield writer.writerow([row[field] for field in fields])
+
+
+def export_jsonl(rows, fields):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + "\n"
+
+
+def export_catalog_json():
+    """The books.json layout, so an export can be fed back to load_books_data."""
+    yield '{\n  "categories": ['
+    separator = "\n    "
+    for category in Categories.objects.order_by("id").values("id", "category_name").iterator(chunk_size=EXPORT_CHUNK_SIZE):
+        yield separator + json.dumps(category, ensure_ascii=False)
+        separator = ",\n    "
+    yield '\n  ],\n  "books": ['
+    separator = "\n    "
+    for book in catalog_rows(category_ids=True):
+        yield separator + json.dumps(book, ensure_ascii=False)
+        separator = ",\n    "
+    yield "\n  ]\n}\n"
+
+
+DATASETS = {
+    "catalog": (catalog_rows, CATALOG_FIELDS),
+    "loans": (loan_rows, LOAN_FIELDS),
+}
+FORMATS = {"csv": "text/csv", "jsonl": "application/x-ndjson", "json": "application/json"}
+
+
+def export(dataset, export_format):
+    """Return a generator of text chunks for the dataset in the given format."""
+    if export_format == "json":
+        if dataset != "catalog":
+            raise ValueError("The json format is only available for the catalog")
+        return export_catalog_json()
+
+    rows, fields = DATASETS[dataset]
+    if export_format == "csv":
+        return export_csv(rows(), fields)
+    return export_jsonl(rows(), fields)
+
+
+async def aiter_chunks(chunks, batch_size=EXPORT_ASYNC_BATCH):
+    """
+    Stream a sync chunk generator to an ASGI response. Given a sync
+    iterator, Django's ASGI handler collects the whole response in memory
+    first; this pulls ``batch_size`` chunks at a time through sync_to_async
+    instead, so memory stays flat. Every batch runs on the request's
+    database thread, where the server-side cursor lives.
+    """
+    next_batch = sync_to_async(lambda: list(islice(chunks, batch_size)), thread_sensitive=True)
+    try:
+        while batch := await next_batch():
+            yield "".join(batch)
+    finally:
+        await sync_to_async(chunks.close, thread_sensitive=True)()
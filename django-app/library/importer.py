@@ -0,0 +1,280 @@
+import csv
+import json
+import time
+from itertools import islice
+
+from django.db import transaction
+
+from .cache import invalidate_catalog
+from .models import Books, Categories, CategoriesPerBook
+from .search import bulk_update_search_vector, update_search_vector
+
+DEFAULT_BATCH_SIZE = 1000
+READ_CHUNK_SIZE = 64 * 1024
+CSV_CATEGORY_SEPARATOR = "|"
+
+
+def batched(iterable, size):
+    iterator = iter(iterable)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+# ------------------------------
+# FEED READERS
+# ------------------------------
+# Every reader yields book rows of the same shape, with categories given
+# by name: {"book_name", "author", "quantity", "thumbnail", "categories"}.
+
+class JSONStream:
+    """
+    Incremental reader for one large JSON document. Values are decoded one
+    at a time from a bounded buffer, so memory depends on the size of the
+    biggest single value, not on the size of the file.
+    """
+
+    def __init__(self, f):
+        self.f = f
+        self.buffer = ""
+        self.pos = 0
+        self.eof = False
+        self.decoder = json.JSONDecoder()
+
+    def fill(self):
+        chunk = self.f.read(READ_CHUNK_SIZE)
+        if not chunk:
+            self.eof = True
+            return False
+        self.buffer = self.buffer[self.pos:] + chunk
+        self.pos = 0
+        return True
+
+    def peek(self):
+        while True:
+            while self.pos < len(self.buffer) and self.buffer[self.pos].isspace():
+                self.pos += 1
+            if self.pos < len(self.buffer):
+                return self.buffer[self.pos]
+            if not self.fill():
+                return ""
+
+    def expect(self, char):
+        if self.peek() != char:
+            raise ValueError(f"Expected {char!r} at offset {self.pos} of the read buffer")
+        self.pos += 1
+
+    def value(self):
+        self.peek()
+        while True:
+            try:
+                value, end = self.decoder.raw_decode(self.buffer, self.pos)
+            except json.JSONDecodeError:
+                if not self.fill():
+                    raise
+                continue
+            # A number at the very end of the buffer may continue in the next chunk
+            if end == len(self.buffer) and not self.eof and self.fill():
+                continue
+            self.pos = end
+            return value
+
+    def items(self):
+        """Yield (key, value) for a top-level object; array values are yielded lazily."""
+        self.expect("{")
+        while self.peek() != "}":
+            key = self.value()
+            self.expect(":")
+            if self.peek() == "[":
+                yield key, self.array()
+            else:
+                yield key, self.value()
+            if self.peek() == ",":
+                self.pos += 1
+        self.expect("}")
+
+    def array(self):
+        self.expect("[")
+        while self.peek() != "]":
+            yield self.value()
+            if self.peek() == ",":
+                self.pos += 1
+        self.expect("]")
+
+
+def read_json_feed(f, on_categories=None):
+    """
+    Stream the ``{"categories": [...], "books": [...]}`` layout. Categories
+    must come before books (as in books.json), since books refer to them
+    by feed id. ``on_categories(names)`` receives the full category list,
+    including categories no book uses yet.
+    """
+    category_names = None
+    for key, value in JSONStream(f).items():
+        if key == "categories":
+            category_names = {cat["id"]: cat["category_name"] for cat in value}
+            if on_categories:
+                on_categories(category_names.values())
+        elif key == "books":
+            if category_names is None:
+                raise ValueError('"categories" must come before "books" in the feed')
+            for book in value:
+                yield {
+                    **book,
+                    "categories": [
+                        category_names[cat_id] for cat_id in book.get("categories", [])
+                        if cat_id in category_names
+                    ],
+                }
+        elif hasattr(value, "__next__"):
+            for _ in value:
+                pass
+
+
+def read_jsonl_feed(f, on_categories=None):
+    """One book object per line, with "categories" as a list of names."""
+    for line in f:
+        if line.strip():
+            yield json.loads(line)
+
+
+def read_csv_feed(f, on_categories=None):
+    """
+    CSV with a header row: book_name, author, quantity, thumbnail, categories
+    (category names separated by "|").
+    """
+    for row in csv.DictReader(f):
+        yield {
+            "book_name": row["book_name"],
+            "author": row["author"],
+            "quantity": int(row.get("quantity") or 1),
+            "thumbnail": row.get("thumbnail", ""),
+            "categories": [name for name in (row.get("categories") or "").split(CSV_CATEGORY_SEPARATOR) if name],
+        }
+
+
+FEED_READERS = {
+    "json": read_json_feed,
+    "jsonl": read_jsonl_feed,
+    "csv": read_csv_feed,
+}
+
+
+# ------------------------------
+# BULK CATALOG IMPORT
+# ------------------------------
+def import_categories(names, category_ids):
+    """
+    Resolve category names to ids, creating the missing categories (matched
+    by name, like get_or_create). ``category_ids`` is a name -> id cache
+    shared across batches and is updated in place.
+    """
+    missing = set(names) - category_ids.keys()
+    if not missing:
+        return category_ids
+
+    category_ids.update(Categories.objects.filter(category_name__in=missing).values_list("category_name", "id"))
+    new = [Categories(category_name=name) for name in missing if name not in category_ids]
+    for category in Categories.objects.bulk_create(new):
+        category_ids[category.category_name] = category.id
+    if new:
+        invalidate_catalog()
+    return category_ids
+
+
+def book_ids_by_key(keys):
+    """Ids of the books with the given (book_name, author) keys, by key."""
+    keys = set(keys)
+    found = (
+        Books.objects
+        .filter(book_name__in={name for name, _ in keys}, author__in={author for _, author in keys})
+        .values_list("book_name", "author", "id")
+    )
+    return {(name, author): book_id for name, author, book_id in found if (name, author) in keys}
+
+
+@transaction.atomic
+def import_books_batch(batch, category_ids):
+    """
+    Insert one batch of feed books and their category links with a fixed
+    number of queries. Books are matched on their natural key (title and
+    author, unique in the database) and only missing ones are inserted, with
+    ON CONFLICT DO NOTHING, so re-running a feed writes nothing and
+    concurrent imports of the same feed cannot duplicate a book.
+    Returns (books created, links created).
+    """
+    rows = {}
+    for book in batch:
+        rows.setdefault((book["book_name"], book["author"]), book)
+
+    import_categories({name for book in batch for name in book.get("categories", [])}, category_ids)
+
+    book_ids = book_ids_by_key(rows)
+    missing = [key for key in rows if key not in book_ids]
+    if missing:
+        # A book a concurrent import added meanwhile is skipped by the
+        # database and picked up by the lookup that follows
+        Books.objects.bulk_create(
+            [
+                Books(
+                    book_name=name,
+                    author=author,
+                    quantity=rows[name, author].get("quantity", 1),
+                    thumbnail=rows[name, author].get("thumbnail", ""),
+                )
+                for name, author in missing
+            ],
+            ignore_conflicts=True,
+        )
+        book_ids.update(book_ids_by_key(missing))
+    created = {book_ids[key] for key in missing}
+
+    links = {
+        (book_ids[book["book_name"], book["author"]], category_ids[name])
+        for book in batch
+        for name in book.get("categories", [])
+    }
+    existing_links = set(
+        CategoriesPerBook.objects
+        .filter(book_id__in={book_id for book_id, _ in links})
+        .values_list("book_id", "category_id")
+    )
+    new_links = links - existing_links
+    # A concurrent import may have linked the same pair in the meantime
+    CategoriesPerBook.objects.bulk_create([
+        CategoriesPerBook(book_id_id=book_id, category_id_id=category_id)
+        for book_id, category_id in new_links
+    ], ignore_conflicts=True)
+
+    # bulk_create skips signals, so refresh the search index explicitly:
+    # set-based from the first created book on, and by id for existing books
+    # that only gained links
+    if created:
+        bulk_update_search_vector(min(created))
+    relinked = {book_id for book_id, _ in new_links} - created
+    if relinked:
+        update_search_vector(relinked)
+    if created or relinked:
+        invalidate_catalog()
+
+    return len(created), len(new_links)
+
+
+def import_books(books, category_ids=None, batch_size=DEFAULT_BATCH_SIZE, progress=None):
+    """
+    Import an iterable of feed books in batches, each committed on its own.
+    ``progress(rows, rows_per_second)`` is called after every committed
+    batch. Returns (rows read, books created, links created).
+    """
+    category_ids = {} if category_ids is None else category_ids
+    started = time.monotonic()
+    rows = books_created = links_created = 0
+
+    for batch in batched(books, batch_size):
+        created, linked = import_books_batch(batch, category_ids)
+        rows += len(batch)
+        books_created += created
+        links_created += linked
+        if progress:
+            progress(rows, rows / max(time.monotonic() - started, 1e-9))
+
+    return rows, books_created, links_created
@@ -0,0 +1,82 @@
+import re
+import time
+from collections import Counter
+from contextlib import ExitStack
+from contextvars import ContextVar
+
+from django.db import connections
+
+# The profile of the request being served, if it is instrumented
+current_profile = ContextVar("library_request_profile", default=None)
+
+SQL_LITERALS = re.compile(r"'(?:[^']|'')*'|\b\d+(?:\.\d+)?\b")
+IN_LISTS = re.compile(r"\bIN \(\?(?:, \?)*\)", re.IGNORECASE)
+# Transaction control (savepoints etc.) repeats legitimately
+DATA_STATEMENTS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+
+def sql_shape(sql):
+    """
+    The SQL with literals and parameters replaced by ``?`` and IN lists
+    collapsed, so the same query for different rows has the same shape.
+    """
+    shape = " ".join(SQL_LITERALS.sub("?", sql.replace("%s", "?")).split())
+    return IN_LISTS.sub("IN (...)", shape)
+
+
+class RequestProfile:
+    """
+    Where one request spent its time: the queries it ran (on every
+    database alias) and how long they took, and how long its templates took
+    to render. Queries are recorded through ``connection.execute_wrapper``,
+    so it works without DEBUG and costs a timer call per query.
+    """
+
+    def __init__(self):
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0
+        self.shapes = Counter()
+        self.rendering = 0
+
+    def record_query(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - started
+            self.queries += 1
+            self.shapes[sql_shape(sql)] += 1
+
+    def recording(self):
+        """Context manager recording the queries run on any connection meanwhile."""
+        stack = ExitStack()
+        for conn in connections.all():
+            stack.enter_context(conn.execute_wrapper(self.record_query))
+        return stack
+
+    def rendering_template(self):
+        """Context manager timing a template render; nested renders count once."""
+        return TemplateTimer(self)
+
+    def repeated_queries(self, threshold):
+        """Shapes run at least ``threshold`` times, most repeated first (likely N+1 queries)."""
+        return [
+            (shape, count) for shape, count in self.shapes.most_common()
+            if count >= threshold and shape.split(" ", 1)[0].upper() in DATA_STATEMENTS
+        ]
+
+
+class TemplateTimer:
+    def __init__(self, profile):
+        self.profile = profile
+
+    def __enter__(self):
+        if not self.profile.rendering:
+            self.started = time.perf_counter()
+        self.profile.rendering += 1
+
+    def __exit__(self, *exc_info):
+        self.profile.rendering -= 1
+        if not self.profile.rendering:
+            self.profile.template_time += time.perf_counter() - self.started
@@ -0,0 +1,162 @@
+import asyncio
+import re
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from itertools import cycle, islice
+from urllib.parse import urlencode
+
+from django.core.cache import cache
+from django.core.management.base import BaseCommand
+from library.cache import search_results
+from library.models import Books
+
+class Command(BaseCommand):
+    help = (
+        "Compare concurrent-request throughput of the WSGI (LMS.wsgi) and ASGI "
+        "(LMS.asgi) entry points on the catalog views, in process."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests',
+            type=int,
+            default=400,
+            help='Requests sent to each entry point (default: 400)'
+        )
+        parser.add_argument(
+            '--concurrency',
+            type=int,
+            default=16,
+            help='Requests in flight at once: WSGI worker threads, or concurrent ASGI requests (default: 16)'
+        )
+
+    def handle(self, *args, **kwargs):
+        from LMS.asgi import application as asgi_application
+        from LMS.wsgi import application as wsgi_application
+
+        urls = list(islice(cycle(self.workload()), kwargs['requests']))
+        concurrency = kwargs['concurrency']
+
+        self.stdout.write(f"➡️ {len(urls)} requests per entry point, {concurrency} in flight...")
+        results = {
+            "WSGI": self.run_wsgi(wsgi_application, urls, concurrency),
+            "ASGI": self.run_asgi(asgi_application, urls, concurrency),
+        }
+
+        self.stdout.write(f"\n{'':6}{'req/s':>10}{'p50 ms':>10}{'p95 ms':>10}{'errors':>8}")
+        for name, (elapsed, latencies, errors) in results.items():
+            p50 = statistics.median(latencies) * 1000
+            p95 = statistics.quantiles(latencies, n=20)[-1] * 1000
+            self.stdout.write(f"{name:6}{len(urls) / elapsed:>10.1f}{p50:>10.1f}{p95:>10.1f}{errors:>8}")
+
+        speedup = results["WSGI"][0] / results["ASGI"][0]
+        self.stdout.write(self.style.SUCCESS(f"\n✅ ASGI throughput is {speedup:.2f}x WSGI"))
+
+    def workload(self):
+        """Homepage, live-search (HTML and JSON) and feed requests over words taken from the catalog."""
+        titles = Books.objects.order_by("id").values_list("book_name", flat=True)[:50]
+        words = sorted({word.lower() for title in titles for word in re.findall(r"\w{4,}", title)}) or ["book"]
+        urls = []
+        for word in words:
+            urls += [
+                ("/", ""),
+                ("/", urlencode({"q": word})),
+                ("/api/books/search", urlencode({"q": word})),
+                ("/api/books/search", urlencode({"q": word, "format": "html"})),
+                ("/books/feed", urlencode({"after": "1"})),
+            ]
+        return urls
+
+    def reset_caches(self):
+        # Both entry points start cold and then warm up on the same sequence
+        cache.clear()
+        search_results.clear()
+
+    def run_wsgi(self, application, urls, concurrency):
+        def request(url):
+            path, query = url
+            environ = {
+                "REQUEST_METHOD": "GET",
+                "PATH_INFO": path,
+                "QUERY_STRING": query,
+                "SERVER_NAME": "localhost",
+                "SERVER_PORT": "80",
+                "SERVER_PROTOCOL": "HTTP/1.1",
+                "HTTP_HOST": "localhost",
+                "wsgi.url_scheme": "http",
+                "wsgi.input": BytesIO(),
+                "wsgi.errors": BytesIO(),
+                "wsgi.multithread": True,
+                "wsgi.multiprocess": False,
+                "wsgi.run_once": False,
+            }
+            statuses = []
+            started = time.perf_counter()
+            response = application(environ, lambda status, headers, exc_info=None: statuses.append(status))
+            try:
+                b"".join(response)
+            finally:
+                response.close()
+            return time.perf_counter() - started, not statuses[0].startswith("200")
+
+        self.reset_caches()
+        started = time.perf_counter()
+        with ThreadPoolExecutor(max_workers=concurrency) as pool:
+            timings = list(pool.map(request, urls))
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in timings], sum(error for _, error in timings)
+
+    def run_asgi(self, application, urls, concurrency):
+        async def request(url):
+            path, query = url
+            scope = {
+                "type": "http",
+                "asgi": {"version": "3.0"},
+                "http_version": "1.1",
+                "method": "GET",
+                "scheme": "http",
+                "path": path,
+                "raw_path": path.encode(),
+                "query_string": query.encode(),
+                "root_path": "",
+                "headers": [(b"host", b"localhost")],
+                "client": ("127.0.0.1", 0),
+                "server": ("localhost", 80),
+            }
+            body_sent = asyncio.Event()
+            disconnected = asyncio.Event()
+            status = []
+
+            async def receive():
+                if not body_sent.is_set():
+                    body_sent.set()
+                    return {"type": "http.request", "body": b"", "more_body": False}
+                # The client stays connected until the response is complete
+                await disconnected.wait()
+                return {"type": "http.disconnect"}
+
+            async def send(message):
+                if message["type"] == "http.response.start":
+                    status.append(message["status"])
+
+            started = time.perf_counter()
+            await application(scope, receive, send)
+            disconnected.set()
+            return time.perf_counter() - started, status[0] != 200
+
+        async def run():
+            slots = asyncio.Semaphore(concurrency)
+
+            async def limited(url):
+                async with slots:
+                    return await request(url)
+
+            return await asyncio.gather(*(limited(url) for url in urls))
+
+        self.reset_caches()
+        started = time.perf_counter()
+        timings = asyncio.run(run())
+        elapsed = time.perf_counter() - started
+        return elapsed, [latency for latency, _ in timings], sum(error for _, error in timings)
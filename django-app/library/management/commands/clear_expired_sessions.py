@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+from library.sessions import clear_expired_sessions, uses_session_table
+
+class Command(BaseCommand):
+    help = "Delete expired sessions from the session table in small batches."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--batch-size",
+            type=int,
+            default=None,
+            help="Sessions deleted per statement (default: LIBRARY_SESSION_CLEANUP_BATCH_SIZE)",
+        )
+        parser.add_argument(
+            "--pause",
+            type=float,
+            default=0,
+            help="Seconds to wait between batches",
+        )
+
+    def handle(self, *args, **kwargs):
+        if not uses_session_table():
+            self.stdout.write("✅ Sessions are not stored in the database; they expire on their own.")
+            return
+
+        self.stdout.write("➡️ Deleting expired sessions...")
+        deleted = clear_expired_sessions(
+            batch_size=kwargs["batch_size"],
+            pause=kwargs["pause"],
+            progress=lambda count: self.stdout.write(f"   {count} deleted"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"\n✅ {deleted} expired sessions deleted!"))
@@ -0,0 +1,40 @@
+import sys
+from django.core.management.base import BaseCommand, CommandError
+from library.exporter import DATASETS, FORMATS, export
+
+class Command(BaseCommand):
+    help = "Stream the catalog or the active loans to a CSV, JSONL or books.json-style file."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'output',
+            type=str,
+            help='Path of the file to write, or - for stdout'
+        )
+        parser.add_argument(
+            '--dataset',
+            choices=sorted(DATASETS),
+            default='catalog',
+            help='What to export (default: catalog)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(FORMATS),
+            default='csv',
+            help='Output format; json is the books.json layout (default: csv)'
+        )
+
+    def handle(self, *args, **kwargs):
+        try:
+            chunks = export(kwargs['dataset'], kwargs['format'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        if kwargs['output'] == '-':
+            sys.stdout.writelines(chunks)
+            return
+
+        with open(kwargs['output'], 'w', encoding='utf-8', newline='') as f:
+            f.writelines(chunks)
+
+        self.stdout.write(self.style.SUCCESS(f"✅ Exported {kwargs['dataset']} to {kwargs['output']}"))
@@ -0,0 +1,70 @@
+import time
+
+from django.core.management.base import BaseCommand
+from library.synthetic import SYNTHETIC_PASSWORD, generate_library
+
+
+class Command(BaseCommand):
+    help = "Add a seeded, deterministic synthetic library (books, categories, users and loans) for load testing."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--books',
+            type=int,
+            default=100_000,
+            help='Books to create (default: 100000)'
+        )
+        parser.add_argument(
+            '--categories',
+            type=int,
+            default=50,
+            help='Categories to spread the books over; existing ones with the same name are reused (default: 50)'
+        )
+        parser.add_argument(
+            '--users',
+            type=int,
+            default=10_000,
+            help='Users to create (default: 10000)'
+        )
+        parser.add_argument(
+            '--loans',
+            type=int,
+            default=20_000,
+            help='Open loans to create, capped by the users\' loan limits and the stock (default: 20000)'
+        )
+        parser.add_argument(
+            '--seed',
+            type=int,
+            default=0,
+            help='Random seed; the same seed and sizes give the same library (default: 0)'
+        )
+
+    def handle(self, *args, **kwargs):
+        for option in ('books', 'categories', 'users', 'loans'):
+            if kwargs[option] < 0:
+                self.stdout.write(self.style.ERROR(f"❌ --{option} cannot be negative"))
+                return
+
+        self.stdout.write(
+            f"➡️ Generating {kwargs['books']} books, {kwargs['categories']} categories, "
+            f"{kwargs['users']} users and {kwargs['loans']} loans (seed {kwargs['seed']})..."
+        )
+        started = time.monotonic()
+
+        def progress(table, rows):
+            self.stdout.write(f"   {table}: {rows} rows ({time.monotonic() - started:.1f}s)")
+
+        created = generate_library(
+            kwargs['books'], kwargs['categories'], kwargs['users'], kwargs['loans'],
+            seed=kwargs['seed'], progress=progress,
+        )
+
+        if created['loans'] < kwargs['loans']:
+            self.stdout.write(self.style.WARNING(
+                f"⚠️ Only {created['loans']} loans fit the users' loan limits and the stock"
+            ))
+        self.stdout.write(self.style.SUCCESS(
+            f"\n✅ {created['books']} books, {created['categories_per_book']} category links, "
+            f"{created['users']} users and {created['loans']} loans created in {time.monotonic() - started:.1f}s!"
+        ))
+        self.stdout.write(f"   Synthetic users sign in with the password {SYNTHETIC_PASSWORD}")
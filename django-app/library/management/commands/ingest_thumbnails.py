@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand
+from library.thumbnails import ingest_thumbnails, pending_thumbnails
+
+
+class Command(BaseCommand):
+    help = "Fetch, resize and store the covers of books whose thumbnail URL has not been ingested yet."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--retry-failed",
+            action="store_true",
+            help="Also retry covers that could not be fetched before",
+        )
+        parser.add_argument(
+            "--watch",
+            type=float,
+            metavar="SECONDS",
+            help="Keep running as a worker, looking for newly saved covers every SECONDS",
+        )
+
+    def handle(self, *args, **options):
+        if options["watch"] is None:
+            self.ingest(options["retry_failed"])
+            return
+
+        self.stdout.write(f"👀 Watching for new covers every {options['watch']:g}s (Ctrl+C to stop)...")
+        try:
+            while True:
+                # Failed covers are retried on the first pass only
+                if pending_thumbnails(options["retry_failed"]).exists():
+                    self.ingest(options["retry_failed"])
+                options["retry_failed"] = False
+                time.sleep(options["watch"])
+        except KeyboardInterrupt:
+            pass
+
+    def ingest(self, retry_failed):
+        pending = pending_thumbnails(retry_failed).count()
+        self.stdout.write(f"➡️ Ingesting {pending} covers...")
+
+        def progress(ingested, failed):
+            done = ingested + failed
+            if done % 50 == 0 or done == pending:
+                self.stdout.write(f"   {done}/{pending} covers ({failed} failed)")
+
+        ingested, failed = ingest_thumbnails(retry_failed, progress=progress)
+
+        self.stdout.write(self.style.SUCCESS(f"\n✅ {ingested} covers ingested!"))
+        if failed:
+            self.stdout.write(self.style.WARNING(f"⚠️ {failed} covers could not be fetched; they show the placeholder."))
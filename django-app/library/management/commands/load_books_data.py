@@ -1,32 +1,68 @@
 import json
+import os
+from itertools import islice
 from django.core.management.base import BaseCommand
 from library.models import Books, Categories, CategoriesPerBook
 from django.db import transaction
+from library.importer import DEFAULT_BATCH_SIZE, FEED_READERS, import_books, import_categories
 
 class Command(BaseCommand):
-    help = "Load books and categories from a JSON file."
+    help = "Load books and categories from a JSON, JSONL or CSV feed."
 
     def add_arguments(self, parser):
         parser.add_argument(
             'json_file',
             type=str,
-            help='Path to the JSON file (e.g. books.json)'
+            help='Path to the feed file (e.g. books.json, books.jsonl, books.csv)'
+        )
+        parser.add_argument(
+            '--format',
+            choices=sorted(FEED_READERS),
+            help='Feed format (default: from the file extension)'
+        )
+        parser.add_argument(
+            '--bulk',
+            action='store_true',
+            help='Stream the feed through batched bulk inserts (fast, idempotent). Always on for JSONL and CSV.'
+        )
+        parser.add_argument(
+            '--batch-size',
+            type=int,
+            default=DEFAULT_BATCH_SIZE,
+            help=f'Rows per batch in bulk mode (default: {DEFAULT_BATCH_SIZE})'
+        )
+        parser.add_argument(
+            '--resume',
+            action='store_true',
+            help='Skip the rows already committed by a previous interrupted bulk run'
         )
 
-    @transaction.atomic
     def handle(self, *args, **kwargs):
         json_file = kwargs['json_file']
+        feed_format = kwargs['format'] or os.path.splitext(json_file)[1].lstrip('.').lower()
 
-        try:
-            with open(json_file, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-        except FileNotFoundError:
+        if feed_format not in FEED_READERS:
+            self.stdout.write(self.style.ERROR(f"❌ Unknown feed format: {feed_format}"))
+            return
+
+        if not os.path.exists(json_file):
             self.stdout.write(self.style.ERROR(f"❌ File not found: {json_file}"))
             return
-        except json.JSONDecodeError as e:
-            self.stdout.write(self.style.ERROR(f"❌ Invalid JSON: {e}"))
+
+        try:
+            if kwargs['bulk'] or feed_format != 'json':
+                self.load_bulk(json_file, feed_format, kwargs['batch_size'], kwargs['resume'])
+            else:
+                with open(json_file, 'r', encoding='utf-8') as f:
+                    self.load(json.load(f))
+        except (json.JSONDecodeError, ValueError) as e:
+            self.stdout.write(self.style.ERROR(f"❌ Invalid feed: {e}"))
             return
 
+        self.stdout.write(self.style.SUCCESS("\n✅ Books and categories loaded successfully!"))
+
+    @transaction.atomic
+    def load(self, data):
         # Load categories
         self.stdout.write("➡️ Loading categories...")
         category_map = {}
@@ -39,8 +75,8 @@ class Command(BaseCommand):
         for book in data.get("books", []):
             book_obj, _ = Books.objects.get_or_create(
                 book_name=book["book_name"],
+                author=book["author"],
                 defaults={
-                    "author": book["author"],
                     "quantity": book.get("quantity", 1),
                     "thumbnail": book.get("thumbnail", "")
                 }
@@ -55,4 +91,45 @@ class Command(BaseCommand):
                         category_id=cat_obj
                     )
 
-        self.stdout.write(self.style.SUCCESS("\n✅ Books and categories loaded successfully!"))
+    def load_bulk(self, path, feed_format, batch_size, resume):
+        checkpoint_path = f"{path}.checkpoint"
+        skip = self.read_checkpoint(checkpoint_path, path) if resume else 0
+        category_ids = {}
+
+        self.stdout.write("➡️ Loading books...")
+        if skip:
+            self.stdout.write(f"   resuming after {skip} committed rows")
+
+        def progress(rows, rows_per_second):
+            self.write_checkpoint(checkpoint_path, path, skip + rows)
+            self.stdout.write(f"   {skip + rows} rows ({rows_per_second:,.0f} rows/s)")
+
+        with open(path, 'r', encoding='utf-8', newline='') as f:
+            books = FEED_READERS[feed_format](
+                f, on_categories=lambda names: import_categories(names, category_ids)
+            )
+            rows, books_created, links_created = import_books(
+                islice(books, skip, None), category_ids, batch_size=batch_size, progress=progress
+            )
+
+        if os.path.exists(checkpoint_path):
+            os.remove(checkpoint_path)
+        self.stdout.write(
+            f"\n📚 {skip + rows} rows read, {books_created} books and {links_created} category links created."
+        )
+
+    def read_checkpoint(self, checkpoint_path, path):
+        try:
+            with open(checkpoint_path, 'r', encoding='utf-8') as f:
+                checkpoint = json.load(f)
+        except (FileNotFoundError, json.JSONDecodeError):
+            return 0
+        # A checkpoint only applies to the exact feed it was written for
+        if checkpoint.get("size") != os.path.getsize(path):
+            self.stdout.write(self.style.WARNING("⚠️ Feed changed since the checkpoint, starting over"))
+            return 0
+        return checkpoint.get("rows", 0)
+
+    def write_checkpoint(self, checkpoint_path, path, rows):
+        with open(checkpoint_path, 'w', encoding='utf-8') as f:
+            json.dump({"rows": rows, "size": os.path.getsize(path)}, f)
@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+from library.search import update_search_vector
+
+class Command(BaseCommand):
+    help = "Recompute the full-text search vector of every book."
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write("➡️ Rebuilding search index...")
+        updated = update_search_vector()
+        self.stdout.write(self.style.SUCCESS(f"\n✅ Search index rebuilt for {updated} books!"))
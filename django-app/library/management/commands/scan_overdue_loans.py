@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from library.overdue import OVERDUE_CHUNK_SIZE, resume_point, scan_overdue_loans
+
+class Command(BaseCommand):
+    help = "Queue a notice in the overdue outbox for every overdue loan."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size',
+            type=int,
+            default=OVERDUE_CHUNK_SIZE,
+            help=f'Loans per chunk (default: {OVERDUE_CHUNK_SIZE})'
+        )
+        parser.add_argument(
+            '--full',
+            action='store_true',
+            help='Scan every overdue loan instead of resuming from the first one without a notice'
+        )
+
+    def handle(self, *args, **kwargs):
+        now = timezone.now()
+        after = None if kwargs['full'] else resume_point(now)
+
+        self.stdout.write("➡️ Scanning overdue loans...")
+        if after:
+            self.stdout.write(f"   resuming from the first loan without a notice (due {after[0]:%Y-%m-%d})")
+
+        scanned, queued = scan_overdue_loans(
+            now=now,
+            after=after,
+            chunk_size=kwargs['chunk_size'],
+            progress=lambda scanned, queued: self.stdout.write(f"   {scanned} loans scanned, {queued} notices queued"),
+        )
+        self.stdout.write(self.style.SUCCESS(f"\n✅ {scanned} overdue loans scanned, {queued} notices queued!"))
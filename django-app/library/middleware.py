@@ -0,0 +1,167 @@
+import logging
+import time
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connection
+from django.utils.deprecation import MiddlewareMixin
+
+from .instrumentation import RequestProfile, current_profile
+from .profiling import PROFILE_HEADER, profile_view, save_profile, should_profile
+from .routers import has_written, pinned_to_primary
+
+PRIMARY_PIN_COOKIE = "library_primary"
+
+logger = logging.getLogger("library.requests")
+
+
+def add_server_timing(response, *metrics):
+    response.headers["Server-Timing"] = ", ".join(filter(None, [response.headers.get("Server-Timing"), *metrics]))
+
+
+class ConnectionSetupTimingMiddleware(MiddlewareMixin):
+    """
+    Add the time this request spent setting up its database connection to
+    the response as ``Server-Timing: db-connect;dur=<ms>``. A request on a
+    kept persistent connection reports 0; with pooling it is the pool
+    checkout. Under ASGI both hooks run in the request's database thread.
+    """
+
+    def process_request(self, request):
+        request.db_connection_setups = connection.connection_setups
+        request.db_connection_setup_time = connection.connection_setup_time
+
+    def process_response(self, request, response):
+        if not hasattr(request, "db_connection_setups"):
+            return response
+        setups = connection.connection_setups - request.db_connection_setups
+        elapsed = connection.connection_setup_time - request.db_connection_setup_time
+        add_server_timing(response, f'db-connect;dur={elapsed * 1000:.2f};desc="{setups} new"')
+        return response
+
+
+class SQLInstrumentationMiddleware(MiddlewareMixin):
+    """
+    Opt-in (LIBRARY_SQL_INSTRUMENTATION) breakdown of where a request spent
+    its time, without DEBUG: the number and total duration of its queries,
+    template rendering and the view (timed from process_view, so it
+    includes the middleware inside this one on the way out). Reported as
+    Server-Timing metrics and as one ``library.requests`` log line per
+    request. Queries of the same shape run LIBRARY_SQL_REPEAT_THRESHOLD
+    times or more are logged as a warning, as they usually are an N+1
+    lookup in a loop.
+
+    A streamed response sends its headers before the body runs its queries,
+    so it only carries ``Server-Timing: sql;desc="streamed"``; recording goes
+    on until the response is closed, and the log line then covers the body.
+    """
+
+    def __init__(self, get_response):
+        if not settings.LIBRARY_SQL_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_request(self, request):
+        request.request_started = time.perf_counter()
+        request.request_profile = RequestProfile()
+        request.request_recording = request.request_profile.recording()
+        current_profile.set(request.request_profile)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        request.view_started = time.perf_counter()
+
+    def process_response(self, request, response):
+        if not hasattr(request, "request_profile"):
+            return response
+        if response.streaming:
+            add_server_timing(response, 'sql;desc="streamed"')
+            response._resource_closers.append(lambda: self.finish(request, response))
+            return response
+
+        fields, repeated = self.finish(request, response)
+        add_server_timing(
+            response,
+            f'sql;dur={fields["sql_ms"]:.2f};desc="{fields["queries"]} queries"',
+            f'template;dur={fields["template_ms"]:.2f}',
+            f'view;dur={fields["view_ms"]:.2f}',
+            f'total;dur={fields["total_ms"]:.2f}',
+            f'sql-repeated;desc="{len(repeated)} shapes"' if repeated else None,
+        )
+        return response
+
+    def finish(self, request, response):
+        """Stop recording and log the request. Returns its log fields and repeated query shapes."""
+        request.request_recording.close()
+        current_profile.set(None)
+        finished = time.perf_counter()
+        profile = request.request_profile
+        view_ms = (finished - request.view_started) * 1000 if hasattr(request, "view_started") else 0.0
+        repeated = profile.repeated_queries(settings.LIBRARY_SQL_REPEAT_THRESHOLD)
+
+        fields = {
+            "method": request.method,
+            "path": request.path,
+            "status": response.status_code,
+            "queries": profile.queries,
+            "sql_ms": round(profile.sql_time * 1000, 2),
+            "template_ms": round(profile.template_time * 1000, 2),
+            "view_ms": round(view_ms, 2),
+            "total_ms": round((finished - request.request_started) * 1000, 2),
+            "repeated_queries": len(repeated),
+            "streamed": response.streaming,
+        }
+        logger.info(" ".join(f"{key}={value}" for key, value in fields.items()), extra=fields)
+        for shape, count in repeated:
+            logger.warning(
+                "Possible N+1: %s %s ran %d queries shaped %s", request.method, request.path, count, shape,
+                extra={"method": request.method, "path": request.path, "count": count, "sql_shape": shape},
+            )
+        return fields, repeated
+
+
+class ReplicaPinningMiddleware(MiddlewareMixin):
+    """
+    Read-your-writes across requests: a response to a request that wrote to
+    the database sets a short-lived cookie, and while it lasts the client's
+    requests read from the primary, so a replica lagging behind never hides
+    the client's own checkout or return.
+    """
+
+    def process_request(self, request):
+        has_written.set(False)
+        pinned_to_primary.set(PRIMARY_PIN_COOKIE in request.COOKIES)
+
+    def process_response(self, request, response):
+        if has_written.get() and settings.LIBRARY_DB_REPLICA_ALIASES:
+            response.set_cookie(
+                PRIMARY_PIN_COOKIE, "1",
+                max_age=settings.LIBRARY_DB_REPLICA_PIN_SECONDS,
+                httponly=True,
+                samesite="Lax",
+            )
+        return response
+
+
+class ProfilingMiddleware(MiddlewareMixin):
+    """
+    Profile a single live request with cProfile: an admin's request sent
+    with the X-Library-Profile header or a ``?profile`` parameter, or a
+    random one in LIBRARY_PROFILE_SAMPLE_RATE. The view's profile is saved
+    under LIBRARY_PROFILE_ROOT (listed on the admin profiles page) and the
+    file name returned in the X-Library-Profile response header. Last in
+    the chain, so every other process_view hook (CSRF included) has run.
+    """
+
+    def __init__(self, get_response):
+        if not settings.LIBRARY_PROFILING:
+            raise MiddlewareNotUsed
+        super().__init__(get_response)
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if not should_profile(request):
+            return None
+        started = time.perf_counter()
+        response, stats = profile_view(view_func, request, view_args, view_kwargs)
+        path = save_profile(stats, request.resolver_match.url_name, time.perf_counter() - started)
+        response.headers[PROFILE_HEADER] = path.name
+        return response
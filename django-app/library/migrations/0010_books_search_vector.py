@@ -0,0 +1,38 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:07
+
+import django.contrib.postgres.indexes
+import django.contrib.postgres.search
+from django.db import migrations
+
+# Backfill for existing rows; kept in sync with library.search.book_search_vector
+POPULATE_SEARCH_VECTOR = """
+UPDATE library_books b SET search_vector =
+    setweight(to_tsvector('simple', coalesce(b.book_name, '')), 'A') ||
+    setweight(to_tsvector('simple', coalesce(b.author, '')), 'B') ||
+    setweight(to_tsvector('simple', coalesce((
+        SELECT string_agg(c.category_name, ' ')
+        FROM library_categoriesperbook cpb
+        JOIN library_categories c ON c.id = cpb.category_id_id
+        WHERE cpb.book_id_id = b.id
+    ), '')), 'C');
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0009_booksborrowed_due_date'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='books',
+            name='search_vector',
+            field=django.contrib.postgres.search.SearchVectorField(editable=False, null=True),
+        ),
+        migrations.AddIndex(
+            model_name='books',
+            index=django.contrib.postgres.indexes.GinIndex(fields=['search_vector'], name='books_search_vector_idx'),
+        ),
+        migrations.RunSQL(POPULATE_SEARCH_VECTOR, migrations.RunSQL.noop),
+    ]
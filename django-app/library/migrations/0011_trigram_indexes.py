@@ -0,0 +1,41 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:20
+
+from django.db import migrations
+
+# Trigram GIN indexes backing the fuzzy search fallback (library.search).
+# pg_trgm ships with PostgreSQL's contrib package, which is not present on
+# every server, so the extension and indexes are only created when it is
+# available; fuzzy search turns itself off otherwise.
+TRIGRAM_INDEXES = [
+    ("books_book_name_trgm_idx", "library_books", "book_name"),
+    ("books_author_trgm_idx", "library_books", "author"),
+    ("categories_name_trgm_idx", "library_categories", "category_name"),
+]
+
+
+def create_trigram_indexes(apps, schema_editor):
+    with schema_editor.connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_available_extensions WHERE name = 'pg_trgm'")
+        if cursor.fetchone() is None:
+            return
+    schema_editor.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    for name, table, column in TRIGRAM_INDEXES:
+        schema_editor.execute(
+            f"CREATE INDEX IF NOT EXISTS {name} ON {table} USING gin ({column} gin_trgm_ops)"
+        )
+
+
+def drop_trigram_indexes(apps, schema_editor):
+    for name, _, _ in TRIGRAM_INDEXES:
+        schema_editor.execute(f"DROP INDEX IF EXISTS {name}")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0010_books_search_vector'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_trigram_indexes, drop_trigram_indexes),
+    ]
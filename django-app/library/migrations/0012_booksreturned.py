@@ -0,0 +1,30 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:30
+
+import django.contrib.postgres.indexes
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0011_trigram_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='BooksReturned',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('borrowed_date', models.DateField()),
+                ('due_date', models.DateTimeField()),
+                ('returned_date', models.DateTimeField(default=django.utils.timezone.now)),
+                ('book_id', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.books')),
+                ('user_id', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.users')),
+            ],
+            options={
+                'indexes': [django.contrib.postgres.indexes.BrinIndex(fields=['returned_date'], name='booksreturned_returned_brin')],
+            },
+        ),
+    ]
@@ -0,0 +1,53 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:40
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models.functions import Greatest
+
+# Existing users get their current open-loan count
+POPULATE_ACTIVE_LOANS = """
+UPDATE library_users u SET active_loans = (
+    SELECT count(*) FROM library_booksborrowed bb WHERE bb.user_id_id = u.id
+);
+"""
+
+
+def populate_loan_limits(apps, schema_editor):
+    # The configured limit of each user's role (as loan_limit_for_role
+    # resolves it), never below what the user already holds
+    Users = apps.get_model("library", "Users")
+    limits = settings.LIBRARY_LOAN_LIMITS
+    role_limit = models.Case(
+        *[models.When(role=role, then=models.Value(limit)) for role, limit in limits.items()],
+        default=models.Value(limits["user"]),
+    )
+    Users.objects.using(schema_editor.connection.alias).update(
+        loan_limit=Greatest(role_limit, models.F("active_loans"))
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0012_booksreturned'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='users',
+            name='active_loans',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='users',
+            name='loan_limit',
+            field=models.PositiveIntegerField(blank=True, default=3),
+            preserve_default=False,
+        ),
+        migrations.RunSQL(POPULATE_ACTIVE_LOANS, migrations.RunSQL.noop),
+        migrations.RunPython(populate_loan_limits, migrations.RunPython.noop),
+        migrations.AddConstraint(
+            model_name='users',
+            constraint=models.CheckConstraint(condition=models.Q(('active_loans__lte', models.F('loan_limit'))), name='users_active_loans_within_limit'),
+        ),
+    ]
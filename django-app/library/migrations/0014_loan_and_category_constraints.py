@@ -0,0 +1,63 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:05
+
+import django.db.models.functions.text
+from django.db import migrations, models
+
+# Duplicate rows would block the unique constraints. Extra category links
+# are dropped; an extra loan of the same title is closed, putting its copy
+# back in stock and taking it off the user's loan counter.
+REMOVE_DUPLICATES = """
+DELETE FROM library_categoriesperbook a
+USING library_categoriesperbook b
+WHERE a.book_id_id = b.book_id_id AND a.category_id_id = b.category_id_id AND a.id > b.id;
+
+WITH duplicates AS (
+    DELETE FROM library_booksborrowed a
+    USING library_booksborrowed b
+    WHERE a.user_id_id = b.user_id_id AND a.book_id_id = b.book_id_id AND a.id > b.id
+    RETURNING a.user_id_id, a.book_id_id
+), restocked AS (
+    UPDATE library_books bk SET quantity = bk.quantity + d.copies
+    FROM (SELECT book_id_id, count(*) AS copies FROM duplicates GROUP BY book_id_id) d
+    WHERE bk.id = d.book_id_id
+)
+UPDATE library_users u SET active_loans = u.active_loans - d.loans
+FROM (SELECT user_id_id, count(*) AS loans FROM duplicates GROUP BY user_id_id) d
+WHERE u.id = d.user_id_id;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0013_users_loan_counter'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='users',
+            name='name',
+            field=models.CharField(db_index=True, max_length=100),
+        ),
+        migrations.AddIndex(
+            model_name='booksborrowed',
+            index=models.Index(fields=['due_date', 'id'], name='booksborrowed_due_date_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='categoriesperbook',
+            index=models.Index(fields=['category_id', 'book_id'], name='categoriesperbook_category_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='users',
+            index=models.Index(django.db.models.functions.text.Upper('email'), name='users_email_upper_idx'),
+        ),
+        migrations.RunSQL(REMOVE_DUPLICATES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='booksborrowed',
+            constraint=models.UniqueConstraint(fields=('user_id', 'book_id'), name='booksborrowed_unique_user_book'),
+        ),
+        migrations.AddConstraint(
+            model_name='categoriesperbook',
+            constraint=models.UniqueConstraint(fields=('book_id', 'category_id'), name='categoriesperbook_unique_book_category'),
+        ),
+    ]
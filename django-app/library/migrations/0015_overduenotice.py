@@ -0,0 +1,32 @@
+# Generated by Django 5.2.8 on 2026-10-18 20:40
+
+import django.db.models.deletion
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0014_loan_and_category_constraints'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='OverdueNotice',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('loan_id', models.BigIntegerField(unique=True)),
+                ('email', models.EmailField(max_length=254)),
+                ('book_name', models.CharField(max_length=100)),
+                ('due_date', models.DateTimeField()),
+                ('created_at', models.DateTimeField(default=django.utils.timezone.now)),
+                ('sent_at', models.DateTimeField(blank=True, null=True)),
+                ('book_id', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.books')),
+                ('user_id', models.ForeignKey(null=True, on_delete=django.db.models.deletion.SET_NULL, to='library.users')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['due_date', 'loan_id'], name='overduenotice_scan_idx'), models.Index(condition=models.Q(('sent_at__isnull', True)), fields=['id'], name='overduenotice_unsent_idx')],
+            },
+        ),
+    ]
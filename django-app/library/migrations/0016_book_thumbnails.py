@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 19:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0015_overduenotice'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='books',
+            name='thumbnail_key',
+            field=models.CharField(blank=True, default='', editable=False, max_length=16),
+        ),
+        migrations.AddField(
+            model_name='books',
+            name='thumbnail_source',
+            field=models.URLField(blank=True, editable=False, null=True),
+        ),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 5.2.8 on 2026-10-18 21:05
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0016_book_thumbnails'),
+    ]
+
+    operations = [
+        # Shared by every worker; library.cache bumps it on catalog writes.
+        # It starts from the clock, so a recreated database never reuses a
+        # version that a shared cache may still hold entries for.
+        migrations.RunSQL(
+            sql=[
+                "CREATE SEQUENCE library_catalog_version",
+                "SELECT setval('library_catalog_version', (extract(epoch FROM clock_timestamp()) * 1000)::bigint)",
+            ],
+            reverse_sql="DROP SEQUENCE library_catalog_version",
+        ),
+    ]
@@ -0,0 +1,88 @@
+# Generated by Django 5.2.8 on 2026-10-18 23:10
+
+from django.db import migrations, models
+
+# Duplicate books (same title and author) would block the constraint. Each
+# group is merged into its oldest row: the stock of the others is added to
+# it, their category links, loans, returns and notices move over, and a
+# user holding a loan of more than one of them keeps the oldest loan only
+# (the others are closed, like in 0014). Search vectors of the merged
+# books are rebuilt, since they gained categories.
+MERGE_DUPLICATES = """
+CREATE TEMPORARY TABLE library_duplicate_books ON COMMIT DROP AS
+SELECT id, keep_id FROM (
+    SELECT id, min(id) OVER (PARTITION BY book_name, author) AS keep_id FROM library_books
+) books
+WHERE id <> keep_id;
+
+UPDATE library_books b SET quantity = b.quantity + d.copies
+FROM (
+    SELECT d.keep_id, sum(bk.quantity) AS copies
+    FROM library_duplicate_books d JOIN library_books bk ON bk.id = d.id
+    GROUP BY d.keep_id
+) d
+WHERE b.id = d.keep_id;
+
+INSERT INTO library_categoriesperbook (book_id_id, category_id_id)
+SELECT DISTINCT d.keep_id, l.category_id_id
+FROM library_categoriesperbook l JOIN library_duplicate_books d ON d.id = l.book_id_id
+ON CONFLICT DO NOTHING;
+
+DELETE FROM library_categoriesperbook l USING library_duplicate_books d WHERE l.book_id_id = d.id;
+
+WITH loans AS (
+    SELECT l.id, l.user_id_id, COALESCE(d.keep_id, l.book_id_id) AS keep_id,
+           row_number() OVER (PARTITION BY l.user_id_id, COALESCE(d.keep_id, l.book_id_id) ORDER BY l.id) AS n
+    FROM library_booksborrowed l LEFT JOIN library_duplicate_books d ON d.id = l.book_id_id
+    WHERE COALESCE(d.keep_id, l.book_id_id) IN (SELECT keep_id FROM library_duplicate_books)
+), closed AS (
+    DELETE FROM library_booksborrowed l USING loans
+    WHERE l.id = loans.id AND loans.n > 1
+    RETURNING loans.user_id_id, loans.keep_id
+), restocked AS (
+    UPDATE library_books bk SET quantity = bk.quantity + c.copies
+    FROM (SELECT keep_id, count(*) AS copies FROM closed GROUP BY keep_id) c
+    WHERE bk.id = c.keep_id
+)
+UPDATE library_users u SET active_loans = u.active_loans - c.loans
+FROM (SELECT user_id_id, count(*) AS loans FROM closed GROUP BY user_id_id) c
+WHERE u.id = c.user_id_id;
+
+UPDATE library_booksborrowed l SET book_id_id = d.keep_id FROM library_duplicate_books d WHERE l.book_id_id = d.id;
+UPDATE library_booksreturned l SET book_id_id = d.keep_id FROM library_duplicate_books d WHERE l.book_id_id = d.id;
+UPDATE library_overduenotice l SET book_id_id = d.keep_id FROM library_duplicate_books d WHERE l.book_id_id = d.id;
+
+DELETE FROM library_books b USING library_duplicate_books d WHERE b.id = d.id;
+
+UPDATE library_books b SET search_vector =
+    setweight(to_tsvector('simple', COALESCE(b.book_name, '')), 'A')
+    || setweight(to_tsvector('simple', COALESCE(b.author, '')), 'B')
+    || setweight(to_tsvector('simple', COALESCE(agg.names, '')), 'C')
+FROM (
+    SELECT books.id, string_agg(c.category_name, ' ') AS names
+    FROM library_books books
+    LEFT JOIN library_categoriesperbook cpb ON cpb.book_id_id = books.id
+    LEFT JOIN library_categories c ON c.id = cpb.category_id_id
+    WHERE books.id IN (SELECT keep_id FROM library_duplicate_books)
+    GROUP BY books.id
+) agg
+WHERE b.id = agg.id;
+
+-- Check the moved foreign keys now: ALTER TABLE refuses to run with deferred checks pending
+SET CONSTRAINTS ALL IMMEDIATE;
+"""
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('library', '0017_catalog_version'),
+    ]
+
+    operations = [
+        migrations.RunSQL(MERGE_DUPLICATES, migrations.RunSQL.noop),
+        migrations.AddConstraint(
+            model_name='books',
+            constraint=models.UniqueConstraint(fields=('book_name', 'author'), name='books_unique_title_author'),
+        ),
+    ]
@@ -1,18 +1,47 @@
+from django.conf import settings
 from django.db import models
+from django.contrib.postgres.indexes import BrinIndex, GinIndex
+from django.contrib.postgres.search import SearchVectorField
 from django.contrib.auth.hashers import make_password 
 from datetime import datetime, timedelta
+from django.db.models.functions import Upper
 from django.utils import timezone
 
 # Create your models here.
 
+def loan_limit_for_role(role):
+    return settings.LIBRARY_LOAN_LIMITS.get(role, settings.LIBRARY_LOAN_LIMITS["user"])
+
 class Users(models.Model):
-    name = models.CharField(max_length=100, null=False)
+    # Indexed for the login lookup by name
+    name = models.CharField(max_length=100, null=False, db_index=True)
     email = models.EmailField(unique=True, null=False)
     password = models.CharField(max_length=100, null=False)
     role = models.CharField(max_length=10, default="user")
+    # Number of open loans: incremented by library.services checkout_book,
+    # decremented whenever a loan row is deleted (library.signals)
+    active_loans = models.PositiveIntegerField(default=0, editable=False)
+    # Set from the role's limit (settings.LIBRARY_LOAN_LIMITS) when the user
+    # is created, then kept per user: changing the setting or the user's
+    # role does not update existing users, set loan_limit for that
+    loan_limit = models.PositiveIntegerField(blank=True)
+
+    class Meta:
+        constraints = [
+            models.CheckConstraint(
+                condition=models.Q(active_loans__lte=models.F("loan_limit")),
+                name="users_active_loans_within_limit",
+            ),
+        ]
+        indexes = [
+            # Case-insensitive email lookups (email__iexact compares UPPER(email))
+            models.Index(Upper("email"), name="users_email_upper_idx"),
+        ]
 
     def save(self, *args, **kwargs):
         self.password = make_password(self.password)
+        if self.loan_limit is None:
+            self.loan_limit = loan_limit_for_role(self.role)
         super().save(*args, **kwargs)
 
 class Books(models.Model):
@@ -20,6 +49,21 @@ class Books(models.Model):
     author = models.CharField(max_length=100, null=False)
     thumbnail = models.URLField(null=True, blank=True)
     quantity = models.PositiveIntegerField(default=1)  
+    # Maintained by library.signals (title, author and category names)
+    search_vector = SearchVectorField(null=True, editable=False)
+    # Maintained by library.thumbnails: the cover URL last ingested and the
+    # key of its resized variants ("" if it could not be fetched)
+    thumbnail_source = models.URLField(null=True, blank=True, editable=False)
+    thumbnail_key = models.CharField(max_length=16, blank=True, default="", editable=False)
+
+    class Meta:
+        constraints = [
+            # The catalog's natural key: imports upsert on it
+            models.UniqueConstraint(fields=["book_name", "author"], name="books_unique_title_author"),
+        ]
+        indexes = [
+            GinIndex(fields=["search_vector"], name="books_search_vector_idx"),
+        ]
 
     def __str__(self):
         return f"{self.book_name} by {self.author} ({self.quantity} available)"
@@ -33,9 +77,63 @@ class BooksBorrowed(models.Model):
     borrowed_date = models.DateField(auto_now_add=True)
     due_date = models.DateTimeField(default=default_due_date)
 
+    class Meta:
+        constraints = [
+            # One copy of a title per user; also serves (user, book) lookups
+            models.UniqueConstraint(fields=["user_id", "book_id"], name="booksborrowed_unique_user_book"),
+        ]
+        indexes = [
+            # Overdue scans and the admin loans list, ordered by (due_date, id)
+            models.Index(fields=["due_date", "id"], name="booksborrowed_due_date_idx"),
+        ]
+
     def __str__(self):
         return f"{self.user_id.name} borrowed {self.book_id.book_name}"
     
+class BooksReturned(models.Model):
+    """Append-only circulation history: one row per returned loan."""
+    user_id = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True)
+    book_id = models.ForeignKey(Books, on_delete=models.SET_NULL, null=True)
+    borrowed_date = models.DateField()
+    due_date = models.DateTimeField()
+    returned_date = models.DateTimeField(default=timezone.now)
+
+    class Meta:
+        indexes = [
+            # Rows arrive in return order, so a BRIN index stays tiny
+            BrinIndex(fields=["returned_date"], name="booksreturned_returned_brin"),
+        ]
+
+    def __str__(self):
+        return f"Loan {self.id} returned on {self.returned_date:%Y-%m-%d}"
+
+class OverdueNotice(models.Model):
+    """
+    Outbox of overdue-loan notifications, filled by the scan_overdue_loans
+    command and drained by whatever delivers them (sent_at marks delivery).
+    One notice per loan; the loan row itself is deleted on return, so it is
+    referenced by id only.
+    """
+    loan_id = models.BigIntegerField(unique=True)
+    user_id = models.ForeignKey(Users, on_delete=models.SET_NULL, null=True)
+    book_id = models.ForeignKey(Books, on_delete=models.SET_NULL, null=True)
+    email = models.EmailField()
+    book_name = models.CharField(max_length=100)
+    due_date = models.DateTimeField()
+    created_at = models.DateTimeField(default=timezone.now)
+    sent_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        indexes = [
+            # Where the last scan stopped, in the scan's (due_date, loan) order
+            models.Index(fields=["due_date", "loan_id"], name="overduenotice_scan_idx"),
+            # Notices still waiting for delivery
+            models.Index(fields=["id"], condition=models.Q(sent_at__isnull=True), name="overduenotice_unsent_idx"),
+        ]
+
+    def __str__(self):
+        return f"Loan {self.loan_id} overdue since {self.due_date:%Y-%m-%d}"
+
 class Categories(models.Model):
     category_name = models.CharField(max_length=100, null=False)
 
@@ -46,5 +144,15 @@ class CategoriesPerBook(models.Model):
     book_id = models.ForeignKey(Books, on_delete=models.CASCADE)
     category_id = models.ForeignKey(Categories, on_delete=models.CASCADE)
 
+    class Meta:
+        constraints = [
+            # Joins from books to their categories
+            models.UniqueConstraint(fields=["book_id", "category_id"], name="categoriesperbook_unique_book_category"),
+        ]
+        indexes = [
+            # Joins from categories to their books
+            models.Index(fields=["category_id", "book_id"], name="categoriesperbook_category_idx"),
+        ]
+
     def __str__(self):
         return f"{self.book_id.book_name} in {self.category_id.category_name}"
\ No newline at end of file
@@ -0,0 +1,106 @@
+from datetime import datetime, timezone as dt_timezone
+
+from django.db import connection
+from django.utils import timezone
+
+from .models import OverdueNotice
+
+# Loans read and notices written per statement
+OVERDUE_CHUNK_SIZE = 5000
+
+
+# The earliest loan overdue at %(now)s that has no notice yet, read from
+# booksborrowed_due_date_idx with a probe of the unique loan_id per loan.
+# Loans can become overdue out of order (the synthetic generator inserts
+# them already overdue, admins edit due dates), so a scan cannot resume
+# after the last notice queued.
+FIRST_UNQUEUED_SQL = """
+SELECT due_date, id FROM library_booksborrowed b
+WHERE due_date < %(now)s
+    AND NOT EXISTS (SELECT 1 FROM library_overduenotice n WHERE n.loan_id = b.id)
+ORDER BY due_date, id
+LIMIT 1
+"""
+
+
+def resume_point(now=None):
+    """
+    Cursor to resume a scan from: just before the first loan overdue at
+    ``now`` without a notice (the loans before it are all queued), or past
+    every overdue loan if there is none.
+    """
+    now = now or timezone.now()
+    with connection.cursor() as cursor:
+        cursor.execute(FIRST_UNQUEUED_SQL, {"now": now})
+        row = cursor.fetchone()
+    if row is None:
+        return (now, 0)
+    due_date, loan_id = row
+    return (due_date, loan_id - 1)
+
+
+# One chunk per statement: the keyset-paginated read, the outbox insert and
+# the chunk summary run inside PostgreSQL, so no loan row goes through
+# Python. The (due_date, id) row comparison is served by
+# booksborrowed_due_date_idx; loans already notified are skipped by the
+# unique loan_id.
+QUEUE_CHUNK_SQL = """
+WITH chunk AS (
+    SELECT id, user_id_id, book_id_id, due_date
+    FROM library_booksborrowed
+    WHERE due_date < %(now)s AND (due_date, id) > (%(after_due_date)s, %(after_id)s)
+    ORDER BY due_date, id
+    LIMIT %(chunk_size)s
+), queued AS (
+    INSERT INTO library_overduenotice (loan_id, user_id_id, book_id_id, email, book_name, due_date, created_at)
+    SELECT chunk.id, chunk.user_id_id, chunk.book_id_id, u.email, b.book_name, chunk.due_date, %(now)s
+    FROM chunk
+    JOIN library_users u ON u.id = chunk.user_id_id
+    JOIN library_books b ON b.id = chunk.book_id_id
+    ON CONFLICT (loan_id) DO NOTHING
+    RETURNING 1
+)
+SELECT
+    (SELECT count(*) FROM chunk),
+    (SELECT count(*) FROM queued),
+    last.due_date,
+    last.id
+FROM (SELECT due_date, id FROM chunk ORDER BY due_date DESC, id DESC LIMIT 1) last
+"""
+
+# Cursor that sorts before every loan
+SCAN_START = (datetime.min.replace(tzinfo=dt_timezone.utc), 0)
+
+
+def scan_overdue_loans(now=None, after=None, chunk_size=OVERDUE_CHUNK_SIZE, progress=None):
+    """
+    Queue a notice in the outbox for every loan overdue at ``now``, reading
+    the loans in keyset-paginated chunks after the ``after`` cursor. Each
+    chunk is one statement committed on its own, so an interrupted scan
+    resumes from resume_point(). ``progress(scanned, queued)`` is
+    called after every chunk. Returns (loans scanned, notices queued).
+    """
+    now = now or timezone.now()
+    after_due_date, after_id = after or SCAN_START
+    scanned = queued = 0
+
+    while True:
+        with connection.cursor() as cursor:
+            cursor.execute(QUEUE_CHUNK_SQL, {
+                "now": now,
+                "after_due_date": after_due_date,
+                "after_id": after_id,
+                "chunk_size": chunk_size,
+            })
+            row = cursor.fetchone()
+        if row is None:
+            break
+        chunk_scanned, chunk_queued, after_due_date, after_id = row
+        scanned += chunk_scanned
+        queued += chunk_queued
+        if progress:
+            progress(scanned, queued)
+        if chunk_scanned < chunk_size:
+            break
+
+    return scanned, queued
@@ -0,0 +1,168 @@
+import cProfile
+import io
+import logging
+import os
+import pstats
+import random
+import re
+import secrets
+import sys
+import time
+import types
+from datetime import datetime
+from pathlib import Path
+
+from asgiref.sync import async_to_sync, iscoroutinefunction
+from django.conf import settings
+
+logger = logging.getLogger("library.profiling")
+
+# An admin asks for a profile of one request with this header or query parameter
+PROFILE_HEADER = "X-Library-Profile"
+PROFILE_PARAM = "profile"
+
+# <started>-<url name>-<duration>ms-<random>.prof
+PROFILE_NAME = re.compile(r"^(\d{8}-\d{6})-(\w+)-(\d+)ms-[0-9a-f]{6}\.prof$")
+
+# From Python 3.12 cProfile hooks into sys.monitoring, which sees every
+# thread and lets only one profiler be enabled at a time
+PROFILER_SEES_ALL_THREADS = sys.version_info >= (3, 12)
+
+
+def profile_root():
+    return Path(settings.LIBRARY_PROFILE_ROOT)
+
+
+# ------------------------------
+# SELECTING REQUESTS
+# ------------------------------
+def should_profile(request):
+    """
+    An admin's request carrying the profile header or query parameter, or
+    one in every LIBRARY_PROFILE_SAMPLE_RATE requests picked at random.
+    """
+    if request.session.get("user_role") == "admin" and (
+        request.headers.get(PROFILE_HEADER) or PROFILE_PARAM in request.GET
+    ):
+        return True
+    rate = settings.LIBRARY_PROFILE_SAMPLE_RATE
+    return rate > 0 and random.randrange(rate) == 0
+
+
+# ------------------------------
+# PROFILING
+# ------------------------------
+@types.coroutine
+def profiled_steps(coro, profiler):
+    """
+    Await ``coro`` with the profiler enabled only while the coroutine itself
+    runs, not while it is suspended and the event loop serves other requests.
+    """
+    value, error = None, None
+    while True:
+        profiler.enable()
+        try:
+            awaited = coro.throw(error) if error else coro.send(value)
+        except StopIteration as stop:
+            return stop.value
+        finally:
+            profiler.disable()
+        try:
+            value, error = (yield awaited), None
+        except BaseException as e:
+            value, error = None, e
+
+
+def profile_view(view_func, request, args, kwargs):
+    """
+    Call a view under cProfile. Returns the response and its pstats.Stats.
+
+    An async view's coroutine runs on the event loop thread while its
+    database calls come back to this thread, so before Python 3.12 the
+    coroutine gets its own profiler and both are merged. From 3.12 the one
+    profiler sees both threads, but also whatever else the event loop runs
+    meanwhile.
+    """
+    profiler = cProfile.Profile()
+    if not iscoroutinefunction(view_func):
+        response = profiler.runcall(view_func, request, *args, **kwargs)
+        return response, pstats.Stats(profiler)
+    if PROFILER_SEES_ALL_THREADS:
+        response = profiler.runcall(async_to_sync(view_func), request, *args, **kwargs)
+        return response, pstats.Stats(profiler)
+
+    coroutine_profiler = cProfile.Profile()
+
+    async def run():
+        return await profiled_steps(view_func(request, *args, **kwargs), coroutine_profiler)
+
+    response = profiler.runcall(async_to_sync(run))
+    stats = pstats.Stats(profiler)
+    stats.add(coroutine_profiler)
+    return response, stats
+
+
+# ------------------------------
+# STORED PROFILES
+# ------------------------------
+def save_profile(stats, view_name, duration):
+    """Write the stats as a .prof file, keeping the newest LIBRARY_PROFILE_KEEP. Returns its path."""
+    root = profile_root()
+    root.mkdir(parents=True, exist_ok=True)
+    name = "{}-{}-{}ms-{}.prof".format(
+        time.strftime("%Y%m%d-%H%M%S"),
+        re.sub(r"\W", "_", view_name or "unknown"),
+        round(duration * 1000),
+        secrets.token_hex(3),
+    )
+    tmp_path = root / f".{name}.tmp"
+    stats.dump_stats(tmp_path)
+    os.replace(tmp_path, root / name)
+    logger.info("Profiled %s in %.1f ms: %s", view_name, duration * 1000, name)
+
+    for stale in list_profiles()[settings.LIBRARY_PROFILE_KEEP:]:
+        stale["path"].unlink(missing_ok=True)
+    return root / name
+
+
+def list_profiles():
+    """Stored profiles, newest first."""
+    root = profile_root()
+    if not root.is_dir():
+        return []
+
+    profiles = []
+    for path in root.iterdir():
+        match = PROFILE_NAME.match(path.name)
+        if not match:
+            continue
+        try:
+            stat = path.stat()
+        except FileNotFoundError:
+            # Pruned by another worker meanwhile
+            continue
+        started, view_name, duration_ms = match.groups()
+        profiles.append({
+            "name": path.name,
+            "path": path,
+            "started": datetime.strptime(started, "%Y%m%d-%H%M%S"),
+            "view": view_name,
+            "duration_ms": int(duration_ms),
+            "size": stat.st_size,
+            "written": stat.st_mtime_ns,
+        })
+    return sorted(profiles, key=lambda profile: (profile["written"], profile["name"]), reverse=True)
+
+
+def profile_path(name):
+    """Path of a stored profile, or None when the name is not one (never a path outside the root)."""
+    if not PROFILE_NAME.match(name):
+        return None
+    return profile_root() / name
+
+
+def profile_report(path, sort="cumulative", limit=40):
+    """The top functions of a stored profile, as pstats prints them."""
+    out = io.StringIO()
+    pstats.Stats(str(path), stream=out).strip_dirs().sort_stats(sort).print_stats(limit)
+    return out.getvalue()
@@ -0,0 +1,61 @@
+import random
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.db import DEFAULT_DB_ALIAS, connections
+
+# Models whose reads may be served by a replica
+CATALOG_MODELS = {"books", "categories", "categoriesperbook"}
+
+# Reads go to the primary for the rest of the request (or command) once it
+# has written, or when the client wrote within the last few seconds.
+has_written = ContextVar("library_has_written", default=False)
+pinned_to_primary = ContextVar("library_pinned_to_primary", default=False)
+
+
+@contextmanager
+def use_primary():
+    """Read everything from the primary inside the block."""
+    token = pinned_to_primary.set(True)
+    try:
+        yield
+    finally:
+        pinned_to_primary.reset(token)
+
+
+class CatalogReplicaRouter:
+    """
+    Spread catalog reads over settings.LIBRARY_DB_REPLICA_ALIASES; every
+    other query goes to the primary. Reads stay on the primary inside a
+    transaction and after a write (read-your-writes). Replicas are copies
+    of the primary, so relations may span them and they are never migrated.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = settings.LIBRARY_DB_REPLICA_ALIASES
+        if (
+            not replicas
+            or model._meta.app_label != "library"
+            or model._meta.model_name not in CATALOG_MODELS
+            or has_written.get()
+            or pinned_to_primary.get()
+            or connections[DEFAULT_DB_ALIAS].in_atomic_block
+        ):
+            return DEFAULT_DB_ALIAS
+        return random.choice(replicas)
+
+    def db_for_write(self, model, **hints):
+        has_written.set(True)
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {DEFAULT_DB_ALIAS, *settings.LIBRARY_DB_REPLICA_ALIASES}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        if db in settings.LIBRARY_DB_REPLICA_ALIASES:
+            return False
+        return None
@@ -0,0 +1,170 @@
+import re
+from contextlib import contextmanager
+from functools import lru_cache
+
+from django.conf import settings
+from django.contrib.postgres.aggregates import StringAgg
+from django.contrib.postgres.search import SearchQuery, SearchRank, SearchVector, TrigramWordSimilarity
+from django.db import connection, transaction
+from django.db.models import F, FloatField, OuterRef, Q, Subquery, TextField, Value
+from django.db.models.functions import Cast, Coalesce, Greatest
+
+from .models import Books, Categories, CategoriesPerBook
+
+# 'simple' keeps names and titles as-is (no stemming), which suits a
+# multilingual catalog of titles and author names.
+SEARCH_CONFIG = "simple"
+
+
+# ------------------------------
+# SEARCH VECTOR MAINTENANCE
+# ------------------------------
+def book_search_vector():
+    """tsvector expression over title (A), author (B) and category names (C)."""
+    category_names = (
+        CategoriesPerBook.objects
+        .filter(book_id=OuterRef("pk"))
+        .values("book_id")
+        .annotate(names=StringAgg("category_id__category_name", delimiter=" "))
+        .values("names")
+    )
+    return (
+        SearchVector("book_name", weight="A", config=SEARCH_CONFIG)
+        + SearchVector("author", weight="B", config=SEARCH_CONFIG)
+        + SearchVector(
+            Coalesce(Subquery(category_names), Value(""), output_field=TextField()),
+            weight="C",
+            config=SEARCH_CONFIG,
+        )
+    )
+
+
+def update_search_vector(book_ids=None):
+    """Recompute Books.search_vector for the given books (all books if None)."""
+    books_qs = Books.objects.all()
+    if book_ids is not None:
+        books_qs = books_qs.filter(id__in=book_ids)
+    return books_qs.update(search_vector=book_search_vector())
+
+
+# The same vector as book_search_vector(), for bulk loads: category names
+# are aggregated with one join instead of a subquery per book, which is
+# several times faster over hundreds of thousands of books.
+BULK_SEARCH_VECTOR_SQL = """
+UPDATE library_books b SET search_vector =
+    setweight(to_tsvector(%(config)s::regconfig, COALESCE(b.book_name, '')), 'A')
+    || setweight(to_tsvector(%(config)s::regconfig, COALESCE(b.author, '')), 'B')
+    || setweight(to_tsvector(%(config)s::regconfig, COALESCE(agg.names, '')), 'C')
+FROM (
+    SELECT books.id, string_agg(c.category_name, ' ') AS names
+    FROM library_books books
+    LEFT JOIN library_categoriesperbook cpb ON cpb.book_id_id = books.id
+    LEFT JOIN library_categories c ON c.id = cpb.category_id_id
+    WHERE books.id >= %(first_id)s
+    GROUP BY books.id
+) agg
+WHERE b.id = agg.id
+"""
+
+
+def bulk_update_search_vector(first_id):
+    """Recompute Books.search_vector for every book with id >= first_id."""
+    with connection.cursor() as cursor:
+        cursor.execute(BULK_SEARCH_VECTOR_SQL, {"config": SEARCH_CONFIG, "first_id": first_id})
+        return cursor.rowcount
+
+
+# ------------------------------
+# QUERYING
+# ------------------------------
+def build_search_query(query):
+    """
+    Turn free text into a prefix-matching tsquery ("harr pott" ->
+    'harr:* & pott:*'). Returns None if the text has no searchable terms.
+    """
+    terms = re.findall(r"\w+", query)
+    if not terms:
+        return None
+    raw = " & ".join(f"{term}:*" for term in terms)
+    return SearchQuery(raw, search_type="raw", config=SEARCH_CONFIG)
+
+
+def search_books(query):
+    """
+    Full-text search over the maintained search_vector column (GIN indexed).
+    Matches are annotated with a ``rank``; an empty query returns the whole
+    catalog unranked.
+    """
+    if not query:
+        return Books.objects.all()
+
+    search_query = build_search_query(query)
+    if search_query is None:
+        return Books.objects.none()
+
+    return (
+        Books.objects
+        .filter(search_vector=search_query)
+        # ts_rank is a real; as a double precision the value a page cursor
+        # carries (a Python float) compares equal to the one in the query
+        .annotate(rank=Cast(SearchRank(F("search_vector"), search_query), FloatField()))
+    )
+
+
+# ------------------------------
+# FUZZY (TRIGRAM) SEARCH
+# ------------------------------
+@lru_cache(maxsize=None)
+def trigram_enabled():
+    """Whether pg_trgm is installed; fuzzy search is disabled without it."""
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+        return cursor.fetchone() is not None
+
+
+def fuzzy_threshold():
+    return getattr(settings, "LIBRARY_FUZZY_SEARCH_THRESHOLD", 0.4)
+
+
+@contextmanager
+def similarity_threshold(threshold):
+    """
+    Run the enclosed queries with pg_trgm's word-similarity threshold set to
+    ``threshold``. The `%>` operator reads it, which keeps matching on the
+    trigram GIN indexes instead of computing similarity for every row.
+    """
+    with transaction.atomic():
+        with connection.cursor() as cursor:
+            cursor.execute(
+                "SELECT set_config('pg_trgm.word_similarity_threshold', %s, true)",
+                [str(threshold)],
+            )
+        yield
+
+
+def fuzzy_search_books(query):
+    """
+    Typo-tolerant search on title, author and category names, annotated with
+    a similarity ``rank``. Must be evaluated inside similarity_threshold().
+    """
+    text = " ".join(re.findall(r"\w+", query))
+    if not text:
+        return Books.objects.none()
+
+    category_books = CategoriesPerBook.objects.filter(
+        category_id__in=Categories.objects.filter(category_name__trigram_word_similar=text)
+    ).values("book_id")
+
+    return (
+        Books.objects
+        .filter(
+            Q(book_name__trigram_word_similar=text)
+            | Q(author__trigram_word_similar=text)
+            | Q(id__in=category_books)
+        )
+        # Double precision, like search_books' rank, for exact cursors
+        .annotate(rank=Cast(Greatest(
+            TrigramWordSimilarity(text, "book_name"),
+            TrigramWordSimilarity(text, "author"),
+        ), FloatField()))
+    )
@@ -0,0 +1,119 @@
+from datetime import timedelta
+
+from django.db import transaction
+from django.db.models import Exists, F, OuterRef
+from django.utils import timezone
+
+from .cache import invalidate_catalog
+from .models import Books, BooksBorrowed, BooksReturned, Users
+
+LOAN_PERIOD = timedelta(days=60)
+
+
+class CheckoutError(Exception):
+    """A checkout was refused; the message is meant for the patron."""
+
+
+class ReturnError(Exception):
+    """A return was refused; the message is meant for the patron."""
+
+
+# ------------------------------
+# LOAN LIMIT
+# ------------------------------
+async def ahas_reached_loan_limit(user_id):
+    """Single primary-key read of the user's loan counter."""
+    return await Users.objects.filter(id=user_id, active_loans__gte=F("loan_limit")).aexists()
+
+
+# ------------------------------
+# CHECKOUT
+# ------------------------------
+@transaction.atomic
+def checkout_book(user_id, book_id):
+    """
+    Lend a copy of a book to a user in one transaction.
+
+    The user's loan counter is bumped first with a conditional
+    ``UPDATE ... WHERE active_loans < loan_limit``; that enforces the limit
+    and row-locks the user, so concurrent checkouts by the same user are
+    serialized and the duplicate check cannot race. Stock is taken with
+    ``UPDATE ... WHERE quantity > 0``, so two patrons can never both get the
+    last copy. Any refusal rolls the whole transaction back. Returns the new
+    loan (with ``book_id.book_name`` populated) or raises CheckoutError.
+    """
+    counted = (
+        Users.objects
+        .filter(id=user_id, active_loans__lt=F("loan_limit"))
+        .update(active_loans=F("active_loans") + 1)
+    )
+    if not counted:
+        loan_limit = Users.objects.filter(id=user_id).values_list("loan_limit", flat=True).first()
+        if loan_limit is None:
+            raise CheckoutError("User not found.")
+        raise CheckoutError(f"You can only borrow up to {loan_limit} books at a time.")
+
+    book = (
+        Books.objects
+        .filter(id=book_id)
+        .annotate(already_borrowed=Exists(
+            BooksBorrowed.objects.filter(user_id=user_id, book_id=OuterRef("pk"))
+        ))
+        .values("book_name", "already_borrowed")
+        .first()
+    )
+    if book is None:
+        raise CheckoutError("Book not found.")
+    if book["already_borrowed"]:
+        raise CheckoutError("You already borrowed this book.")
+
+    taken = Books.objects.filter(id=book_id, quantity__gt=0).update(quantity=F("quantity") - 1)
+    if not taken:
+        raise CheckoutError("This book is out of stock.")
+
+    # Availability shown in the cached book grid has changed
+    invalidate_catalog()
+
+    borrowed_date = timezone.now()
+    return BooksBorrowed.objects.create(
+        user_id_id=user_id,
+        book_id=Books(id=book_id, book_name=book["book_name"]),
+        borrowed_date=borrowed_date,
+        due_date=borrowed_date + LOAN_PERIOD,
+    )
+
+
+# ------------------------------
+# RETURN
+# ------------------------------
+@transaction.atomic
+def return_loan(user_id, borrow_id):
+    """
+    Close a loan in one transaction: lock it, archive it in BooksReturned,
+    give the copy back with ``quantity = quantity + 1`` and delete it from
+    the active loans table (which decrements the user's loan counter, see
+    signals.loan_deleted). Locking the loan makes a double submit of the
+    same return a no-op instead of a second increment. Returns the book
+    name or raises ReturnError.
+    """
+    loan = (
+        BooksBorrowed.objects
+        .select_for_update(of=("self",))
+        .filter(id=borrow_id, user_id=user_id)
+        .values("id", "book_id", "borrowed_date", "due_date", "book_id__book_name")
+        .first()
+    )
+    if loan is None:
+        raise ReturnError("Borrow entry not found.")
+
+    BooksReturned.objects.create(
+        user_id_id=user_id,
+        book_id_id=loan["book_id"],
+        borrowed_date=loan["borrowed_date"],
+        due_date=loan["due_date"],
+    )
+    Books.objects.filter(id=loan["book_id"]).update(quantity=F("quantity") + 1)
+    invalidate_catalog()
+    BooksBorrowed.objects.filter(id=loan["id"]).delete()
+
+    return loan["book_id__book_name"]
@@ -0,0 +1,49 @@
+import time
+
+from django.conf import settings
+from django.contrib.sessions.models import Session
+from django.utils import timezone
+
+# Engines that keep sessions in the django_session table
+DATABASE_SESSION_ENGINES = {
+    "django.contrib.sessions.backends.db",
+    "django.contrib.sessions.backends.cached_db",
+}
+
+
+def uses_session_table():
+    return settings.SESSION_ENGINE in DATABASE_SESSION_ENGINES
+
+
+def clear_expired_sessions(batch_size=None, pause=0, progress=None):
+    """
+    Delete expired rows from the session table in batches of ``batch_size``,
+    each in its own short transaction, instead of Django's single
+    ``DELETE ... WHERE expire_date < now`` that locks and bloats the table
+    in one go. ``pause`` seconds are slept between batches to leave room
+    for live traffic; ``progress(deleted)`` is called after every batch.
+    Returns the number of sessions deleted.
+    """
+    batch_size = batch_size or settings.LIBRARY_SESSION_CLEANUP_BATCH_SIZE
+    now = timezone.now()
+    deleted = 0
+
+    while True:
+        # expire_date is indexed, so each batch is an index range scan
+        keys = list(
+            Session.objects
+            .filter(expire_date__lt=now)
+            .values_list("session_key", flat=True)[:batch_size]
+        )
+        if not keys:
+            break
+        count, _ = Session.objects.filter(session_key__in=keys).delete()
+        deleted += count
+        if progress:
+            progress(deleted)
+        if len(keys) < batch_size:
+            break
+        if pause:
+            time.sleep(pause)
+
+    return deleted
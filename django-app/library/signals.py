@@ -0,0 +1,91 @@
+from django.conf import settings
+from django.core.signals import request_started
+from django.db import transaction
+from django.db.models import F
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Books, BooksBorrowed, Categories, CategoriesPerBook, Users
+from .cache import invalidate_catalog, request_catalog_version
+from .search import update_search_vector
+from .thumbnails import ingest_in_background
+
+# Fields of Books that feed the search vector
+SEARCH_FIELDS = {"book_name", "author"}
+
+
+# ------------------------------
+# SEARCH VECTOR MAINTENANCE
+# ------------------------------
+@receiver(post_save, sender=Books)
+def book_saved(sender, instance, created, update_fields=None, **kwargs):
+    if update_fields is not None and not SEARCH_FIELDS & set(update_fields):
+        return
+    update_search_vector([instance.pk])
+
+
+@receiver(post_save, sender=CategoriesPerBook)
+@receiver(post_delete, sender=CategoriesPerBook)
+def book_category_changed(sender, instance, **kwargs):
+    update_search_vector([instance.book_id_id])
+
+
+@receiver(post_save, sender=Categories)
+def category_saved(sender, instance, created, **kwargs):
+    if created:
+        return
+    book_ids = CategoriesPerBook.objects.filter(category_id=instance).values("book_id")
+    update_search_vector(book_ids)
+
+
+# ------------------------------
+# THUMBNAILS
+# ------------------------------
+@receiver(post_save, sender=Books)
+def book_cover_saved(sender, instance, update_fields=None, **kwargs):
+    if update_fields is not None and "thumbnail" not in update_fields:
+        return
+    if not instance.thumbnail:
+        if instance.thumbnail_key or instance.thumbnail_source:
+            Books.objects.filter(id=instance.pk).update(thumbnail_key="", thumbnail_source=None)
+        return
+    if instance.thumbnail == instance.thumbnail_source:
+        return
+    # The new URL is pending ingestion (thumbnail_source differs); until
+    # then the placeholder shows rather than the previous cover
+    if instance.thumbnail_key:
+        Books.objects.filter(id=instance.pk).update(thumbnail_key="")
+    if settings.LIBRARY_THUMBNAIL_INGEST_ON_SAVE:
+        # Queued once the book is committed, off the request thread
+        book_id, url = instance.pk, instance.thumbnail
+        transaction.on_commit(lambda: ingest_in_background(book_id, url))
+
+
+# ------------------------------
+# LOAN COUNTERS
+# ------------------------------
+@receiver(post_delete, sender=BooksBorrowed)
+def loan_deleted(sender, instance, **kwargs):
+    # However a loan goes away (a return, the Django admin, the shell, or a
+    # cascade from its book or borrower), its slot is given back
+    Users.objects.filter(id=instance.user_id_id, active_loans__gt=0).update(active_loans=F("active_loans") - 1)
+
+
+# ------------------------------
+# CATALOG CACHE INVALIDATION
+# ------------------------------
+@receiver(post_save, sender=Books)
+@receiver(post_delete, sender=Books)
+@receiver(post_save, sender=Categories)
+@receiver(post_delete, sender=Categories)
+@receiver(post_save, sender=CategoriesPerBook)
+@receiver(post_delete, sender=CategoriesPerBook)
+def catalog_changed(sender, **kwargs):
+    invalidate_catalog()
+
+
+@receiver(request_started)
+def forget_catalog_version(sender, **kwargs):
+    # Each request takes the version afresh (once): the process's recent
+    # read, or the shared sequence
+    request_catalog_version.set(None)
@@ -0,0 +1,347 @@
+import hashlib
+import random
+from array import array
+from datetime import datetime, time as dt_time, timedelta, timezone as dt_timezone
+from io import StringIO
+from itertools import chain
+
+from django.contrib.auth.hashers import make_password
+from django.db import connection, transaction
+from django.utils import timezone
+
+from .cache import invalidate_catalog
+from .importer import import_categories
+from .models import Books, loan_limit_for_role
+from .search import bulk_update_search_vector
+from .services import LOAN_PERIOD
+
+# Rows sent per COPY statement
+COPY_CHUNK_SIZE = 50_000
+# Loans are borrowed up to this many days ago; past LOAN_PERIOD they are overdue
+LOAN_SPREAD_DAYS = 90
+# Password of every generated user
+SYNTHETIC_PASSWORD = "Synthetic123"
+
+FIRST_NAMES = [
+    "James", "Mary", "John", "Patricia", "Robert", "Jennifer", "Michael", "Linda", "William", "Elizabeth",
+    "David", "Barbara", "Richard", "Susan", "Joseph", "Jessica", "Thomas", "Sarah", "Charles", "Karen",
+    "Pedro", "Ana", "João", "Maria", "Luís", "Inês", "Miguel", "Beatriz", "Tiago", "Sofia",
+    "Hans", "Greta", "Pierre", "Amélie", "Giulia", "Marco", "Yuki", "Haruto", "Olga", "Ivan",
+    "Aisha", "Omar", "Priya", "Arjun", "Mei", "Wei", "Chloe", "Lucas", "Nora", "Elena",
+]
+LAST_NAMES = [
+    "Smith", "Johnson", "Williams", "Brown", "Jones", "Garcia", "Miller", "Davis", "Rodriguez", "Martinez",
+    "Silva", "Santos", "Ferreira", "Pereira", "Oliveira", "Costa", "Rodrigues", "Almeida", "Carvalho", "Lopes",
+    "Müller", "Schmidt", "Schneider", "Fischer", "Weber", "Dubois", "Laurent", "Moreau", "Rossi", "Russo",
+    "Bianchi", "Tanaka", "Suzuki", "Sato", "Watanabe", "Ivanov", "Petrova", "Kowalski", "Nowak", "Novak",
+    "Kim", "Lee", "Park", "Chen", "Wang", "Li", "Zhang", "Singh", "Patel", "Khan",
+    "O'Brien", "Murphy", "Kelly", "Walsh", "Byrne", "Andersen", "Nielsen", "Hansen", "Larsen", "Berg",
+    "Lindqvist", "Virtanen", "Korhonen", "Novotný", "Horváth", "Nagy", "Popescu", "Papadopoulos", "Yilmaz", "Demir",
+    "Cohen", "Levi", "Haddad", "Mansour", "Okafor", "Adeyemi", "Mensah", "Diallo", "Traoré", "Mwangi",
+    "Hughes", "Edwards", "Turner", "Parker", "Collins", "Stewart", "Morris", "Rogers", "Reed", "Cook",
+    "Morgan", "Bell", "Bailey", "Cooper", "Howard", "Ward", "Cox", "Gray", "James", "Bennett",
+]
+ADJECTIVES = [
+    "Silent", "Last", "Hidden", "Lost", "Broken", "Golden", "Dark", "Forgotten", "Secret", "Burning",
+    "Midnight", "Crimson", "Endless", "Wandering", "Quiet", "Fallen", "Distant", "Frozen", "Little", "Final",
+    "Invisible", "Bright", "Wild", "Strange", "Shattered", "Eternal", "Hollow", "Silver", "Savage", "Gentle",
+]
+NOUNS = [
+    "House", "River", "Garden", "City", "Night", "Kingdom", "Sea", "Road", "Mountain", "Storm",
+    "Library", "Mirror", "Shadow", "Forest", "Island", "Letter", "Daughter", "Son", "Crown", "Winter",
+    "Summer", "Fire", "Stone", "Star", "Heart", "Empire", "Journey", "Promise", "Memory", "Witness",
+    "Clockmaker", "Cartographer", "Lighthouse", "Orchard", "Harbor", "Labyrinth", "Archive", "Voyage", "Bridge", "Sky",
+]
+PLACES = [
+    "Lisbon", "Paris", "Venice", "Kyoto", "Cairo", "Prague", "Havana", "Oslo", "Istanbul", "Marrakesh",
+    "the North", "the Valley", "the Coast", "the Desert", "the Old Town", "the Moor", "the Delta", "the Steppe",
+]
+TITLE_PATTERNS = [
+    "The {adjective} {noun}",
+    "The {noun} of {place}",
+    "{adjective} {noun}",
+    "A {noun} in {place}",
+    "The {noun}'s {noun2}",
+    "{noun} and {noun2}",
+    "The {adjective} {noun} of {place}",
+    "Return to {place}",
+]
+GENRES = [
+    "Fiction", "Fantasy", "Science Fiction", "Mystery", "Thriller", "Romance", "Horror", "Historical Fiction",
+    "Biography", "History", "Poetry", "Drama", "Philosophy", "Science", "Self-Help", "Travel",
+    "Children", "Young Adult", "Classics", "Graphic Novels", "Crime", "Adventure", "Humor", "Essays",
+    "Psychology", "Economics", "Politics", "Religion", "Art", "Music", "Cooking", "Health",
+]
+GENRE_QUALIFIERS = [
+    "Contemporary", "Classic", "Modern", "Portuguese", "European", "Japanese", "Latin American", "African",
+    "Nordic", "Short", "Illustrated", "Dark", "Cozy", "Epic", "Urban", "Literary",
+]
+
+
+def skewed_index(rng, n, skew):
+    """Index in [0, n) where low indexes are far more likely (skew 1 is uniform)."""
+    return int(n * rng.random() ** skew)
+
+
+def author_name(index):
+    combinations = len(FIRST_NAMES) * len(LAST_NAMES)
+    # Scatter neighbouring indexes (the most prolific authors) over both name lists
+    combination = index * 7919 % combinations
+    first = FIRST_NAMES[combination % len(FIRST_NAMES)]
+    last = LAST_NAMES[combination // len(FIRST_NAMES)]
+    generation = index // combinations
+    if generation:
+        # Past the plain combinations, tell authors apart by a middle initial
+        return f"{first} {chr(ord('A') + (generation - 1) % 26)}. {last}"
+    return f"{first} {last}"
+
+
+def book_title(rng):
+    noun, noun2 = rng.sample(NOUNS, 2)
+    return rng.choice(TITLE_PATTERNS).format(
+        adjective=ADJECTIVES[skewed_index(rng, len(ADJECTIVES), 1.5)],
+        noun=noun,
+        noun2=noun2,
+        place=PLACES[skewed_index(rng, len(PLACES), 1.5)],
+    )
+
+
+def category_names(count):
+    names = list(GENRES[:count])
+    for qualifier in GENRE_QUALIFIERS:
+        for genre in GENRES:
+            if len(names) >= count:
+                return names
+            names.append(f"{qualifier} {genre}")
+    # Beyond the named combinations, number the genres
+    names += [f"{GENRES[i % len(GENRES)]} {i // len(GENRES)}" for i in range(len(names), count)]
+    return names
+
+
+# ------------------------------
+# COPY
+# ------------------------------
+def copy_value(value):
+    """A value in PostgreSQL's COPY text format."""
+    if value is None:
+        return "\\N"
+    if isinstance(value, str):
+        return value.replace("\\", "\\\\").replace("\t", "\\t").replace("\n", "\\n").replace("\r", "\\r")
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+
+def copy_rows(table, columns, rows, progress=None):
+    """
+    Stream rows into a table with COPY, in chunks of COPY_CHUNK_SIZE. This
+    is several times faster than multi-row INSERTs (bulk_create) and skips
+    model signals, like the importer's bulk path. Returns the row count.
+    """
+    sql = f"COPY {table} ({', '.join(columns)}) FROM STDIN"
+    count = 0
+    buffer = StringIO()
+
+    def flush():
+        buffer.seek(0)
+        with connection.cursor() as cursor:
+            if hasattr(cursor, "copy_expert"):  # psycopg2
+                cursor.copy_expert(sql, buffer)
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    copy.write(buffer.getvalue())
+        buffer.seek(0)
+        buffer.truncate()
+
+    for row in rows:
+        buffer.write("\t".join(copy_value(value) for value in row))
+        buffer.write("\n")
+        count += 1
+        if count % COPY_CHUNK_SIZE == 0:
+            flush()
+            if progress:
+                progress(table, count)
+    if count % COPY_CHUNK_SIZE:
+        flush()
+        if progress:
+            progress(table, count)
+    return count
+
+
+def next_ids(*tables):
+    """First free id of each table, after locking them against concurrent writers."""
+    with connection.cursor() as cursor:
+        cursor.execute(f"LOCK TABLE {', '.join(tables)} IN SHARE ROW EXCLUSIVE MODE")
+        ids = []
+        for table in tables:
+            cursor.execute(f"SELECT COALESCE(MAX(id), 0) + 1 FROM {table}")
+            ids.append(cursor.fetchone()[0])
+    return ids
+
+
+def reset_sequences(*tables):
+    with connection.cursor() as cursor:
+        for table in tables:
+            cursor.execute(
+                f"SELECT setval(pg_get_serial_sequence('{table}', 'id'), COALESCE(MAX(id), 1)) FROM {table}"
+            )
+
+
+# ------------------------------
+# GENERATOR
+# ------------------------------
+@transaction.atomic
+def generate_library(books, categories, users, loans, seed=0, progress=None):
+    """
+    Add a synthetic library to the database in one transaction: ``books``
+    books by a skewed pool of authors (a few prolific ones, a long tail),
+    ``categories`` genres with skewed membership (each book in 1-3), and
+    ``users`` patrons holding ``loans`` open loans of popular books, with
+    borrow dates spread over the last LOAN_SPREAD_DAYS days (so some are
+    overdue). Stock and loan counters are consistent with the loans.
+
+    Every table has its own generator seeded from ``seed``, so the same
+    arguments on an empty database give the same rows; only the loan dates
+    move with the day the generator runs. Rows go through COPY and skip
+    model signals, so search vectors are rebuilt at the end.
+    ``progress(table, rows)`` is called after every COPY chunk. Returns the
+    number of rows created per table.
+    """
+    rngs = {name: random.Random(f"{seed}:{name}") for name in ("stock", "loans", "books", "links", "users")}
+    created = {}
+
+    # Existing categories of the same name are reused
+    names = category_names(categories)
+    category_ids = import_categories(names, {})
+    category_list = [category_ids[name] for name in names]
+    created["categories"] = len(category_list)
+
+    first_book, first_user, first_loan, first_link = next_ids(
+        "library_books", "library_users", "library_booksborrowed", "library_categoriesperbook"
+    )
+
+    # Copies per book (mostly 1-3, a few up to 10); loans take from this stock
+    available = array("H", (1 + skewed_index(rngs["stock"], 10, 2.5) for _ in range(books)))
+    loan_limit = loan_limit_for_role("user")
+    loans = min(loans, users * loan_limit, sum(available))
+
+    # Loans are drawn first, so each book's stock and each user's counter
+    # match them, and kept compactly until the books and users are written
+    loan_counts = array("B", bytes(users))
+    loan_users, loan_books, loan_seconds = array("q"), array("q"), array("l")
+    rng = rngs["loans"]
+    slots_left, loans_left = users * loan_limit, loans
+    for user in range(users):
+        # Selection sampling over the loan slots gives exactly ``loans`` loans
+        held = set()
+        for _ in range(loan_limit):
+            if loans_left and rng.random() * slots_left < loans_left:
+                book = pick_available_book(rng, available, held)
+                if book is not None:
+                    held.add(book)
+                    loans_left -= 1
+            slots_left -= 1
+        loan_counts[user] = len(held)
+        for book in sorted(held):
+            loan_users.append(first_user + user)
+            loan_books.append(first_book + book)
+            loan_seconds.append(rng.randrange(LOAN_SPREAD_DAYS * 24 * 3600))
+
+    rng = rngs["books"]
+    authors = max(1, books // 10)
+    # Title and author are unique together, so a repeated pair becomes a
+    # later volume. Pairs are kept as 8-byte digests, which unlike hash()
+    # are the same in every process, so a seed numbers the same volumes
+    # each run (a collision only numbers a volume that did not need it).
+    def pair_digest(name, author):
+        return hashlib.blake2b(f"{name}\x1f{author}".encode(), digest_size=8).digest()
+
+    taken = {
+        pair_digest(name, author)
+        for name, author in Books.objects.values_list("book_name", "author").iterator(chunk_size=COPY_CHUNK_SIZE)
+    }
+
+    def book_rows():
+        for i in range(books):
+            title, author = book_title(rng), author_name(skewed_index(rng, authors, 1.6))
+            name, volume = title, 1
+            while (digest := pair_digest(name, author)) in taken:
+                volume += 1
+                name = f"{title}, Vol. {volume}"
+            taken.add(digest)
+            yield first_book + i, name, author, available[i], None, ""
+
+    created["books"] = copy_rows(
+        "library_books", ["id", "book_name", "author", "quantity", "thumbnail", "thumbnail_key"],
+        book_rows(), progress,
+    )
+
+    rng = rngs["users"]
+    password = make_password(SYNTHETIC_PASSWORD, salt=f"synthetic{seed}")
+
+    def user_rows():
+        for user in range(users):
+            user_id = first_user + user
+            # Sign-in is by name, so names must be unique
+            name = f"{FIRST_NAMES[rng.randrange(len(FIRST_NAMES))]} {LAST_NAMES[rng.randrange(len(LAST_NAMES))]} {user_id}"
+            yield user_id, name, f"reader{user_id}@synthetic.example", password, "user", loan_counts[user], loan_limit
+
+    created["users"] = copy_rows(
+        "library_users", ["id", "name", "email", "password", "role", "active_loans", "loan_limit"],
+        user_rows(), progress,
+    )
+
+    midnight = datetime.combine(timezone.now().date(), dt_time(), tzinfo=dt_timezone.utc)
+
+    def loan_rows():
+        for n, (user_id, book_id, seconds) in enumerate(zip(loan_users, loan_books, loan_seconds)):
+            borrowed_at = midnight - timedelta(seconds=seconds)
+            yield first_loan + n, user_id, book_id, borrowed_at.date(), borrowed_at + LOAN_PERIOD
+
+    created["loans"] = copy_rows(
+        "library_booksborrowed", ["id", "user_id_id", "book_id_id", "borrowed_date", "due_date"],
+        loan_rows(), progress,
+    )
+
+    created["categories_per_book"] = copy_rows(
+        "library_categoriesperbook", ["id", "book_id_id", "category_id_id"],
+        (
+            (first_link + n, book_id, category_id)
+            for n, (book_id, category_id) in enumerate(book_categories(rngs["links"], first_book, books, category_list))
+        ),
+        progress,
+    )
+
+    reset_sequences("library_books", "library_users", "library_booksborrowed", "library_categoriesperbook")
+    bulk_update_search_vector(first_book)
+    invalidate_catalog()
+    return created
+
+
+def pick_available_book(rng, available, held):
+    """A popular book with a copy left that the user does not hold yet, or None."""
+    books = len(available)
+    for _ in range(10):
+        book = skewed_index(rng, books, 2)
+        if available[book] and book not in held:
+            available[book] -= 1
+            return book
+    # The popular books are taken: fall back to a scan from a random start
+    start = rng.randrange(books)
+    for book in chain(range(start, books), range(start)):
+        if available[book] and book not in held:
+            available[book] -= 1
+            return book
+    return None
+
+
+def book_categories(rng, first_book, books, category_list):
+    """(book id, category id) pairs: 1-3 categories per book, popular genres first."""
+    if not category_list:
+        return
+    for i in range(books):
+        count = rng.choices((1, 2, 3), weights=(50, 35, 15))[0]
+        chosen = {category_list[skewed_index(rng, len(category_list), 2)] for _ in range(count)}
+        for category_id in sorted(chosen):
+            yield first_book + i, category_id
+
@@ -0,0 +1,26 @@
+from django import template
+from django.conf import settings
+
+from library.thumbnails import VARIANT_FORMATS, thumbnail_url, variant_name
+
+register = template.Library()
+
+
+@register.inclusion_tag("book-cover.html")
+def book_cover(key, alt="", css_class="", sizes="100vw"):
+    """
+    Lazy-loaded <picture> for a book's resized cover (WebP with a JPEG
+    fallback, one srcset entry per width), or the bundled placeholder when
+    the book has no ingested cover.
+    """
+    context = {"alt": alt, "css_class": css_class, "sizes": sizes}
+    if not key:
+        return context
+
+    widths = sorted(settings.LIBRARY_THUMBNAIL_WIDTHS)
+    context["srcsets"] = {
+        ext: ", ".join(f"{thumbnail_url(variant_name(key, width, ext))} {width}w" for width in widths)
+        for ext in VARIANT_FORMATS
+    }
+    context["src"] = thumbnail_url(variant_name(key, widths[-1], "jpg"))
+    return context
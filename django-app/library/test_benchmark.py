@@ -0,0 +1,66 @@
+import json
+import platform
+
+import pytest
+from library.benchmark import check_result, load_baseline, measure, percentile, save_baseline, warn_if_other_python
+from library.models import Books
+
+
+def result(min_ms, queries=1):
+    return {"iterations": 5, "min_ms": min_ms, "p50_ms": min_ms, "p95_ms": min_ms, "p99_ms": min_ms,
+            "max_ms": min_ms, "queries": queries}
+
+
+class TestBenchmarkHelpers:
+    def test_percentile(self):
+        samples = [5, 1, 4, 2, 3]
+        assert percentile(samples, 50) == 3
+        assert percentile(samples, 95) == 5
+        assert percentile(samples, 0) == 1
+
+    def test_query_budget(self):
+        assert check_result("index", result(1.0, queries=2), 2, {}) == []
+        assert check_result("index", result(1.0, queries=3), 2, {}) == ["index: 3 queries, budget is 2"]
+
+    def test_regression_against_baseline(self):
+        baseline = {"index": result(20.0)}
+        assert check_result("index", result(39.0), 5, baseline) == []
+        [problem] = check_result("index", result(41.0), 5, baseline)
+        assert problem.startswith("index: fastest run 41.00 ms, baseline 20.00 ms")
+        # Small views get an absolute margin instead
+        assert check_result("index", result(6.5), 5, {"index": result(2.0)}) == []
+        # Unknown benchmarks are only held to their budget
+        assert check_result("search", result(500.0), 5, baseline) == []
+
+    def test_save_merges_into_baseline(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        assert load_baseline(path) == {}
+        save_baseline({"b": result(2.0)}, path)
+        save_baseline({"a": result(1.0), "b": result(3.0)}, path)
+
+        assert load_baseline(path) == {"a": result(1.0), "b": result(3.0)}
+        assert "cpus" in json.loads(path.read_text())["machine"]
+
+    def test_warns_about_another_python(self, tmp_path):
+        path = tmp_path / "baseline.json"
+        assert not warn_if_other_python(path)
+        save_baseline({"a": result(1.0)}, path)
+        assert not warn_if_other_python(path)
+
+        recorded = json.loads(path.read_text())
+        recorded["machine"]["python"] = "3.0.1"
+        path.write_text(json.dumps(recorded))
+        with pytest.warns(UserWarning, match=f"recorded on Python 3.0.1, this is Python {platform.python_version()}"):
+            assert warn_if_other_python(path)
+
+
+@pytest.mark.django_db
+def test_measure_counts_queries_per_call():
+    calls = []
+    stats = measure(lambda i: (calls.append(i), Books.objects.count()), iterations=4,
+                    setup=lambda i: Books.objects.exists())
+
+    assert calls == list(range(7))  # three warm-up calls first
+    assert stats["iterations"] == 4
+    assert stats["queries"] == 1  # setup queries are not counted
+    assert stats["min_ms"] <= stats["p50_ms"] <= stats["p95_ms"] <= stats["max_ms"]
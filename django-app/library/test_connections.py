@@ -0,0 +1,43 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.urls import reverse
+from library.models import Books
+
+
+@pytest.mark.django_db(transaction=True)
+class TestConnectionSetupTiming:
+    def setup_method(self):
+        self.client = Client()
+        Books.objects.create(book_name="Test Book", author="Test Author", quantity=1)
+
+    def test_new_connection(self):
+        connection.close()
+        response = self.client.get(reverse("index"))
+
+        assert response.status_code == 200
+        assert 'desc="1 new"' in response["Server-Timing"]
+        assert connection.connection_setups >= 1
+
+    def test_persistent_connection(self):
+        connection.ensure_connection()
+        response = self.client.get(reverse("index"))
+
+        assert response["Server-Timing"].startswith("db-connect;dur=0.00;")
+        assert 'desc="0 new"' in response["Server-Timing"]
+
+
+class TestConnectionSettings:
+    def test_no_persistent_connections_under_asgi(self, settings_value):
+        expression = "settings.DATABASES['default']['CONN_MAX_AGE']"
+        assert settings_value(expression).stdout.strip() == "60"
+        assert settings_value(expression, LIBRARY_ASGI="1").stdout.strip() == "0"
+
+    def test_pool_without_psycopg_pool(self, settings_value):
+        try:
+            import psycopg_pool  # noqa: F401
+            pytest.skip("psycopg_pool is installed")
+        except ImportError:
+            pass
+        result = settings_value("settings.DATABASES", LIBRARY_DB_POOL="1")
+        assert "ImproperlyConfigured" in result.stderr
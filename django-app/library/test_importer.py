@@ -0,0 +1,139 @@
+import json
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from library.models import Books, Categories, CategoriesPerBook
+from library import importer
+from library.search import search_books
+
+FEED = {
+    "categories": [
+        {"id": 1, "category_name": "Fantasy"},
+        {"id": 2, "category_name": "Adventure"},
+    ],
+    "books": [
+        {"id": 1, "book_name": "The Hobbit", "author": "J. R. R. Tolkien", "categories": [1, 2], "quantity": 2},
+        {"id": 2, "book_name": "Treasure Island", "author": "R. L. Stevenson", "categories": [2]},
+        {"id": 3, "book_name": "The Hobbit", "author": "J. R. R. Tolkien", "categories": [1]},
+    ],
+}
+
+
+@pytest.mark.django_db
+class TestBulkImport:
+    def setup_method(self):
+        self.out = StringIO()
+
+    def load(self, tmp_path, *args):
+        feed = tmp_path / "books.json"
+        feed.write_text(json.dumps(FEED), encoding="utf-8")
+        call_command("load_books_data", str(feed), *args, stdout=self.out)
+
+    def test_bulk_import(self, tmp_path):
+        self.load(tmp_path, "--bulk", "--batch-size", "2")
+
+        assert Categories.objects.count() == 2
+        assert Books.objects.count() == 2
+        assert Books.objects.get(book_name="The Hobbit").author == "J. R. R. Tolkien"
+        assert CategoriesPerBook.objects.count() == 3
+        assert "rows/s" in self.out.getvalue()
+        # Search index is filled despite bulk_create skipping signals
+        assert {b.book_name for b in search_books("adventure")} == {"The Hobbit", "Treasure Island"}
+
+    def test_bulk_import_is_idempotent(self, tmp_path):
+        self.load(tmp_path)
+        counts = (Categories.objects.count(), Books.objects.count(), CategoriesPerBook.objects.count())
+
+        self.load(tmp_path, "--bulk")
+        self.load(tmp_path, "--bulk")
+        assert (Categories.objects.count(), Books.objects.count(), CategoriesPerBook.objects.count()) == counts
+
+    def test_rerun_writes_no_books(self, django_assert_max_num_queries):
+        batch = [{"book_name": "Emma", "author": "Jane Austen", "categories": ["Classic"]}]
+        importer.import_books_batch(batch, {})
+
+        with django_assert_max_num_queries(10) as queries:
+            assert importer.import_books_batch(batch, {}) == (0, 0)
+        assert not [q["sql"] for q in queries.captured_queries if q["sql"].startswith(("INSERT", "UPDATE"))]
+
+    def test_books_match_on_title_and_author(self):
+        Books.objects.create(book_name="Emma", author="Jane Austen")
+
+        created, _ = importer.import_books_batch([
+            {"book_name": "Emma", "author": "Jane Austen", "categories": ["Classic"]},
+            {"book_name": "Emma", "author": "Someone Else", "categories": []},
+        ], {})
+
+        assert created == 1
+        assert sorted(Books.objects.values_list("author", flat=True)) == ["Jane Austen", "Someone Else"]
+        assert {b.author for b in search_books("classic")} == {"Jane Austen"}
+
+    def test_concurrent_import_cannot_duplicate(self, monkeypatch):
+        bulk_create = Books.objects.bulk_create
+
+        def racing_bulk_create(objs, **kwargs):
+            # Another import commits the same book after this one looked for it
+            Books.objects.create(book_name="Dune", author="Frank Herbert")
+            return bulk_create(objs, **kwargs)
+
+        monkeypatch.setattr(Books.objects, "bulk_create", racing_bulk_create)
+        importer.import_books_batch([{"book_name": "Dune", "author": "Frank Herbert", "categories": ["Sci-Fi"]}], {})
+
+        assert Books.objects.filter(book_name="Dune").count() == 1
+        assert CategoriesPerBook.objects.filter(book_id__book_name="Dune").count() == 1
+
+
+@pytest.mark.django_db
+class TestStreamingImport:
+    def test_json_feed_is_read_incrementally(self, tmp_path, monkeypatch):
+        # A tiny read size forces values to straddle buffer boundaries
+        monkeypatch.setattr(importer, "READ_CHUNK_SIZE", 7)
+        feed = tmp_path / "books.json"
+        feed.write_text(json.dumps(FEED, indent=2), encoding="utf-8")
+
+        with open(feed, encoding="utf-8") as f:
+            rows = list(importer.read_json_feed(f))
+
+        assert [row["book_name"] for row in rows] == [book["book_name"] for book in FEED["books"]]
+        assert rows[0]["categories"] == ["Fantasy", "Adventure"]
+        assert rows[0]["quantity"] == 2
+
+    def test_jsonl_and_csv_feeds(self, tmp_path):
+        jsonl = tmp_path / "books.jsonl"
+        jsonl.write_text(
+            json.dumps({"book_name": "Dune", "author": "Frank Herbert", "categories": ["Sci-Fi"]}) + "\n",
+            encoding="utf-8",
+        )
+        csv_feed = tmp_path / "books.csv"
+        csv_feed.write_text(
+            "book_name,author,quantity,thumbnail,categories\n"
+            "Dune,Frank Herbert,4,,Sci-Fi|Classic\n"
+            "Emma,Jane Austen,1,,Classic\n",
+            encoding="utf-8",
+        )
+
+        call_command("load_books_data", str(jsonl), stdout=StringIO())
+        call_command("load_books_data", str(csv_feed), stdout=StringIO())
+
+        assert sorted(Books.objects.values_list("book_name", flat=True)) == ["Dune", "Emma"]
+        assert sorted(Categories.objects.values_list("category_name", flat=True)) == ["Classic", "Sci-Fi"]
+        assert CategoriesPerBook.objects.count() == 3
+
+    def test_resume_from_checkpoint(self, tmp_path):
+        feed = tmp_path / "books.jsonl"
+        feed.write_text("".join(
+            json.dumps({"book_name": f"Book {i}", "author": "Someone", "categories": []}) + "\n"
+            for i in range(5)
+        ), encoding="utf-8")
+        # A previous run committed the first three rows, then died
+        (tmp_path / "books.jsonl.checkpoint").write_text(
+            json.dumps({"rows": 3, "size": feed.stat().st_size}), encoding="utf-8"
+        )
+
+        out = StringIO()
+        call_command("load_books_data", str(feed), "--resume", stdout=out)
+
+        assert sorted(Books.objects.values_list("book_name", flat=True)) == ["Book 3", "Book 4"]
+        assert "resuming after 3" in out.getvalue()
+        assert not (tmp_path / "books.jsonl.checkpoint").exists()
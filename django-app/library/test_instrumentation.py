@@ -0,0 +1,130 @@
+import logging
+
+import pytest
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, Client
+from django.urls import reverse
+from library.instrumentation import RequestProfile, sql_shape
+from library.models import Books, Users
+
+
+def server_timing(response):
+    """Server-Timing metrics by name."""
+    return {entry.split(";")[0]: entry for entry in response["Server-Timing"].split(", ")}
+
+
+class TestSQLShape:
+    def test_literals_and_parameters(self):
+        assert sql_shape("SELECT * FROM books WHERE id = 12 AND name = 'It''s'") == \
+            sql_shape("SELECT *  FROM books WHERE id = %s AND name = %s") == \
+            "SELECT * FROM books WHERE id = ? AND name = ?"
+
+    def test_in_lists_collapse(self):
+        assert sql_shape("SELECT 1 FROM t WHERE id IN (%s, %s, %s)") == sql_shape("SELECT 1 FROM t WHERE id IN (%s)") \
+            == "SELECT ? FROM t WHERE id IN (...)"
+
+    def test_identifiers_are_kept(self):
+        assert sql_shape('SELECT "T3"."id" FROM "library_books" T3') == 'SELECT "T3"."id" FROM "library_books" T3'
+
+
+@pytest.mark.django_db
+class TestRequestProfile:
+    def test_repeated_queries(self):
+        books = [Books.objects.create(book_name=f"Book {i}", author="Author", quantity=1) for i in range(6)]
+        profile = RequestProfile()
+        with profile.recording():
+            for book in books:
+                Books.objects.get(id=book.id)
+            Users.objects.count()
+
+        assert profile.queries == 7
+        [(shape, count)] = profile.repeated_queries(5)
+        assert count == 6
+        assert shape.startswith('SELECT "library_books"."id"')
+        assert profile.repeated_queries(7) == []
+
+    def test_stops_recording(self):
+        profile = RequestProfile()
+        with profile.recording():
+            Books.objects.count()
+        Books.objects.count()
+        assert profile.queries == 1
+
+
+@pytest.mark.django_db
+class TestSQLInstrumentationMiddleware:
+    @pytest.fixture(autouse=True)
+    def setup(self, settings):
+        settings.LIBRARY_SQL_INSTRUMENTATION = True
+        Books.objects.create(book_name="Test Book", author="Test Author", quantity=1)
+
+    def test_server_timing(self):
+        response = Client().get(reverse("index"))
+
+        metrics = server_timing(response)
+        assert {"sql", "template", "view", "total", "db-connect"} <= set(metrics)
+        assert metrics["sql"].endswith('queries"') and 'desc="0 queries"' not in metrics["sql"]
+        assert "sql-repeated" not in metrics
+
+    def test_async_handler(self):
+        response = async_to_sync(AsyncClient().get)(reverse("index"))
+
+        metrics = server_timing(response)
+        assert 'desc="0 queries"' not in metrics["sql"]
+        assert float(metrics["template"].split("dur=")[1]) > 0
+
+    def test_log_line(self, caplog):
+        with caplog.at_level(logging.INFO, logger="library.requests"):
+            Client().get(reverse("index"))
+
+        [record] = [r for r in caplog.records if r.name == "library.requests"]
+        assert record.getMessage().startswith("method=GET path=/ status=200 queries=")
+        assert record.queries > 0 and record.repeated_queries == 0
+
+    def test_disabled_by_default(self, settings):
+        settings.LIBRARY_SQL_INSTRUMENTATION = False
+        response = Client().get(reverse("index"))
+
+        assert set(server_timing(response)) == {"db-connect"}
+
+    @pytest.fixture
+    def admin(self, settings):
+        Users.objects.create(name="Admin User", email="admin@example.com", password="AdminPassword123", role="admin")
+        # With a threshold of 1 every query shape is logged, which shows what was recorded
+        settings.LIBRARY_SQL_REPEAT_THRESHOLD = 1
+        return {"name": "Admin User", "password": "AdminPassword123"}
+
+    def assert_export_logged(self, records):
+        [record] = [r for r in records if r.levelno == logging.INFO]
+        assert record.path == reverse("admin_export") and record.streamed
+        assert any('FROM "library_books"' in r.sql_shape for r in records if r.levelno == logging.WARNING)
+
+    def test_streamed_response(self, admin, caplog):
+        client = Client()
+        client.post(reverse("auth_login"), admin)
+        caplog.clear()
+
+        with caplog.at_level(logging.INFO, logger="library.requests"):
+            response = client.get(reverse("admin_export"), {"dataset": "catalog"})
+            assert server_timing(response)["sql"] == 'sql;desc="streamed"'
+            # Logged once the body has been sent
+            assert not caplog.records
+            content = b"".join(response.streaming_content)
+
+        assert b"Test Book" in content
+        self.assert_export_logged(caplog.records)
+
+    def test_streamed_response_under_asgi(self, admin, caplog):
+        client = AsyncClient()
+        async_to_sync(client.post)(reverse("auth_login"), admin)
+        caplog.clear()
+
+        async def download():
+            response = await client.get(reverse("admin_export"), {"dataset": "catalog"})
+            return b"".join([chunk async for chunk in response.streaming_content])
+
+        with caplog.at_level(logging.INFO, logger="library.requests"):
+            content = async_to_sync(download)()
+
+        assert b"Test Book" in content
+        self.assert_export_logged(caplog.records)
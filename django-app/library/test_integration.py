@@ -1,7 +1,10 @@
+import re
+
 import pytest
+from django.db import connection
 from django.test import Client
 from django.urls import reverse
-from library.models import Users, Books, BooksBorrowed
+from library.models import Users, Books, BooksBorrowed, Categories, CategoriesPerBook
 
 @pytest.mark.django_db
 class TestIntegration:
@@ -194,6 +197,11 @@ class TestIntegration:
         assert new_book.book_name == "Updated Admin Book"
         assert new_book.quantity == 15
 
+        # Title and author are unique together
+        response = self.client.post(reverse('admin_manage'), update_data, follow=True)
+        assert Books.objects.filter(book_name="Updated Admin Book").count() == 1
+        assert "already exists" in response.content.decode()
+
         # Delete Book
         response = self.client.get(reverse('admin_delete_book', args=[new_book.id]))
         assert response.status_code == 302
@@ -217,3 +225,354 @@ class TestIntegration:
         response = self.client.get(reverse('admin_delete_book', args=[self.book.id]))
         assert response.status_code == 302
         assert Books.objects.filter(id=self.book.id).exists() # Book should still exist
+
+    def test_book_feed_pagination(self):
+        """Test that the homepage renders one page and the feed returns the next ones."""
+        from library.views import BOOKS_PAGE_SIZE
+        Books.objects.bulk_create([
+            Books(book_name=f"Paged Book {i:03d}", author="Paged Author", quantity=1)
+            for i in range(BOOKS_PAGE_SIZE + 5)
+        ])
+        total = Books.objects.count()
+
+        def book_ids(response):
+            return [int(book_id) for book_id in re.findall(r'data-book-id="(\d+)"', response.content.decode())]
+
+        response = self.client.get(reverse('index'))
+        seen = book_ids(response)
+        assert len(seen) == BOOKS_PAGE_SIZE
+        cursor = response.context["next_cursor"]
+        assert cursor == str(seen[-1])
+
+        # Follow the cursor until the feed is exhausted
+        while cursor:
+            response = self.client.get(reverse('book_feed'), {"after": cursor})
+            assert response.status_code == 200
+            seen += book_ids(response)
+            cursor = response["X-Next-Cursor"]
+
+        assert len(seen) == total
+        assert seen == sorted(set(seen))
+
+    def test_search_api(self):
+        """Test the live-search endpoint returns only matching books, capped by limit."""
+        Books.objects.create(book_name="Another Book", author="Another Author", quantity=3)
+
+        response = self.client.get(reverse('search_books_api'), {"q": "Another"})
+        assert response.status_code == 200
+        data = response.json()
+        assert [book["title"] for book in data["results"]] == ["Another Book"]
+        assert data["next_cursor"] is None
+
+        response = self.client.get(reverse('search_books_api'), {"q": "Book", "limit": 1})
+        data = response.json()
+        assert len(data["results"]) == 1
+        assert data["next_cursor"].endswith(f":{data['results'][0]['id']}")
+
+        # HTML fragment for the grid, without the rest of the page
+        response = self.client.get(reverse('search_books_api'), {"q": "Test", "format": "html"})
+        content = response.content.decode()
+        assert "Test Book" in content
+        assert "<html" not in content
+
+    def test_search_pagination_with_tied_ranks(self):
+        """Test that results sharing one rank are paged through exactly once each."""
+        for i in range(25):
+            Books.objects.create(book_name=f"Tied Title {i}", author="Tied Author", quantity=1)
+        expected = set(Books.objects.filter(book_name__startswith="Tied").values_list("id", flat=True))
+
+        seen, cursor = [], None
+        for _ in range(10):
+            params = {"q": "tied", "limit": 10}
+            if cursor:
+                params["after"] = cursor
+            data = self.client.get(reverse('search_books_api'), params).json()
+            seen += [book["id"] for book in data["results"]]
+            cursor = data["next_cursor"]
+            if not cursor:
+                break
+
+        assert len(seen) == len(expected)
+        assert set(seen) == expected
+
+    def test_search_cursor_without_rank(self):
+        """Test that an id-only cursor on a search starts over instead of failing."""
+        response = self.client.get(reverse('search_books_api'), {"q": "Test", "after": str(self.book.id)})
+        assert response.status_code == 200
+        assert [book["title"] for book in response.json()["results"]] == ["Test Book"]
+
+    def test_full_text_search(self):
+        """Test prefix, multi-word and category matches, ranked by relevance."""
+        fantasy = Categories.objects.create(category_name="Fantasy")
+        hobbit = Books.objects.create(book_name="The Hobbit", author="J. R. R. Tolkien", quantity=2)
+        CategoriesPerBook.objects.create(book_id=hobbit, category_id=fantasy)
+        fantasy_title = Books.objects.create(book_name="Fantasy Worlds", author="Someone Else", quantity=1)
+        CategoriesPerBook.objects.create(book_id=fantasy_title, category_id=fantasy)
+
+        response = self.client.get(reverse('search_books_api'), {"q": "tolk hobb"})
+        assert [book["title"] for book in response.json()["results"]] == ["The Hobbit"]
+
+        # Title matches rank above category-only matches
+        response = self.client.get(reverse('search_books_api'), {"q": "fantas"})
+        assert [book["title"] for book in response.json()["results"]] == ["Fantasy Worlds", "The Hobbit"]
+
+        # Renaming a category refreshes the books linked to it
+        fantasy.category_name = "Mythopoeia"
+        fantasy.save()
+        response = self.client.get(reverse('search_books_api'), {"q": "mythopoeia"})
+        assert len(response.json()["results"]) == 2
+
+    def test_fuzzy_search_fallback(self):
+        """Test that a misspelled search falls back to trigram matching."""
+        from library.search import trigram_enabled
+        if not trigram_enabled():
+            pytest.skip("pg_trgm is not available on this PostgreSQL server")
+
+        Books.objects.create(book_name="The Hobbit", author="J. R. R. Tolkien", quantity=2)
+
+        response = self.client.get(reverse('search_books_api'), {"q": "tolkein"})
+        assert [book["title"] for book in response.json()["results"]] == ["The Hobbit"]
+
+        response = self.client.get(reverse('search_books_api'), {"q": "hobit", "fuzzy": "1"})
+        assert [book["title"] for book in response.json()["results"]] == ["The Hobbit"]
+
+    def test_admin_dashboard_stats(self, django_assert_max_num_queries):
+        """Test dashboard stats and that loans are paginated server-side."""
+        from library.views import LOANS_PAGE_SIZE
+        from library.services import checkout_book
+        Users.objects.create(name="Admin User", email="admin@example.com", password="AdminPassword123", role="admin")
+        self.client.post(reverse('auth_login'), {"name": "Admin User", "password": "AdminPassword123"})
+
+        readers = Users.objects.bulk_create([
+            Users(name=f"Reader {i}", email=f"reader{i}@example.com", password="x", loan_limit=3)
+            for i in range(LOANS_PAGE_SIZE + 2)
+        ])
+        Books.objects.filter(id=self.book.id).update(quantity=100)
+        for reader in readers:
+            checkout_book(reader.id, self.book.id)
+        available = 100 - len(readers)
+
+        with django_assert_max_num_queries(8):
+            response = self.client.get(reverse('admin_dashboard'))
+        assert response.status_code == 200
+        assert len(response.context["loans_page"]) == LOANS_PAGE_SIZE
+        assert response.context["borrowed_count"] == LOANS_PAGE_SIZE + 2
+        assert response.context["total_titles"] == 1
+        assert response.context["total_books_count"] == available
+        assert response.context["total_holdings"] == 100
+
+        assert response.context["borrowed_count_exact"]
+        first_page = response.context["loans_page"]
+
+        response = self.client.get(reverse('admin_dashboard'), {"after": response.context["next_cursor"]})
+        assert len(response.context["loans_page"]) == 2
+        assert response.context["next_cursor"] is None
+        loans = first_page + response.context["loans_page"]
+        assert [loan.id for loan in loans] == list(
+            BooksBorrowed.objects.order_by("due_date", "id").values_list("id", flat=True)
+        )
+
+        # The user search covers every page, not only the one shown
+        last_reader = f"Reader {LOANS_PAGE_SIZE + 1}"
+        response = self.client.get(reverse('admin_dashboard'), {"user": last_reader.lower()})
+        assert [loan.user_id.name for loan in response.context["loans_page"]] == [last_reader]
+        assert response.context["next_cursor"] is None
+
+        response = self.client.get(reverse('admin_dashboard'), {"user": "reader"})
+        assert len(response.context["loans_page"]) == LOANS_PAGE_SIZE
+        assert "user=reader" in response.content.decode()
+        response = self.client.get(reverse('admin_dashboard'), {"user": "reader", "after": response.context["next_cursor"]})
+        assert len(response.context["loans_page"]) == 2
+
+    def test_admin_dashboard_estimates_large_loan_counts(self, monkeypatch):
+        from library import views
+        monkeypatch.setattr(views, "EXACT_LOAN_COUNT_LIMIT", 0)
+        Users.objects.create(name="Admin User", email="admin@example.com", password="AdminPassword123", role="admin")
+        self.client.post(reverse('auth_login'), {"name": "Admin User", "password": "AdminPassword123"})
+        with connection.cursor() as cursor:
+            cursor.execute("ANALYZE library_booksborrowed")
+
+        response = self.client.get(reverse('admin_dashboard'))
+        assert not response.context["borrowed_count_exact"]
+        assert "≈" in response.content.decode()
+
+    def test_book_grid_cache(self, django_assert_num_queries):
+        """Test that anonymous homepage hits are served from cache until the catalog changes."""
+        self.client.get(reverse('index'))
+
+        # Served without a query: the catalog version read is reused for a while
+        with django_assert_num_queries(0):
+            response = self.client.get(reverse('index'))
+        assert "Test Book" in response.content.decode()
+
+        # Editing a book invalidates the cached grid
+        self.book.book_name = "Renamed Book"
+        self.book.save()
+        content = self.client.get(reverse('index')).content.decode()
+        assert "Renamed Book" in content
+        assert "Test Book" not in content
+
+        # So does a checkout changing the available quantity
+        from library.services import checkout_book
+        checkout_book(self.user.id, self.book.id)
+        assert "4 Available" in self.client.get(reverse('index')).content.decode()
+
+    def test_catalog_write_in_another_worker(self, settings):
+        """Test that a version bump made by another process invalidates this one's caches."""
+        from django.db import connection
+        from library.cache import reset_catalog_version
+        self.client.get(reverse('index'))
+
+        # Changed without this process's invalidation, as in another worker
+        Books.objects.filter(id=self.book.id).update(book_name="Renamed Elsewhere")
+        assert "Test Book" in self.client.get(reverse('index')).content.decode()
+
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('library_catalog_version')")
+        # Seen once this process's last read of the version expires
+        assert "Test Book" in self.client.get(reverse('index')).content.decode()
+        settings.LIBRARY_CATALOG_VERSION_TTL = 0
+        assert "Renamed Elsewhere" in self.client.get(reverse('index')).content.decode()
+
+    def test_catalog_version_bumps(self):
+        """Test that a transaction writing many catalog rows bumps the version twice, not twice per row."""
+        from django.db import connection, transaction
+        from library.cache import catalog_version
+
+        def sequence_value():
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT last_value FROM library_catalog_version")
+                return cursor.fetchone()[0]
+
+        catalog_version()
+        before = sequence_value()
+        with transaction.atomic():
+            for i in range(20):
+                Books.objects.create(book_name=f"Bulk {i}", author="Someone", quantity=1)
+        # The commit bump is left to the test's own transaction
+        assert sequence_value() == before + 1
+
+        # A read between writes may have cached data the next write changes
+        with transaction.atomic():
+            Books.objects.create(book_name="First", author="Someone", quantity=1)
+            version = catalog_version()
+            Books.objects.create(book_name="Second", author="Someone", quantity=1)
+            assert catalog_version() > version
+
+    def test_search_result_cache(self, django_assert_num_queries):
+        """Test that repeated searches reuse the cached ids until the catalog changes."""
+        from library.cache import search_results
+        from asgiref.sync import async_to_sync
+        from library.views import asearch_catalog
+        search_catalog = async_to_sync(asearch_catalog)
+
+        books, _ = search_catalog("Test  BOOK")
+        assert [book["id"] for book in books] == [self.book.id]
+        assert search_results.stats()["misses"] == 1
+
+        # Same terms in another order and case: a primary-key fetch plus the categories prefetch
+        with django_assert_num_queries(2):
+            books, _ = search_catalog("book test")
+        assert [book["title"] for book in books] == ["Test Book"]
+        assert search_results.stats()["hits"] == 1
+
+        # A catalog write bumps the generation, so the search runs again
+        other = Books.objects.create(book_name="Another Test Book", author="Someone", quantity=1)
+        books, _ = search_catalog("test book")
+        assert {book["id"] for book in books} == {self.book.id, other.id}
+        assert search_results.stats()["misses"] == 2
+
+    def test_search_result_cache_eviction(self):
+        """Test that the least recently used search is evicted first."""
+        from library.cache import SearchResultCache
+
+        results = SearchResultCache(maxsize=2)
+        results.set(("a",), ([1], None))
+        results.set(("b",), ([2], None))
+        results.get(("a",))
+        results.set(("c",), ([3], None))
+
+        assert results.get(("b",)) is None
+        assert results.get(("a",)) == ([1], None)
+        assert results.stats()["size"] == 2
+
+    def test_conditional_catalog_responses(self, settings):
+        """Test that catalog pages answer If-None-Match with 304 until the catalog changes."""
+        response = self.client.get(reverse('index'))
+        etag = response["ETag"]
+        assert "public" in response["Cache-Control"]
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 304
+
+        # The same validator is not valid for another query or another endpoint
+        response = self.client.get(reverse('search_books_api'), {"q": "test"}, HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        api_etag = response["ETag"]
+        response = self.client.get(reverse('search_books_api'), {"q": "test"}, HTTP_IF_NONE_MATCH=api_etag)
+        assert response.status_code == 304
+
+        # Any catalog write changes the validator
+        Books.objects.create(book_name="Another Book", author="Someone", quantity=1)
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert "Another Book" in response.content.decode()
+
+        # So does a write committed by another worker (it only bumps the shared version)
+        from django.db import connection
+        settings.LIBRARY_CATALOG_VERSION_TTL = 0
+        etag = response["ETag"]
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT nextval('library_catalog_version')")
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=etag)
+        assert response.status_code == 200
+        assert response["ETag"] != etag
+
+    def test_conditional_catalog_user_parts(self):
+        """Test that signed-in pages are private and borrowed books are fetched separately."""
+        anonymous_etag = self.client.get(reverse('index'))["ETag"]
+
+        self.client.post(reverse('auth_login'), {"name": self.user_data["name"], "password": self.user_data["password"]})
+        self.client.get(reverse('borrow_book', args=[self.book.id]))
+
+        # The borrow message is pending, so the page is not revalidated
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=anonymous_etag)
+        assert response.status_code == 200
+        assert not response.has_header("ETag")
+        assert "private" in response["Cache-Control"]
+
+        response = self.client.get(reverse('index'), HTTP_IF_NONE_MATCH=anonymous_etag)
+        assert response.status_code == 200
+        assert response["ETag"] != anonymous_etag
+        assert "private" in response["Cache-Control"]
+        assert "Currently Borrowing" not in response.content.decode()
+
+        response = self.client.get(reverse('borrowed_books_preview'))
+        assert "Currently Borrowing" in response.content.decode()
+        assert "private" in response["Cache-Control"]
+
+    def test_async_views(self):
+        """Test the async catalog views and user dashboard through the ASGI request handler."""
+        from asgiref.sync import async_to_sync
+        from django.test import AsyncClient
+
+        category = Categories.objects.create(category_name="Fantasy")
+        CategoriesPerBook.objects.create(book_id=self.book, category_id=category)
+        BooksBorrowed.objects.create(user_id=self.user, book_id=self.book)
+        client = AsyncClient()
+
+        async def browse():
+            # A query left for the template would raise SynchronousOnlyOperation here
+            await client.post(reverse('auth_login'), {"name": self.user_data["name"], "password": self.user_data["password"]})
+            return (
+                await client.get(reverse('index')),
+                await client.get(reverse('search_books_api'), {"q": "test"}),
+                await client.get(reverse('user_dashboard')),
+            )
+
+        index, search, dashboard = async_to_sync(browse)()
+        assert "Test Book" in index.content.decode()
+        assert search.json()["results"][0]["categories"] == ["Fantasy"]
+        content = dashboard.content.decode()
+        assert "Test Book" in content
+        assert "Fantasy" in content
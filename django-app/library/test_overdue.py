@@ -0,0 +1,78 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.core.management import call_command
+from django.utils import timezone
+from library.models import Users, Books, BooksBorrowed, OverdueNotice
+from library.overdue import resume_point, scan_overdue_loans
+
+
+@pytest.mark.django_db
+class TestOverdueScan:
+    def setup_method(self):
+        self.now = timezone.now()
+        self.book = Books.objects.create(book_name="The Hobbit", author="J. R. R. Tolkien", quantity=10)
+        self.loans = []
+        for i in range(5):
+            user = Users.objects.create(name=f"Reader {i}", email=f"reader{i}@example.com", password="x")
+            self.loans.append(BooksBorrowed.objects.create(
+                user_id=user, book_id=self.book, due_date=self.now - timedelta(days=5 - i)
+            ))
+        self.current = BooksBorrowed.objects.create(
+            user_id=Users.objects.create(name="On time", email="ontime@example.com", password="x"),
+            book_id=self.book,
+        )
+
+    def test_scan_in_chunks(self):
+        progress = []
+        scanned, queued = scan_overdue_loans(
+            now=self.now, chunk_size=2, progress=lambda *counts: progress.append(counts)
+        )
+
+        assert (scanned, queued) == (5, 5)
+        assert progress == [(2, 2), (4, 4), (5, 5)]
+        notice = OverdueNotice.objects.get(loan_id=self.loans[0].id)
+        assert notice.email == "reader0@example.com"
+        assert notice.book_name == "The Hobbit"
+        assert notice.sent_at is None
+        assert not OverdueNotice.objects.filter(loan_id=self.current.id).exists()
+
+    def test_rescan_is_idempotent(self):
+        scan_overdue_loans(now=self.now, chunk_size=2)
+        assert scan_overdue_loans(now=self.now, chunk_size=2) == (5, 0)
+        assert OverdueNotice.objects.count() == 5
+
+    def test_resume(self):
+        # An interrupted scan committed the first chunk only
+        scan_overdue_loans(now=self.now - timedelta(days=3, hours=12), chunk_size=2)
+        assert resume_point(self.now) == (self.loans[2].due_date, self.loans[2].id - 1)
+
+        scanned, queued = scan_overdue_loans(now=self.now, after=resume_point(self.now), chunk_size=2)
+        assert (scanned, queued) == (3, 3)
+        assert OverdueNotice.objects.count() == 5
+
+    def test_resume_finds_loans_overdue_out_of_order(self):
+        scan_overdue_loans(now=self.now)
+        # Inserted already overdue, before the last queued loan (as the
+        # synthetic generator does), and a due date edited into the past
+        late = BooksBorrowed.objects.create(
+            user_id=Users.objects.create(name="Late", email="late@example.com", password="x"),
+            book_id=self.book, due_date=self.now - timedelta(days=30),
+        )
+        BooksBorrowed.objects.filter(id=self.current.id).update(due_date=self.now - timedelta(days=10))
+
+        assert scan_overdue_loans(now=self.now, after=resume_point(self.now)) == (7, 2)
+        assert OverdueNotice.objects.filter(loan_id__in=[late.id, self.current.id]).count() == 2
+        assert scan_overdue_loans(now=self.now, after=resume_point(self.now)) == (0, 0)
+
+    def test_command(self):
+        out = StringIO()
+        call_command("scan_overdue_loans", "--chunk-size", "2", stdout=out)
+        assert "5 overdue loans scanned, 5 notices queued" in out.getvalue()
+
+        # The next run has nothing left to queue
+        out = StringIO()
+        call_command("scan_overdue_loans", stdout=out)
+        assert "resuming from" in out.getvalue()
+        assert "0 overdue loans scanned, 0 notices queued" in out.getvalue()
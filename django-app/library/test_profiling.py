@@ -0,0 +1,111 @@
+import asyncio
+import cProfile
+
+import pytest
+from django.test import Client
+from django.urls import reverse
+from library.models import Books, Users
+from library.profiling import PROFILE_HEADER, list_profiles, profiled_steps
+
+
+@pytest.fixture(autouse=True)
+def profile_root(settings, tmp_path):
+    settings.LIBRARY_PROFILE_ROOT = str(tmp_path / "profiles")
+    return tmp_path / "profiles"
+
+
+def signed_in_client(role):
+    user = Users.objects.create(name=f"Test {role}", email=f"{role}@example.com", password="x", role=role)
+    client = Client()
+    session = client.session
+    session["user_id"] = user.id
+    session["user_name"] = user.name
+    session["user_role"] = role
+    session.save()
+    return client
+
+
+class TestProfiledSteps:
+    def test_result_and_errors_pass_through(self):
+        profiler = cProfile.Profile()
+
+        async def work():
+            await asyncio.sleep(0)
+            return 42
+
+        async def fail():
+            await asyncio.sleep(0)
+            raise ValueError("boom")
+
+        async def profiled(coro):
+            return await profiled_steps(coro, profiler)
+
+        assert asyncio.run(profiled(work())) == 42
+        with pytest.raises(ValueError):
+            asyncio.run(profiled(fail()))
+
+
+@pytest.mark.django_db
+class TestProfilingMiddleware:
+    def setup_method(self):
+        Books.objects.create(book_name="Test Book", author="Test Author", quantity=1)
+
+    def test_admin_query_flag_on_async_view(self, profile_root):
+        response = signed_in_client("admin").get(reverse("index") + "?profile")
+
+        assert response.status_code == 200
+        name = response[PROFILE_HEADER]
+        assert (profile_root / name).is_file()
+        [profile] = list_profiles()
+        assert profile["name"] == name and profile["view"] == "index"
+
+    def test_admin_header_on_sync_view(self):
+        response = signed_in_client("admin").get(reverse("admin_dashboard"), headers={PROFILE_HEADER: "1"})
+
+        assert response.status_code == 200
+        assert "-admin_dashboard-" in response[PROFILE_HEADER]
+
+    def test_only_admins_can_ask(self):
+        response = signed_in_client("user").get(reverse("index") + "?profile")
+
+        assert PROFILE_HEADER not in response
+        assert list_profiles() == []
+
+    def test_sampling(self, settings):
+        settings.LIBRARY_PROFILE_SAMPLE_RATE = 1
+        response = Client().get(reverse("index"))
+
+        assert PROFILE_HEADER in response
+
+    def test_keeps_newest(self, settings):
+        settings.LIBRARY_PROFILE_KEEP = 2
+        client = signed_in_client("admin")
+        names = [client.get(reverse("index") + "?profile")[PROFILE_HEADER] for _ in range(3)]
+
+        assert len(list_profiles()) == 2
+        assert names[-1] in {profile["name"] for profile in list_profiles()}
+
+
+@pytest.mark.django_db
+class TestProfilePages:
+    def test_listing_and_report(self):
+        client = signed_in_client("admin")
+        name = client.get(reverse("index") + "?profile")[PROFILE_HEADER]
+
+        listing = client.get(reverse("admin_profiles"))
+        assert reverse("admin_profile", args=[name]) in listing.content.decode()
+
+        report = client.get(reverse("admin_profile", args=[name]) + "?sort=tottime")
+        assert "Ordered by: internal time" in report.content.decode()
+
+        download = client.get(reverse("admin_profile", args=[name]) + "?download")
+        assert download["Content-Disposition"] == f'attachment; filename="{name}"'
+
+    def test_unknown_profile(self):
+        client = signed_in_client("admin")
+        assert client.get(reverse("admin_profile", args=["notes.txt"])).status_code == 404
+        assert client.get(reverse("admin_profile", args=["20260101-000000-index-1ms-abcdef.prof"])).status_code == 404
+
+    def test_admins_only(self):
+        response = signed_in_client("user").get(reverse("admin_profiles"))
+        assert response.status_code == 302
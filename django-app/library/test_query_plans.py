@@ -0,0 +1,69 @@
+import pytest
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from library.models import Users, Books, BooksBorrowed, Categories, CategoriesPerBook
+
+
+def query_plans(queries):
+    """
+    EXPLAIN every SELECT a view ran. Sequential scans are disabled, since on
+    test-sized tables the planner would rightly prefer them; what matters is
+    that an index exists for each lookup.
+    """
+    plans = []
+    with connection.cursor() as cursor:
+        cursor.execute("SET LOCAL enable_seqscan = off")
+        for query in queries:
+            if query["sql"].startswith("SELECT"):
+                cursor.execute("EXPLAIN " + query["sql"])
+                plans.append("\n".join(row[0] for row in cursor.fetchall()))
+    return "\n\n".join(plans)
+
+
+@pytest.mark.django_db
+class TestQueryPlans:
+    def setup_method(self):
+        self.client = Client()
+        self.user = Users.objects.create(name="Reader", email="reader@example.com", password="Password123")
+        fantasy = Categories.objects.create(category_name="Fantasy")
+        self.book = Books.objects.create(book_name="The Hobbit", author="J. R. R. Tolkien", quantity=2)
+        CategoriesPerBook.objects.create(book_id=self.book, category_id=fantasy)
+
+    def run_view(self, method, url, data=None):
+        with CaptureQueriesContext(connection) as queries:
+            getattr(self.client, method)(url, data)
+        return query_plans(queries.captured_queries)
+
+    def test_login_by_name(self):
+        plans = self.run_view("post", reverse("auth_login"), {"name": "Reader", "password": "Password123"})
+        assert "library_users_name_" in plans
+
+    def test_register_email_check(self):
+        # Rows created outside the form may keep mixed-case emails
+        Users.objects.create(name="Legacy", email="Legacy@Example.com", password="Password123")
+        plans = self.run_view("post", reverse("auth_register"), {
+            "name": "Other", "email": "legacy@example.com", "password": "Password123",
+            "confirm_password": "Password123", "role": "user",
+        })
+        assert "users_email_upper_idx" in plans
+        assert not Users.objects.filter(name="Other").exists()
+
+    def test_borrow_duplicate_check(self):
+        self.client.post(reverse("auth_login"), {"name": "Reader", "password": "Password123"})
+        plans = self.run_view("get", reverse("borrow_book", args=[self.book.id]))
+        assert "booksborrowed_unique_user_book" in plans
+
+    def test_catalog_categories(self):
+        plans = self.run_view("get", reverse("index"))
+        assert "categoriesperbook_unique_book_category" in plans
+        assert "Seq Scan on library_categoriesperbook" not in plans
+
+    def test_admin_loans_by_due_date(self):
+        Users.objects.create(name="Admin", email="admin@example.com", password="AdminPassword123", role="admin")
+        BooksBorrowed.objects.create(user_id=self.user, book_id=self.book)
+        self.client.post(reverse("auth_login"), {"name": "Admin", "password": "AdminPassword123"})
+
+        plans = self.run_view("get", reverse("admin_dashboard"))
+        assert "booksborrowed_due_date_idx" in plans
@@ -0,0 +1,106 @@
+import pytest
+from django.db import transaction
+from django.http import HttpResponse
+from django.test import Client, RequestFactory
+from django.urls import reverse
+from library.middleware import PRIMARY_PIN_COOKIE, ReplicaPinningMiddleware
+from library.models import Books, BooksBorrowed, Categories, CategoriesPerBook, Users
+from library.routers import CatalogReplicaRouter, has_written, pinned_to_primary, use_primary
+
+
+class TestCatalogReplicaRouter:
+    def setup_method(self):
+        self.router = CatalogReplicaRouter()
+        has_written.set(False)
+        pinned_to_primary.set(False)
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.LIBRARY_DB_REPLICA_ALIASES = ["replica1"]
+
+    def test_catalog_reads_go_to_replicas(self):
+        for model in (Books, Categories, CategoriesPerBook):
+            assert self.router.db_for_read(model) == "replica1"
+        for model in (Users, BooksBorrowed):
+            assert self.router.db_for_read(model) == "default"
+
+    def test_no_replicas_configured(self, settings):
+        settings.LIBRARY_DB_REPLICA_ALIASES = []
+        assert self.router.db_for_read(Books) == "default"
+
+    def test_reads_after_a_write_stay_on_primary(self):
+        assert self.router.db_for_write(Books) == "default"
+        assert self.router.db_for_read(Books) == "default"
+
+    def test_use_primary(self):
+        with use_primary():
+            assert self.router.db_for_read(Books) == "default"
+        assert self.router.db_for_read(Books) == "replica1"
+
+    @pytest.mark.django_db(transaction=True)
+    def test_reads_inside_a_transaction_stay_on_primary(self):
+        assert self.router.db_for_read(Books) == "replica1"
+        with transaction.atomic():
+            assert self.router.db_for_read(Books) == "default"
+
+    def test_relations_and_migrations(self):
+        assert self.router.allow_relation(Books(), Categories()) is None
+        book, category = Books(), Categories()
+        book._state.db, category._state.db = "replica1", "default"
+        assert self.router.allow_relation(book, category) is True
+        assert self.router.allow_migrate("replica1", "library") is False
+        assert self.router.allow_migrate("default", "library") is None
+
+
+@pytest.mark.django_db
+class TestCatalogCacheFills:
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        # Not a configured database: any read routed to it fails the request
+        settings.LIBRARY_DB_REPLICA_ALIASES = ["replica1"]
+
+    def test_fills_read_from_primary(self):
+        Books.objects.create(book_name="Fresh Book", author="Someone", quantity=1)
+        has_written.set(False)
+        client = Client()
+
+        assert "Fresh Book" in client.get(reverse("index")).content.decode()
+        response = client.get(reverse("search_books_api"), {"q": "fresh"})
+        assert [book["title"] for book in response.json()["results"]] == ["Fresh Book"]
+
+
+class TestReplicaPinningMiddleware:
+    def setup_method(self):
+        self.router = CatalogReplicaRouter()
+        self.factory = RequestFactory()
+
+    @pytest.fixture(autouse=True)
+    def replicas(self, settings):
+        settings.LIBRARY_DB_REPLICA_ALIASES = ["replica1"]
+
+    def run(self, view, cookies=None):
+        request = self.factory.get("/")
+        request.COOKIES.update(cookies or {})
+        return ReplicaPinningMiddleware(view)(request)
+
+    def test_write_pins_client_to_primary(self):
+        def checkout(request):
+            self.router.db_for_write(Books)
+            return HttpResponse(self.router.db_for_read(Books))
+
+        response = self.run(checkout)
+
+        assert response.content == b"default"
+        assert response.cookies[PRIMARY_PIN_COOKIE]["max-age"] == 5
+
+    def test_pinned_and_unpinned_reads(self):
+        def catalog(request):
+            return HttpResponse(self.router.db_for_read(Books))
+
+        # A write in an earlier request on this thread does not leak into the next one
+        has_written.set(True)
+        response = self.run(catalog)
+        assert response.content == b"replica1"
+        assert PRIMARY_PIN_COOKIE not in response.cookies
+
+        assert self.run(catalog, {PRIMARY_PIN_COOKIE: "1"}).content == b"default"
@@ -0,0 +1,190 @@
+import threading
+
+import pytest
+from django.db import IntegrityError, connection, transaction
+from library.models import Users, Books, BooksBorrowed, BooksReturned
+from library.services import CheckoutError, ReturnError, checkout_book, return_loan
+
+
+@pytest.mark.django_db
+class TestCheckout:
+    def setup_method(self):
+        self.user = Users.objects.create(name="Reader", email="reader@example.com", password="Password123")
+        self.book = Books.objects.create(book_name="Only Copy", author="Someone", quantity=1)
+
+    def test_checkout_takes_a_copy(self):
+        loan = checkout_book(self.user.id, self.book.id)
+
+        assert loan.book_id.book_name == "Only Copy"
+        assert BooksBorrowed.objects.filter(user_id=self.user, book_id=self.book).exists()
+        self.book.refresh_from_db()
+        assert self.book.quantity == 0
+
+    def test_checkout_refusals(self):
+        checkout_book(self.user.id, self.book.id)
+
+        with pytest.raises(CheckoutError, match="already borrowed"):
+            checkout_book(self.user.id, self.book.id)
+
+        other = Users.objects.create(name="Other", email="other@example.com", password="Password123")
+        with pytest.raises(CheckoutError, match="out of stock"):
+            checkout_book(other.id, self.book.id)
+
+        with pytest.raises(CheckoutError, match="Book not found"):
+            checkout_book(other.id, 0)
+
+        # Stock is untouched by refused checkouts
+        self.book.refresh_from_db()
+        assert self.book.quantity == 0
+
+    def test_checkout_limit(self):
+        books = [
+            Books.objects.create(book_name=f"Book {i}", author="Someone", quantity=5)
+            for i in range(self.user.loan_limit + 1)
+        ]
+        for book in books[:self.user.loan_limit]:
+            checkout_book(self.user.id, book.id)
+
+        with pytest.raises(CheckoutError, match="up to"):
+            checkout_book(self.user.id, books[-1].id)
+        assert BooksBorrowed.objects.filter(user_id=self.user).count() == self.user.loan_limit
+
+
+@pytest.mark.django_db(transaction=True)
+def test_concurrent_checkouts_of_last_copy():
+    """Several patrons racing for the last copy: exactly one gets it."""
+    book = Books.objects.create(book_name="Last Copy", author="Someone", quantity=1)
+    users = [
+        Users.objects.create(name=f"Racer {i}", email=f"racer{i}@example.com", password="Password123")
+        for i in range(5)
+    ]
+    barrier = threading.Barrier(len(users))
+    outcomes = []
+
+    def attempt(user):
+        barrier.wait()
+        try:
+            checkout_book(user.id, book.id)
+            outcomes.append("ok")
+        except CheckoutError:
+            outcomes.append("refused")
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=attempt, args=(user,)) for user in users]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert outcomes.count("ok") == 1
+    book.refresh_from_db()
+    assert book.quantity == 0
+    assert BooksBorrowed.objects.filter(book_id=book).count() == 1
+
+
+@pytest.mark.django_db
+class TestReturn:
+    def setup_method(self):
+        self.user = Users.objects.create(name="Reader", email="reader@example.com", password="Password123")
+        self.book = Books.objects.create(book_name="Returned Book", author="Someone", quantity=2)
+        self.loan = checkout_book(self.user.id, self.book.id)
+
+    def test_return_archives_the_loan(self):
+        assert return_loan(self.user.id, self.loan.id) == "Returned Book"
+
+        assert not BooksBorrowed.objects.filter(id=self.loan.id).exists()
+        history = BooksReturned.objects.get(book_id=self.book)
+        assert history.user_id == self.user
+        assert history.due_date == self.loan.due_date
+        self.book.refresh_from_db()
+        assert self.book.quantity == 2
+
+    def test_return_is_not_repeated(self):
+        return_loan(self.user.id, self.loan.id)
+        with pytest.raises(ReturnError):
+            return_loan(self.user.id, self.loan.id)
+
+        self.book.refresh_from_db()
+        assert self.book.quantity == 2
+        assert BooksReturned.objects.count() == 1
+
+    def test_return_of_someone_elses_loan(self):
+        other = Users.objects.create(name="Other", email="other@example.com", password="Password123")
+        with pytest.raises(ReturnError):
+            return_loan(other.id, self.loan.id)
+        assert BooksBorrowed.objects.filter(id=self.loan.id).exists()
+
+
+@pytest.mark.django_db
+class TestLoanCounter:
+    def setup_method(self):
+        self.user = Users.objects.create(name="Reader", email="reader@example.com", password="Password123")
+        self.book = Books.objects.create(book_name="Counted Book", author="Someone", quantity=2)
+
+    def test_counter_follows_checkout_and_return(self):
+        loan = checkout_book(self.user.id, self.book.id)
+        self.user.refresh_from_db()
+        assert self.user.active_loans == 1
+
+        return_loan(self.user.id, loan.id)
+        self.user.refresh_from_db()
+        assert self.user.active_loans == 0
+
+    def test_limit_comes_from_role(self, settings):
+        settings.LIBRARY_LOAN_LIMITS = {"user": 1, "premium": 5}
+        premium = Users.objects.create(name="Premium", email="premium@example.com", password="Password123", role="premium")
+        regular = Users.objects.create(name="Regular", email="regular@example.com", password="Password123")
+        assert premium.loan_limit == 5
+        assert regular.loan_limit == 1
+
+        checkout_book(regular.id, self.book.id)
+        other_book = Books.objects.create(book_name="Other Book", author="Someone", quantity=1)
+        with pytest.raises(CheckoutError, match="up to 1 books"):
+            checkout_book(regular.id, other_book.id)
+
+    def test_database_enforces_the_limit(self):
+        with pytest.raises(IntegrityError), transaction.atomic():
+            Users.objects.filter(id=self.user.id).update(active_loans=self.user.loan_limit + 1)
+
+    def test_deleting_a_book_releases_its_loans(self):
+        checkout_book(self.user.id, self.book.id)
+        self.book.delete()
+        self.user.refresh_from_db()
+        assert self.user.active_loans == 0
+
+    def test_deleting_a_loan_directly_releases_it(self):
+        # As in the Django admin or the shell, bypassing return_loan
+        loan = checkout_book(self.user.id, self.book.id)
+        loan.delete()
+        self.user.refresh_from_db()
+        assert self.user.active_loans == 0
+
+        checkout_book(self.user.id, self.book.id)
+        BooksBorrowed.objects.filter(user_id=self.user).delete()
+        self.user.refresh_from_db()
+        assert self.user.active_loans == 0
+
+    def test_backfill_uses_configured_limits(self, settings):
+        from importlib import import_module
+        from types import SimpleNamespace
+        from django.apps import apps
+        migration = import_module("library.migrations.0013_users_loan_counter")
+
+        admin = Users.objects.create(name="Admin", email="admin@example.com", password="Password123", role="admin")
+        checkout_book(self.user.id, self.book.id)
+        settings.LIBRARY_LOAN_LIMITS = {"user": 0, "admin": 7}
+        migration.populate_loan_limits(apps, SimpleNamespace(connection=connection))
+
+        self.user.refresh_from_db()
+        admin.refresh_from_db()
+        # Never below the loans already held
+        assert self.user.loan_limit == 1
+        assert admin.loan_limit == 7
+
+    def test_limit_is_kept_per_user(self, settings):
+        # Set at creation; a later change of the role limits leaves it alone
+        settings.LIBRARY_LOAN_LIMITS = {**settings.LIBRARY_LOAN_LIMITS, "user": self.user.loan_limit + 1}
+        self.user.save()
+        self.user.refresh_from_db()
+        assert self.user.loan_limit == settings.LIBRARY_LOAN_LIMITS["user"] - 1
@@ -0,0 +1,61 @@
+from datetime import timedelta
+from io import StringIO
+
+import pytest
+from django.contrib.sessions.backends.db import SessionStore
+from django.contrib.sessions.models import Session
+from django.core.management import call_command
+from django.utils import timezone
+from library.sessions import clear_expired_sessions
+
+
+@pytest.mark.django_db
+class TestSessionCleanup:
+    def setup_method(self):
+        for _ in range(7):
+            store = SessionStore()
+            store["user_id"] = 1
+            store.create()
+        Session.objects.update(expire_date=timezone.now() - timedelta(days=1))
+
+        self.live = SessionStore()
+        self.live["user_id"] = 2
+        self.live.create()
+
+    def test_clear_in_batches(self):
+        progress = []
+        deleted = clear_expired_sessions(batch_size=3, progress=progress.append)
+
+        assert deleted == 7
+        assert progress == [3, 6, 7]
+        assert list(Session.objects.values_list("session_key", flat=True)) == [self.live.session_key]
+
+    def test_command(self, settings):
+        settings.SESSION_ENGINE = "django.contrib.sessions.backends.db"
+        out = StringIO()
+        call_command("clear_expired_sessions", "--batch-size", "5", stdout=out)
+
+        assert "7 expired sessions deleted" in out.getvalue()
+        assert Session.objects.count() == 1
+
+    def test_command_without_session_table(self, settings):
+        settings.SESSION_ENGINE = "django.contrib.sessions.backends.signed_cookies"
+        call_command("clear_expired_sessions", stdout=StringIO())
+
+        assert Session.objects.count() == 8
+
+
+class TestSessionSettings:
+    def test_default_follows_the_cache(self, settings_value):
+        assert settings_value("settings.SESSION_ENGINE").stdout.strip() == "django.contrib.sessions.backends.db"
+        result = settings_value("settings.SESSION_ENGINE", LIBRARY_CACHE_BACKEND="file")
+        assert result.stdout.strip() == "django.contrib.sessions.backends.cached_db"
+
+    def test_cache_sessions_need_a_shared_cache(self, settings_value):
+        for backend in ("cache", "cached_db"):
+            result = settings_value("settings.SESSION_ENGINE", LIBRARY_SESSION_BACKEND=backend)
+            assert "ImproperlyConfigured" in result.stderr
+
+    def test_unknown_backend(self, settings_value):
+        result = settings_value("settings.SESSION_ENGINE", LIBRARY_SESSION_BACKEND="redis")
+        assert "ImproperlyConfigured" in result.stderr
@@ -0,0 +1,74 @@
+import pytest
+from django.db import connection
+from django.db.models import Count, F
+from django.utils import timezone
+from library.models import Books, BooksBorrowed, Categories, CategoriesPerBook, Users
+from library.search import bulk_update_search_vector, search_books, update_search_vector
+from library.services import LOAN_PERIOD
+from library.synthetic import generate_library
+
+
+def snapshot():
+    return (
+        list(Books.objects.order_by("id").values_list("id", "book_name", "author", "quantity")),
+        list(CategoriesPerBook.objects.order_by("id").values_list("book_id", "category_id__category_name")),
+        list(Users.objects.order_by("id").values_list("id", "name", "email", "active_loans")),
+        list(BooksBorrowed.objects.order_by("id").values_list("user_id", "book_id", "due_date")),
+    )
+
+
+def clear_books_and_users():
+    with connection.cursor() as cursor:
+        # Deferred foreign key checks must run before TRUNCATE
+        cursor.execute("SET CONSTRAINTS ALL IMMEDIATE")
+        cursor.execute("TRUNCATE library_books, library_users CASCADE")
+
+
+@pytest.mark.django_db
+class TestSyntheticLibrary:
+    def test_deterministic(self):
+        created = generate_library(books=300, categories=12, users=40, loans=70, seed=7)
+        first = snapshot()
+        assert created == {"categories": 12, "users": 40, "loans": 70, "books": 300,
+                           "categories_per_book": len(first[1])}
+
+        clear_books_and_users()
+        generate_library(books=300, categories=12, users=40, loans=70, seed=7)
+        assert snapshot() == first
+        # Categories are reused by name
+        assert Categories.objects.count() == 12
+
+        clear_books_and_users()
+        generate_library(books=300, categories=12, users=40, loans=70, seed=8)
+        assert snapshot()[0] != first[0]
+
+    def test_consistent_with_loans(self):
+        generate_library(books=50, categories=5, users=30, loans=80, seed=1)
+
+        # Loans are capped by the users' loan limits (3 each)
+        assert BooksBorrowed.objects.count() == 80
+        assert not Users.objects.annotate(loans=Count("booksborrowed")).exclude(active_loans=F("loans")).exists()
+        assert not Users.objects.filter(active_loans__gt=F("loan_limit")).exists()
+        assert Books.objects.filter(quantity=0).exists()
+        for loan in BooksBorrowed.objects.all():
+            assert loan.due_date.date() - loan.borrowed_date == LOAN_PERIOD
+        # Borrow dates are spread so that some loans are already overdue
+        overdue = BooksBorrowed.objects.filter(due_date__lt=timezone.now()).count()
+        assert 0 < overdue < 80
+
+        assert generate_library(books=0, categories=0, users=2, loans=5)["loans"] == 0
+
+    def test_searchable(self):
+        generate_library(books=200, categories=10, users=0, loans=0, seed=2)
+        book = Books.objects.order_by("id").first()
+
+        assert search_books(book.book_name).filter(id=book.id).exists()
+        assert search_books(book.categoriesperbook_set.first().category_id.category_name).filter(id=book.id).exists()
+
+    def test_bulk_search_vector_matches(self):
+        generate_library(books=100, categories=10, users=0, loans=0, seed=3)
+        bulk = dict(Books.objects.values_list("id", "search_vector"))
+
+        update_search_vector()
+        assert dict(Books.objects.values_list("id", "search_vector")) == bulk
+        assert bulk_update_search_vector(Books.objects.order_by("id")[50].id) == 50
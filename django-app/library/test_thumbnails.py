@@ -0,0 +1,144 @@
+import threading
+from io import BytesIO, StringIO
+
+import pytest
+from django.core.management import call_command
+from django.test import Client
+from django.urls import reverse
+from library import thumbnails
+from library.models import Books
+from library.thumbnails import ThumbnailError, fetch_cover, ingest_thumbnail, store_variants
+from PIL import Image
+
+
+def cover_bytes(size=(800, 1400), mode="RGB", image_format="PNG"):
+    f = BytesIO()
+    Image.new(mode, size, (200, 50, 50, 128) if mode == "RGBA" else (200, 50, 50)).save(f, image_format)
+    return f.getvalue()
+
+
+class TestStoreVariants:
+    def test_variants_per_width_and_format(self, thumbnail_root):
+        key = store_variants(cover_bytes(mode="RGBA"))
+
+        for width in (200, 400):
+            with Image.open(thumbnail_root / f"{key}-{width}.webp") as webp:
+                assert webp.format == "WEBP"
+                # Taller than 2:3 is cropped to 2:3
+                assert webp.size == (width, width * 3 // 2)
+            with Image.open(thumbnail_root / f"{key}-{width}.jpg") as jpg:
+                assert jpg.format == "JPEG"
+        assert store_variants(cover_bytes(mode="RGBA")) == key
+
+    def test_small_covers_are_not_upscaled(self, thumbnail_root):
+        key = store_variants(cover_bytes(size=(150, 200), image_format="JPEG"))
+
+        with Image.open(thumbnail_root / f"{key}-400.jpg") as jpg:
+            assert jpg.size == (150, 200)
+
+    def test_invalid_images(self):
+        with pytest.raises(ThumbnailError):
+            store_variants(b"<html>not an image</html>")
+        with pytest.raises(ThumbnailError):
+            fetch_cover("file:///etc/passwd")
+
+
+@pytest.mark.django_db
+class TestIngestThumbnails:
+    def setup_method(self):
+        self.client = Client()
+        self.book = Books.objects.create(
+            book_name="The Hobbit", author="J. R. R. Tolkien", thumbnail="http://example.com/hobbit.png"
+        )
+        self.missing = Books.objects.create(
+            book_name="Silmarillion", author="J. R. R. Tolkien", thumbnail="http://example.com/missing.png"
+        )
+
+    @pytest.fixture(autouse=True)
+    def covers(self, monkeypatch):
+        def fetch(url):
+            if "missing" in url:
+                raise ThumbnailError("404")
+            return cover_bytes()
+        monkeypatch.setattr(thumbnails, "fetch_cover", fetch)
+
+    def test_batch_command(self):
+        out = StringIO()
+        call_command("ingest_thumbnails", stdout=out)
+
+        self.book.refresh_from_db()
+        self.missing.refresh_from_db()
+        assert len(self.book.thumbnail_key) == 16
+        assert self.book.thumbnail_source == self.book.thumbnail
+        assert self.missing.thumbnail_key == ""
+        assert "1 covers ingested" in out.getvalue()
+        assert thumbnails.pending_thumbnails().count() == 0
+        assert thumbnails.pending_thumbnails(retry_failed=True).get() == self.missing
+
+    def test_save_marks_cover_pending(self, django_capture_on_commit_callbacks):
+        ingest_thumbnail(self.book.id, self.book.thumbnail)
+        self.book.refresh_from_db()
+        assert self.book.thumbnail_key
+        with django_capture_on_commit_callbacks(execute=True):
+            self.book.thumbnail = "http://example.com/hobbit-2.png"
+            self.book.save()
+
+        # Nothing is fetched on save; the previous cover is not shown meanwhile
+        self.book.refresh_from_db()
+        assert self.book.thumbnail_source == "http://example.com/hobbit.png"
+        assert self.book.thumbnail_key == ""
+        assert thumbnails.pending_thumbnails().filter(id=self.book.id).exists()
+
+        self.book.thumbnail = ""
+        self.book.save()
+        self.book.refresh_from_db()
+        assert (self.book.thumbnail_key, self.book.thumbnail_source) == ("", None)
+
+    def test_watch_command(self, monkeypatch):
+        def stop(seconds):
+            raise KeyboardInterrupt
+        monkeypatch.setattr("time.sleep", stop)
+        call_command("ingest_thumbnails", "--watch", "5", stdout=StringIO())
+
+        self.book.refresh_from_db()
+        assert len(self.book.thumbnail_key) == 16
+
+
+@pytest.mark.django_db(transaction=True)
+def test_ingest_on_save_in_background(settings, monkeypatch):
+    settings.LIBRARY_THUMBNAIL_INGEST_ON_SAVE = True
+    request_thread = threading.get_ident()
+    fetched_on = []
+
+    def fetch(url):
+        fetched_on.append(threading.get_ident())
+        return cover_bytes()
+    monkeypatch.setattr(thumbnails, "fetch_cover", fetch)
+
+    book = Books.objects.create(book_name="Dune", author="Frank Herbert", thumbnail="http://example.com/dune.png")
+    # The queue runs one job at a time, in order
+    thumbnails.ingest_queue.submit(lambda: None).result()
+
+    book.refresh_from_db()
+    assert book.thumbnail_source == "http://example.com/dune.png" and book.thumbnail_key
+    assert fetched_on and request_thread not in fetched_on
+
+
+    def test_serving_and_templates(self):
+        key = ingest_thumbnail(self.book.id, self.book.thumbnail)
+
+        response = self.client.get(reverse("thumbnail", args=[f"{key}-200.webp"]))
+        assert response.status_code == 200
+        assert response["Content-Type"] == "image/webp"
+        assert "immutable" in response["Cache-Control"]
+        assert "max-age=31536000" in response["Cache-Control"]
+        assert self.client.get("/thumbnails/..%2Fsettings.py").status_code == 404
+        assert self.client.get(reverse("thumbnail", args=[f"{'0' * 16}-200.webp"])).status_code == 404
+
+        html = self.client.get(reverse("index")).content.decode()
+        assert f"/thumbnails/{key}-200.webp 200w, /thumbnails/{key}-400.webp 400w" in html
+        assert 'loading="lazy"' in html
+        # The book without an ingested cover gets the bundled placeholder
+        assert "/static/library/no-cover.svg" in html
+        assert "placehold.co" not in html
+        assert "example.com" not in html
@@ -0,0 +1,223 @@
+import hashlib
+import logging
+import os
+import re
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import Path
+from urllib.parse import urlsplit
+from urllib.request import Request, urlopen
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import F, Q
+from django.urls import reverse
+from PIL import Image, ImageOps
+
+from .cache import invalidate_catalog
+from .models import Books
+
+logger = logging.getLogger("library.thumbnails")
+
+# Variant file extension -> Pillow format and encoder options
+VARIANT_FORMATS = {
+    "webp": ("WEBP", {"quality": 80, "method": 4}),
+    "jpg": ("JPEG", {"quality": 82, "optimize": True, "progressive": True}),
+}
+# Transparent covers are flattened onto the card background (slate-800)
+BACKGROUND = (30, 41, 59)
+# Covers are 2:3; taller images are cropped to this ratio
+ASPECT_RATIO = 3 / 2
+
+VARIANT_NAME = re.compile(r"^(?P<key>[0-9a-f]{16})-(?P<width>\d+)\.(?P<ext>webp|jpg)$")
+
+
+class ThumbnailError(Exception):
+    """A cover could not be fetched or decoded."""
+
+
+def thumbnail_root():
+    return Path(settings.LIBRARY_THUMBNAIL_ROOT)
+
+
+def variant_name(key, width, ext):
+    return f"{key}-{width}.{ext}"
+
+
+def thumbnail_url(name):
+    return reverse("thumbnail", kwargs={"name": name})
+
+
+def variant_path(name):
+    """Path of a stored variant, or None if the name is not a variant name."""
+    if not VARIANT_NAME.match(name):
+        return None
+    return thumbnail_root() / name
+
+
+# ------------------------------
+# FETCHING
+# ------------------------------
+def fetch_cover(url):
+    """Download a cover, refusing non-HTTP URLs and bodies over the size limit."""
+    if urlsplit(url).scheme not in ("http", "https"):
+        raise ThumbnailError(f"Unsupported cover URL: {url}")
+    max_bytes = settings.LIBRARY_THUMBNAIL_MAX_BYTES
+    request = Request(url, headers={"User-Agent": "library-thumbnailer/1.0"})
+    try:
+        with urlopen(request, timeout=settings.LIBRARY_THUMBNAIL_FETCH_TIMEOUT) as response:
+            data = response.read(max_bytes + 1)
+    except (OSError, ValueError) as e:
+        raise ThumbnailError(f"Could not fetch {url}: {e}") from e
+    if len(data) > max_bytes:
+        raise ThumbnailError(f"Cover at {url} is larger than {max_bytes} bytes")
+    return data
+
+
+# ------------------------------
+# RESIZING
+# ------------------------------
+def thumbnail_key(data):
+    """
+    Content hash of the source image and the variant settings; it names the
+    variant files, so a changed cover or setting gets new URLs and the old
+    ones can be cached forever.
+    """
+    digest = hashlib.sha256(data)
+    digest.update(repr((settings.LIBRARY_THUMBNAIL_WIDTHS, VARIANT_FORMATS)).encode())
+    return digest.hexdigest()[:16]
+
+
+def open_cover(data):
+    try:
+        image = Image.open(BytesIO(data))
+        # Let JPEG decode at a reduced scale when the source is much larger
+        largest = max(settings.LIBRARY_THUMBNAIL_WIDTHS)
+        image.draft("RGB", (largest, int(largest * ASPECT_RATIO)))
+        image = ImageOps.exif_transpose(image)
+    except (OSError, ValueError, Image.DecompressionBombError) as e:
+        raise ThumbnailError(f"Not a usable image: {e}") from e
+
+    if image.mode in ("RGBA", "LA", "P"):
+        image = image.convert("RGBA")
+        flattened = Image.new("RGB", image.size, BACKGROUND)
+        flattened.paste(image, mask=image.getchannel("A"))
+        return flattened
+    return image.convert("RGB")
+
+
+def write_atomic(path, image, image_format, options):
+    """Write to a temporary file and rename it, so readers never see a partial variant."""
+    fd, tmp = tempfile.mkstemp(dir=path.parent, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            image.save(f, image_format, **options)
+        # mkstemp creates owner-only files; a front web server may serve these
+        os.chmod(tmp, 0o644)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def store_variants(data):
+    """
+    Resize a source cover to every configured width, in every variant
+    format, and store the files under LIBRARY_THUMBNAIL_ROOT. Images are
+    never upscaled. Returns the thumbnail key.
+    """
+    key = thumbnail_key(data)
+    root = thumbnail_root()
+    root.mkdir(parents=True, exist_ok=True)
+    if all((root / variant_name(key, width, ext)).exists()
+           for width in settings.LIBRARY_THUMBNAIL_WIDTHS for ext in VARIANT_FORMATS):
+        return key
+
+    cover = open_cover(data)
+    # Crop covers taller than 2:3 from the top, where the title usually is
+    max_height = int(cover.width * ASPECT_RATIO)
+    if cover.height > max_height:
+        cover = cover.crop((0, 0, cover.width, max_height))
+
+    for width in sorted(settings.LIBRARY_THUMBNAIL_WIDTHS, reverse=True):
+        if cover.width > width:
+            cover = cover.resize((width, round(cover.height * width / cover.width)), Image.LANCZOS)
+        for ext, (image_format, options) in VARIANT_FORMATS.items():
+            write_atomic(root / variant_name(key, width, ext), cover, image_format, options)
+    return key
+
+
+# ------------------------------
+# INGESTION
+# ------------------------------
+def ingest_thumbnail(book_id, url, invalidate=True):
+    """
+    Fetch, resize and store the cover of one book, then record its key. A
+    cover that cannot be fetched is recorded with an empty key (the
+    templates show the placeholder) and is not retried until the URL
+    changes. Returns the key, or "" on failure.
+    """
+    try:
+        key = store_variants(fetch_cover(url))
+    except ThumbnailError as e:
+        logger.warning("Thumbnail for book %s failed: %s", book_id, e)
+        key = ""
+    # Skip the update if the book's cover changed while this one was processed
+    updated = Books.objects.filter(id=book_id, thumbnail=url).update(thumbnail_key=key, thumbnail_source=url)
+    if updated and invalidate:
+        # Cached book grids still point at the previous cover
+        invalidate_catalog()
+    return key
+
+
+def pending_thumbnails(retry_failed=False):
+    """Books whose cover URL has not been ingested yet (or failed, with retry_failed)."""
+    pending = Q(thumbnail_source__isnull=True) | ~Q(thumbnail_source=F("thumbnail"))
+    if retry_failed:
+        pending |= Q(thumbnail_key="")
+    return Books.objects.exclude(Q(thumbnail__isnull=True) | Q(thumbnail="")).filter(pending)
+
+
+def ingest_thumbnails(retry_failed=False, progress=None):
+    """
+    Ingest every pending cover. ``progress(done, failed)`` is called after
+    each book. Returns (ingested, failed).
+    """
+    ingested = failed = 0
+    pending = pending_thumbnails(retry_failed).order_by("id").values_list("id", "thumbnail")
+    # Materialized first: the loop updates the rows it selects
+    for book_id, url in list(pending):
+        if ingest_thumbnail(book_id, url, invalidate=False):
+            ingested += 1
+        else:
+            failed += 1
+        if progress:
+            progress(ingested, failed)
+    if ingested or failed:
+        invalidate_catalog()
+    return ingested, failed
+
+
+# ------------------------------
+# BACKGROUND INGESTION
+# ------------------------------
+# With LIBRARY_THUMBNAIL_INGEST_ON_SAVE, saved covers are ingested by one
+# worker thread per process, one at a time, so a save never waits on a
+# cover host. Without it they wait for ingest_thumbnails (--watch).
+ingest_queue = ThreadPoolExecutor(max_workers=1, thread_name_prefix="library-thumbnails")
+
+
+def ingest_in_background(book_id, url):
+    return ingest_queue.submit(ingest_queued_thumbnail, book_id, url)
+
+
+def ingest_queued_thumbnail(book_id, url):
+    try:
+        return ingest_thumbnail(book_id, url)
+    except Exception:
+        logger.exception("Thumbnail for book %s failed", book_id)
+    finally:
+        # The worker thread's own connection; no request cycle closes it
+        connection.close()
+
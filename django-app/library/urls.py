@@ -1,12 +1,19 @@
 from django.urls import path
-from .views import index, auth_logout, update_book, user_login, user_register, admin_dashboard, user_dashboard, admin_manage, borrow_book, return_book, admin_delete_book, add_category
+from .views import index, book_feed, borrowed_books_preview, thumbnail, search_books_api, auth_logout, update_book, user_login, user_register, admin_dashboard, user_dashboard, admin_manage, borrow_book, return_book, admin_delete_book, add_category, admin_export, admin_profiles, admin_profile
 
 urlpatterns = [ 
     path("", index, name="index"),
+    path("books/feed", book_feed, name="book_feed"),
+    path("books/borrowed", borrowed_books_preview, name="borrowed_books_preview"),
+    path("thumbnails/<str:name>", thumbnail, name="thumbnail"),
+    path("api/books/search", search_books_api, name="search_books_api"),
     path("auth/login", user_login, name="auth_login"),
     path("auth/register", user_register, name="auth_register"),
     path("logout", auth_logout, name="auth_logout"),
     path("dashboard/admin", admin_dashboard, name="admin_dashboard"),
+    path("dashboard/admin/export", admin_export, name="admin_export"),
+    path("dashboard/admin/profiles", admin_profiles, name="admin_profiles"),
+    path("dashboard/admin/profiles/<str:name>", admin_profile, name="admin_profile"),
     path("dashboard/user", user_dashboard, name="user_dashboard"),
     path("dashboard/manage", admin_manage, name="admin_manage"),
     path('update_book/<int:book_id>/', update_book, name='update_book'),
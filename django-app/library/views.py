@@ -1,9 +1,29 @@
+import hashlib
+from functools import wraps
+
+from asgiref.sync import sync_to_async
 from django.shortcuts import redirect, render
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse, StreamingHttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_cache_control
+from django.utils.safestring import mark_safe
+from django.views.decorators.cache import cache_control
+from django.views.decorators.http import condition
 from django.contrib import messages
-from django.db.models import Q #coisa boa
+from django.db import IntegrityError, connection, transaction
+from django.db.models import Count, Prefetch, Q, Sum #coisa boa
+from django.db.models.functions import Coalesce
+from django.core.handlers.asgi import ASGIRequest
 from django.contrib.auth.hashers import check_password
 from .forms import UserLoginForm, UserRegisterForm, AddBookForm, AddCategoryForm, UpdateBookForm
 from .models import Books, Users, BooksBorrowed, Categories, CategoriesPerBook
+from .cache import acached_catalog, acatalog_version, catalog_version, normalize_query, search_results
+from .exporter import DATASETS, FORMATS, aiter_chunks, export
+from .services import CheckoutError, ReturnError, ahas_reached_loan_limit, checkout_book, return_loan
+from .search import fuzzy_search_books, fuzzy_threshold, search_books, similarity_threshold, trigram_enabled
+from .thumbnails import variant_path
+from .profiling import list_profiles, profile_path, profile_report
+from .routers import use_primary
 from datetime import datetime, timedelta
 from django.utils import timezone
 
@@ -16,8 +36,8 @@ def user_register(request):
         form = UserRegisterForm(request.POST)
         
         if form.is_valid():
-            # Check email exists
-            if Users.objects.filter(email=form.cleaned_data['email']).exists():
+            # Check email exists (case-insensitive, served by users_email_upper_idx)
+            if Users.objects.filter(email__iexact=form.cleaned_data['email']).exists():
                 return render(request, 'user-register.html', {'form': form, 'error': "Email already registered."})
             else:
                 user = form.save()  
@@ -77,72 +97,358 @@ def user_login(request):
 # ------------------------------
 # HOMEPAGE FEED (WITH SEARCH FROM DB)
 # ------------------------------
-def index(request):
-    user_id = request.session.get("user_id")
-    user_role = request.session.get("user_role")
-    query = request.GET.get("q", "").strip()
+BOOKS_PAGE_SIZE = 24
+
+
+def books_page_queryset(books_qs, after=None, page_size=BOOKS_PAGE_SIZE):
+    """
+    Keyset pagination: the query for one page of books strictly after the
+    given cursor, so the cost of a page does not grow with the catalog size.
+    Plain listings are ordered by id; ranked search results by (rank, id).
+    A cursor without a rank is no position in ranked results, so it starts
+    them over from the first page. One extra row is fetched to tell
+    whether there is a next page.
+    """
+    ranked = "rank" in books_qs.query.annotations
+
+    if ranked:
+        books_qs = books_qs.order_by("-rank", "id")
+        if after and after[0] is not None:
+            rank, last_id = after
+            books_qs = books_qs.filter(Q(rank__lt=rank) | Q(rank=rank, id__gt=last_id))
+    else:
+        books_qs = books_qs.order_by("id")
+        if after:
+            books_qs = books_qs.filter(id__gt=after[1])
+
+    return books_qs.prefetch_related('categoriesperbook_set__category_id')[:page_size + 1], ranked
+
+
+def books_page(page, ranked, page_size):
+    """Returns (books, next_cursor); next_cursor is None on the last page."""
+    next_cursor = None
+    if len(page) > page_size:
+        page = page[:page_size]
+        last = page[-1]
+        next_cursor = f"{last.rank!r}:{last.id}" if ranked else str(last.id)
+
+    return serialize_books(page), next_cursor
 
-    # Get all books
-    books_qs = Books.objects.all().prefetch_related('categoriesperbook_set__category_id')
 
-    # Search filter
-    if query:
-        terms = query.split()
-        for term in terms:
-            books_qs = books_qs.filter(
-                Q(book_name__icontains=term) | 
-                Q(author__icontains=term) |
-                Q(categoriesperbook__category_id__category_name__icontains=term)
-            ).distinct()
+def get_books_page(books_qs, after=None, page_size=BOOKS_PAGE_SIZE):
+    books_qs, ranked = books_page_queryset(books_qs, after, page_size)
+    return books_page(list(books_qs), ranked, page_size)
 
-    # Prepare data for template
+
+async def aget_books_page(books_qs, after=None, page_size=BOOKS_PAGE_SIZE):
+    books_qs, ranked = books_page_queryset(books_qs, after, page_size)
+    return books_page([book async for book in books_qs], ranked, page_size)
+
+
+async def aget_books_by_ids(book_ids):
+    """Primary-key fetch of the given books, in the given order."""
+    found = await Books.objects.prefetch_related('categoriesperbook_set__category_id').ain_bulk(book_ids)
+    return serialize_books([found[book_id] for book_id in book_ids if book_id in found])
+
+
+def serialize_books(page):
+    """Book rows as the dicts the grid templates expect."""
     books = []
-    for book in books_qs:
+    for book in page:
         books.append({
             "id": book.id,
             "title": book.book_name,
             "authors": book.author,
             "thumbnail": book.thumbnail,
+            "thumbnail_key": book.thumbnail_key,
             "quantity": book.quantity,
             "categories": [c.category_id.category_name for c in book.categoriesperbook_set.all()]
         })
+    return books
+
+
+def parse_cursor(value):
+    """Parse an "<id>" or "<rank>:<id>" cursor into (rank, id); None if invalid."""
+    if not value:
+        return None
+    rank, _, last_id = value.rpartition(":")
+    try:
+        last_id = int(last_id)
+        rank = float(rank) if rank else None
+    except ValueError:
+        return None
+    return (rank, last_id) if last_id > 0 else None
+
+
+def parse_limit(value, default, maximum):
+    try:
+        limit = int(value)
+    except (TypeError, ValueError):
+        return default
+    return min(limit, maximum) if limit > 0 else default
+
+
+async def asearch_catalog(query, after=None, page_size=BOOKS_PAGE_SIZE, fuzzy=False):
+    """
+    One page of search results. Searches are keyed by their normalized
+    terms in the search result cache, which keeps only the matching ids, so
+    a repeated search is a cache lookup plus a primary-key fetch. Returns
+    (books, next_cursor).
+    """
+    terms = normalize_query(query)
+    if not terms:
+        return await aget_books_page(search_books(query), after=after, page_size=page_size)
+
+    key = (terms, after, page_size, fuzzy)
+    await acatalog_version()
+    cached = search_results.get(key)
+    if cached is not None:
+        book_ids, next_cursor = cached
+        return await aget_books_by_ids(book_ids), next_cursor
+
+    # From the primary, like every other catalog cache fill (see acached_catalog)
+    with use_primary():
+        books, next_cursor = await arun_search(terms, after=after, page_size=page_size, fuzzy=fuzzy)
+    search_results.set(key, ([book["id"] for book in books], next_cursor))
+    return books, next_cursor
+
+
+async def arun_search(query, after=None, page_size=BOOKS_PAGE_SIZE, fuzzy=False):
+    """
+    Exact full-text search first, then the trigram fuzzy search when the
+    exact search has nothing (or when fuzzy mode is requested).
+    """
+    if not fuzzy:
+        books, next_cursor = await aget_books_page(search_books(query), after=after, page_size=page_size)
+        if books or not query:
+            return books, next_cursor
+
+    return await sync_to_async(fuzzy_search_page)(query, after=after, page_size=page_size)
+
+
+def fuzzy_search_page(query, after=None, page_size=BOOKS_PAGE_SIZE):
+    # Synchronous: the similarity threshold is set inside a transaction
+    if not trigram_enabled():
+        return [], None
+
+    with similarity_threshold(fuzzy_threshold()):
+        return get_books_page(fuzzy_search_books(query), after=after, page_size=page_size)
+
+
+async def acatalog_viewer(request):
+    """
+    Kind of viewer a catalog page is rendered for: "anonymous", "user",
+    "limit" (a user at the loan limit) or "admin". Kept on the request, as
+    both the ETag and the view need it.
+    """
+    if not hasattr(request, "catalog_viewer"):
+        user_id = await request.session.aget("user_id")
+        user_role = await request.session.aget("user_role")
+        if user_role == "admin":
+            request.catalog_viewer = "admin"
+        elif user_id:
+            request.catalog_viewer = "limit" if await ahas_reached_loan_limit(user_id) else "user"
+        else:
+            request.catalog_viewer = "anonymous"
+    return request.catalog_viewer
+
+
+def catalog_etag(request, *args, **kwargs):
+    """
+    Validator for catalog responses: the catalog version (bumped on every
+    catalog write by any worker, as it is kept in the database) plus what
+    else the response depends on, i.e. the URL and the kind of viewer.
+    Pages for signed-in users also embed the user's CSRF token, so the user
+    and their CSRF secret are part of it too. No ETag while flash messages
+    are pending, since those must be shown once.
+    """
+    if messages.get_messages(request):
+        return None
+    parts = [catalog_version(), request.get_full_path(), request.catalog_viewer]
+    if request.session.get("user_id"):
+        parts += [request.session["user_id"], request.META.get("CSRF_COOKIE", "")]
+    digest = hashlib.md5("\x1f".join(str(part) for part in parts).encode()).hexdigest()
+    return f'"{digest}"'
+
+
+def conditional_catalog(view):
+    """
+    Answer If-None-Match with 304 Not Modified while the catalog is
+    unchanged. Responses for anonymous visitors may be stored by shared
+    caches (revalidated on every use); the rest stay private.
+    """
+    conditional_view = condition(etag_func=catalog_etag)(view)
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        # condition() computes the ETag synchronously, so load the session,
+        # the viewer and the catalog version (which need the database) beforehand
+        await acatalog_viewer(request)
+        await acatalog_version()
+        response = await conditional_view(request, *args, **kwargs)
+        if request.session.get("user_id") or not response.has_header("ETag"):
+            patch_cache_control(response, private=True, no_cache=True)
+        else:
+            patch_cache_control(response, public=True, max_age=0)
+        return response
+
+    return wrapper
+
+
+async def arender_books_grid(request, template_name, query, after=None, page_size=BOOKS_PAGE_SIZE, fuzzy=False):
+    """
+    Render one page of the book grid. The HTML is cached per template,
+    page, query and kind of viewer (the only per-user parts of a card are
+    the borrow buttons) until the catalog changes. Returns (html, next_cursor).
+    """
+    user_id = await request.session.aget("user_id")
+    user_role = await request.session.aget("user_role")
+    viewer = await acatalog_viewer(request)
+    reached_limit = viewer == "limit"
+
+    async def render_page():
+        books, next_cursor = await asearch_catalog(query, after=after, page_size=page_size, fuzzy=fuzzy)
+        html = render_to_string(template_name, {
+            "books": books,
+            "user_id": user_id,
+            "user_role": user_role,
+            "reached_limit": reached_limit
+        }, request)
+        return str(html), next_cursor
+
+    html, next_cursor = await acached_catalog(
+        "grid", (template_name, query, after, page_size, fuzzy, viewer), render_page
+    )
+    return mark_safe(html), next_cursor
+
+
+async def all_categories():
+    return [category async for category in Categories.objects.aiterator()]
+
+
+@conditional_catalog
+async def index(request):
+    user_id = await request.session.aget("user_id")
+    user_role = await request.session.aget("user_role")
+    query = request.GET.get("q", "").strip()
+
+    # First page of the (optionally filtered) catalog
+    books_grid, next_cursor = await arender_books_grid(request, "book-grid.html", query)
 
     # Fetch all categories for the filter
-    all_categories = Categories.objects.all()
+    categories = await acached_catalog("categories", (), all_categories)
+
+    # The borrowed books preview is loaded separately (see borrowed_books_preview)
+    return render(request, "index.html", {
+        "books_grid": books_grid, 
+        "next_cursor": next_cursor,
+        "user_id": user_id, 
+        "user_role": user_role,
+        "all_categories": categories,
+    })
+
+
+@cache_control(private=True, no_cache=True)
+def borrowed_books_preview(request):
+    """The signed-in user's borrowed books, as a fragment for the homepage."""
+    user_id = request.session.get("user_id")
 
-    # Fetch borrowed books for preview if user is logged in
     borrowed_books = []
-    reached_limit = False
     if user_id:
         borrowed_books = BooksBorrowed.objects.filter(user_id=user_id).select_related('book_id')
-        reached_limit = borrowed_books.count() >= 3
 
-    return render(request, "index.html", {
-        "books": books, 
-        "user_id": user_id, 
-        "user_role": user_role,
-        "all_categories": all_categories,
-        "borrowed_books": borrowed_books,
-        "reached_limit": reached_limit
+    return render(request, "borrowed-books.html", {"borrowed_books": borrowed_books})
+
+
+@conditional_catalog
+async def book_feed(request):
+    """Next page of the homepage grid as an HTML fragment for infinite scroll."""
+    query = request.GET.get("q", "").strip()
+    after = parse_cursor(request.GET.get("after"))
+
+    html, next_cursor = await arender_books_grid(
+        request, "book-grid-items.html", query, after=after, fuzzy=request.GET.get("fuzzy") == "1"
+    )
+
+    response = HttpResponse(html)
+    response["X-Next-Cursor"] = next_cursor or ""
+    return response
+
+# ------------------------------
+# THUMBNAILS
+# ------------------------------
+THUMBNAIL_MAX_AGE = 365 * 24 * 60 * 60
+
+
+@cache_control(public=True, max_age=THUMBNAIL_MAX_AGE, immutable=True)
+def thumbnail(request, name):
+    """A resized cover. Names are content hashes, so a URL never changes meaning."""
+    path = variant_path(name)
+    if path is None or not path.is_file():
+        raise Http404("Thumbnail not found")
+    return FileResponse(open(path, "rb"))
+
+# ------------------------------
+# LIVE SEARCH API
+# ------------------------------
+SEARCH_MAX_LIMIT = 50
+
+
+@conditional_catalog
+async def search_books_api(request):
+    """
+    Lightweight search endpoint for the live-search box. Returns only the
+    matching books, either as compact JSON (default) or, with ?format=html,
+    as the rendered grid fragment. Results are capped by ?limit; ?fuzzy=1
+    skips the exact search and goes straight to typo-tolerant matching.
+    """
+    query = request.GET.get("q", "").strip()
+    after = parse_cursor(request.GET.get("after"))
+    limit = parse_limit(request.GET.get("limit"), BOOKS_PAGE_SIZE, SEARCH_MAX_LIMIT)
+
+    fuzzy = request.GET.get("fuzzy") == "1"
+
+    if request.GET.get("format") == "html":
+        html, next_cursor = await arender_books_grid(
+            request, "book-grid.html", query, after=after, page_size=limit, fuzzy=fuzzy
+        )
+        response = HttpResponse(html)
+        response["X-Next-Cursor"] = next_cursor or ""
+        return response
+
+    books, next_cursor = await asearch_catalog(query, after=after, page_size=limit, fuzzy=fuzzy)
+    return JsonResponse({
+        "query": query,
+        "results": books,
+        "next_cursor": next_cursor,
     })
 
 # ------------------------------
 # USER DASHBOARD
 # ------------------------------
-def user_dashboard(request):
-    user_id = request.session.get("user_id")
-    role = request.session.get("user_role")
+async def user_dashboard(request):
+    user_id = await request.session.aget("user_id")
+    role = await request.session.aget("user_role")
 
 
     if not user_id or role == "admin":
         return redirect("index")
 
-    user = Users.objects.get(id=user_id)
+    user = await Users.objects.aget(id=user_id)
 
-    borrowed_books = user.booksborrowed_set.select_related('book_id').all()
+    # Loaded up front: templates cannot run queries in an async view
+    borrowed_books = [
+        entry async for entry in user.booksborrowed_set.select_related('book_id').prefetch_related(
+            # Ordered, so the template's categoriesperbook_set.first is served from the cache
+            Prefetch(
+                "book_id__categoriesperbook_set",
+                queryset=CategoriesPerBook.objects.select_related("category_id").order_by("id"),
+            )
+        ).aiterator(chunk_size=LOANS_PAGE_SIZE)
+    ]
 
-    borrowed_count = borrowed_books.count()
-    max_books = 3
+    borrowed_count = user.active_loans
+    max_books = user.loan_limit
     remaining = max_books - borrowed_count
 
     return render(request, "user-dashboard.html", {
@@ -161,38 +467,13 @@ def borrow_book(request, book_id):
     if not user_id or role == "admin":
         return redirect("index")
 
-    user = Users.objects.get(id=user_id)
-    book = Books.objects.get(id=book_id)
-
-
-    if book.quantity <= 0:
-        messages.error(request, "This book is out of stock.")
-        return redirect("index")
-
-
-    if BooksBorrowed.objects.filter(user_id=user, book_id=book).exists():
-        messages.error(request, "You already borrowed this book.")
-        return redirect("index")
-
-    max_books = 3
-    borrowed_count = user.booksborrowed_set.count()
-    if borrowed_count >= max_books:
-        messages.error(request, f"You can only borrow up to {max_books} books at a time.")
+    try:
+        loan = checkout_book(user_id, book_id)
+    except CheckoutError as e:
+        messages.error(request, str(e))
         return redirect("index")
 
-    borrowed_date = timezone.now()
-    due_date = borrowed_date + timedelta(days=60)  
-    BooksBorrowed.objects.create(
-        user_id=user,
-        book_id=book,
-        borrowed_date=borrowed_date,
-        due_date=due_date
-    )
-
-    book.quantity -= 1
-    book.save()
-
-    messages.success(request, f"You borrowed the book: {book.book_name}. It is due on {due_date.strftime('%d-%m-%Y')}.")
+    messages.success(request, f"You borrowed the book: {loan.book_id.book_name}. It is due on {loan.due_date.strftime('%d-%m-%Y')}.")
     return redirect("user_dashboard")
 
 
@@ -204,52 +485,176 @@ def return_book(request, borrow_id):
         return redirect("index")
 
     try:
-        borrow_entry = BooksBorrowed.objects.get(id=borrow_id, user_id__id=user_id)
-    except BooksBorrowed.DoesNotExist:
-        messages.error(request, "Borrow entry not found.")
+        book_name = return_loan(user_id, borrow_id)
+    except ReturnError as e:
+        messages.error(request, str(e))
         return redirect("user_dashboard")
 
-    # Increase book quantity
-    book = borrow_entry.book_id
-    book.quantity += 1
-    book.save()
-
-    # Delete borrow entry
-    borrow_entry.delete()
-
-    messages.success(request, f"You returned the book: {book.book_name}")
+    messages.success(request, f"You returned the book: {book_name}")
     return redirect("user_dashboard")
 
 # ------------------------------
 # ADMIN DASHBOARD
 # ------------------------------
+LOANS_PAGE_SIZE = 24
+# Up to this many active loans (by the planner's estimate) the dashboard
+# counts them exactly; above it, it shows the estimate
+EXACT_LOAN_COUNT_LIMIT = 10_000
+
+
+def parse_loans_cursor(value):
+    """Parse a "<due date>|<id>" cursor into (due_date, id); None if invalid."""
+    due_date, _, last_id = (value or "").rpartition("|")
+    try:
+        return datetime.fromisoformat(due_date), int(last_id)
+    except ValueError:
+        return None
+
+
+def loans_page_queryset(loans_qs, after=None, page_size=LOANS_PAGE_SIZE):
+    """
+    Keyset pagination of loans by (due_date, id), like books_page_queryset:
+    a page is read from the (due_date, id) index after the cursor, whatever
+    the page number. One extra row tells whether there is a next page.
+    """
+    loans_qs = loans_qs.order_by("due_date", "id")
+    if after:
+        due_date, last_id = after
+        loans_qs = loans_qs.filter(Q(due_date__gt=due_date) | Q(due_date=due_date, id__gt=last_id))
+    return loans_qs[:page_size + 1]
+
+
+def loan_count():
+    """
+    Number of active loans and whether it is exact. Past EXACT_LOAN_COUNT_LIMIT
+    it is the planner's row estimate (pg_class.reltuples, kept current by
+    autovacuum) instead of a COUNT(*) over every loan on every load.
+    """
+    table = BooksBorrowed._meta.db_table
+    with connection.cursor() as cursor:
+        # One statement; the count only runs below the limit. reltuples is
+        # -1 for a table never vacuumed or analyzed
+        cursor.execute(
+            f"""
+            SELECT CASE WHEN exact THEN (SELECT count(*) FROM {table}) ELSE estimate END, exact
+            FROM (
+                SELECT reltuples::bigint AS estimate, reltuples < %s AS exact
+                FROM pg_class WHERE oid = %s::regclass
+            ) stats
+            """,
+            [EXACT_LOAN_COUNT_LIMIT, table],
+        )
+        return cursor.fetchone()
+
+
 def admin_dashboard(request):
     role = request.session.get("user_role")
 
     if role != "admin":
         return redirect("index")  # Block non-admins
 
-    # Fetch all books for management (needed for stats)
-    books = Books.objects.all()
-    
-    # Calculate stats
-    total_titles = books.count()
-    total_books_count = sum(book.quantity for book in books)
-    
-    # Fetch all borrowed books
-    borrowed_books = BooksBorrowed.objects.select_related("user_id", "book_id").all()
-    borrowed_count = borrowed_books.count()
-    
+    # Calculate stats in a single aggregate query
+    stats = Books.objects.aggregate(
+        total_titles=Count("id"),
+        total_books_count=Coalesce(Sum("quantity"), 0),
+    )
+
+    # One page of borrowed books, after the cursor of the previous one and
+    # only of the users matching the search box, if any
+    after = parse_loans_cursor(request.GET.get("after"))
+    user_query = request.GET.get("user", "").strip()
+    borrowed_books = BooksBorrowed.objects.select_related("user_id", "book_id")
+    if user_query:
+        borrowed_books = borrowed_books.filter(user_id__name__icontains=user_query)
+    loans_page = list(loans_page_queryset(borrowed_books, after))
+    next_cursor = None
+    if len(loans_page) > LOANS_PAGE_SIZE:
+        loans_page = loans_page[:LOANS_PAGE_SIZE]
+        last = loans_page[-1]
+        next_cursor = f"{last.due_date.isoformat()}|{last.id}"
+    borrowed_count, borrowed_count_exact = loan_count()
+
     # Total holdings = Available + Borrowed
-    total_holdings = total_books_count + borrowed_count
+    total_holdings = stats["total_books_count"] + borrowed_count
 
     return render(request, "admin-dashboard.html", {
-        "books": books,
-        "borrowed_books": borrowed_books,
-        "total_titles": total_titles,
-        "total_books_count": total_books_count,
+        "loans_page": loans_page,
+        "next_cursor": next_cursor,
+        "is_first_page": after is None,
+        "user_query": user_query,
+        "total_titles": stats["total_titles"],
+        "total_books_count": stats["total_books_count"],
         "borrowed_count": borrowed_count,
-        "total_holdings": total_holdings
+        "borrowed_count_exact": borrowed_count_exact,
+        "total_holdings": total_holdings,
+        "search_cache": search_results.stats(),
+    })
+
+# ------------------------------
+# ADMIN EXPORT
+# ------------------------------
+def admin_export(request):
+    role = request.session.get("user_role")
+
+    if role != "admin":
+        return redirect("index")
+
+    dataset = request.GET.get("dataset", "catalog")
+    export_format = request.GET.get("format", "csv")
+    if dataset not in DATASETS or export_format not in FORMATS:
+        messages.error(request, "Unknown export dataset or format.")
+        return redirect("admin_dashboard")
+
+    try:
+        chunks = export(dataset, export_format)
+    except ValueError as e:
+        messages.error(request, str(e))
+        return redirect("admin_dashboard")
+
+    if isinstance(request, ASGIRequest):
+        # An async iterator keeps the ASGI handler from buffering the whole export
+        chunks = aiter_chunks(chunks)
+    response = StreamingHttpResponse(chunks, content_type=FORMATS[export_format])
+    response["Content-Disposition"] = f'attachment; filename="{dataset}.{export_format}"'
+    return response
+
+# ------------------------------
+# ADMIN PROFILES
+# ------------------------------
+PROFILE_SORTS = ("cumulative", "tottime", "ncalls")
+
+
+def admin_profiles(request):
+    role = request.session.get("user_role")
+
+    if role != "admin":
+        return redirect("index")
+
+    return render(request, "admin-profiles.html", {"profiles": list_profiles()})
+
+
+def admin_profile(request, name):
+    """One stored profile: its top functions, or the .prof file itself with ?download."""
+    role = request.session.get("user_role")
+
+    if role != "admin":
+        return redirect("index")
+
+    path = profile_path(name)
+    if path is None or not path.is_file():
+        raise Http404("Profile not found")
+    if "download" in request.GET:
+        return FileResponse(open(path, "rb"), as_attachment=True, filename=name)
+
+    sort = request.GET.get("sort", PROFILE_SORTS[0])
+    if sort not in PROFILE_SORTS:
+        sort = PROFILE_SORTS[0]
+    return render(request, "admin-profiles.html", {
+        "profiles": list_profiles(),
+        "selected": name,
+        "sort": sort,
+        "sorts": PROFILE_SORTS,
+        "report": profile_report(path, sort=sort),
     })
 
 # ------------------------------
@@ -281,12 +686,17 @@ def admin_manage(request):
 
 
         if form.is_valid():
-            book = Books.objects.create(
-                book_name=form.cleaned_data["title"],
-                author=form.cleaned_data["author"],
-                thumbnail=form.cleaned_data["thumbnail"],
-                quantity=form.cleaned_data["quantity"]
-            )
+            try:
+                with transaction.atomic():
+                    book = Books.objects.create(
+                        book_name=form.cleaned_data["title"],
+                        author=form.cleaned_data["author"],
+                        thumbnail=form.cleaned_data["thumbnail"],
+                        quantity=form.cleaned_data["quantity"]
+                    )
+            except IntegrityError:
+                messages.error(request, "A book with this title and author already exists.")
+                return redirect("admin_manage")
 
             category_fields = [key for key in request.POST.keys() if "category_" in key]
             for field in category_fields:
@@ -358,7 +768,12 @@ def update_book(request, book_id):
             book.author = form.cleaned_data["author"]
             book.thumbnail = form.cleaned_data["thumbnail"]
             book.quantity = form.cleaned_data["quantity"]
-            book.save()
+            try:
+                with transaction.atomic():
+                    book.save()
+            except IntegrityError:
+                messages.error(request, "A book with this title and author already exists.")
+                return redirect("admin_manage")
             messages.success(request, "Book updated successfully!")
             return redirect("admin_manage")
         else: